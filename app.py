@@ -1,12 +1,19 @@
 import streamlit as st  # type: ignore
-import requests  # type: ignore
-import py3Dmol  # type: ignore
-from stmol import showmol  # type: ignore
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx  # type: ignore
+from backend.startup import lazy_module
+from backend.supervisor import launch
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 import subprocess
-import time
-import sys
+import threading
+import json
 import os
 
+# Imported on first use, so the welcome screen renders before they load
+requests = lazy_module("requests")
+py3Dmol = lazy_module("py3Dmol")
+stmol = lazy_module("stmol")
+
 # Page Configuration
 st.set_page_config(page_title="BIOCANVAS", layout="wide")
 
@@ -18,9 +25,9 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
-# Initialize session state
+# Initialize session state (run.py starts the backend itself and says so in the environment)
 if 'backend_started' not in st.session_state:
-    st.session_state.backend_started = False
+    st.session_state.backend_started = os.environ.get("BIOCANVAS_BACKEND_RUNNING") == "1"
     st.session_state.backend_process = None
 
 # Header
@@ -35,28 +42,12 @@ API_URL = "http://127.0.0.1:8000"
 if not st.session_state.backend_started:
     st.info("👋 Welcome! Click START to launch the application.")
     if st.button("🚀 START BIOCANVAS", type="primary", use_container_width=True):
-        with st.spinner("🔧 Starting backend services..."):
-            backend_process = subprocess.Popen(
-                [sys.executable, "-m", "uvicorn", "backend.main:app", 
-                 "--host", "127.0.0.1", "--port", "8000"],
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.DEVNULL
-            )
-            st.session_state.backend_process = backend_process
-            
-            # Poll backend health instead of fixed sleep
-            max_attempts = 15
-            for attempt in range(max_attempts):
-                time.sleep(0.5)
-                try:
-                    response = requests.get(f"{API_URL}/health", timeout=1)
-                    if response.status_code == 200:
-                        break
-                except:
-                    if attempt == max_attempts - 1:
-                        st.error("Backend failed to start")
-                        backend_process.kill()
-                        st.stop()
+        with st.spinner("🔧 Starting backend services and warming caches..."):
+            try:
+                st.session_state.backend_process = launch()
+            except (RuntimeError, OSError) as e:
+                st.error(f"Backend failed to start: {e}")
+                st.stop()
             
             st.session_state.backend_started = True
             st.rerun()
@@ -68,33 +59,142 @@ st.sidebar.header("🎛️ Control Panel")
 if st.sidebar.button("🛑 STOP BIOCANVAS", type="secondary"):
     if st.session_state.backend_process:
         st.session_state.backend_process.terminate()
-        time.sleep(1)
-        if st.session_state.backend_process.poll() is None:
+        try:
+            st.session_state.backend_process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
             st.session_state.backend_process.kill()
     st.session_state.backend_started = False
     st.rerun()
 
-@st.cache_data(ttl=300)
-def fetch_proteins():
-    response = requests.get(f"{API_URL}/proteins", timeout=5)
-    return response.json()
+# Catalog entries per selectbox page
+PAGE_SIZE = 50
 
-@st.cache_data(ttl=300)
-def fetch_ligands():
-    response = requests.get(f"{API_URL}/ligands", timeout=5)
-    return response.json()
+# Fetched structures kept in memory, shared by all sessions
+STRUCTURE_CACHE_ENTRIES = 32
 
-try:
-    proteins = fetch_proteins()
-    ligands = fetch_ligands()
+@st.cache_resource
+def http_session():
+    """One pooled, keep-alive HTTP session shared by every rerun and session."""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=16)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+@st.cache_data(max_entries=STRUCTURE_CACHE_ENTRIES, ttl=3600, show_spinner=False)
+def fetch_protein_pdb(uniprot_id, detail="full"):
+    """Downloads a protein's AlphaFold PDB text (compressed) through the backend."""
+    response = http_session().get(f"{API_URL}/structure/{uniprot_id}/pdb",
+                                  params={"detail": detail}, timeout=30)
+    response.raise_for_status()
+    if len(response.text) <= 100:
+        raise ValueError("Protein structure unavailable")
+    return response.text
+
+def show_protein(pdb_text, coarse=False):
+    view = py3Dmol.view(width=450, height=400)
+    view.addModel(pdb_text, "pdb")
+    cartoon = {'color': 'spectrum'}
+    if coarse:
+        # A Cα-only model has no backbone to build ribbons from; draw a trace
+        cartoon['style'] = 'trace'
+    view.setStyle({'cartoon': cartoon})
+    view.zoomTo()
+    stmol.showmol(view, height=400, width=450)
+
+@st.cache_data(max_entries=STRUCTURE_CACHE_ENTRIES, ttl=3600, show_spinner=False)
+def fetch_ligand_sdf(cid):
+    """Downloads a ligand's 3D SDF through the backend."""
+    response = http_session().get(f"{API_URL}/ligand-structure/{cid}", timeout=30)
+    response.raise_for_status()
+    return response.json()["sdf_data"]
+
+def watch_job(job_id):
+    """Yields a docking job's state from the backend's event stream until it finishes."""
+    with http_session().get(f"{API_URL}/jobs/{job_id}/events", stream=True, timeout=(5, 60)) as response:
+        response.raise_for_status()
+        for line in response.iter_lines(decode_unicode=True):
+            if line and line.startswith("data: "):
+                yield json.loads(line[len("data: "):])
+
+def show_docking_result(result):
+    """Score, binding strength and explanation of a finished docking run."""
+    st.success("✅ Docking Simulation Complete!")
+    
+    result_col1, result_col2, result_col3 = st.columns(3)
     
-    protein_options = {f"{p['name']} ({p['uniprot_id']})": p for p in proteins}
-    selected_protein_key = st.sidebar.selectbox("Select Protein", list(protein_options.keys()))
-    selected_protein = protein_options[selected_protein_key]
+    with result_col1:
+        st.metric("⚡ Interaction Score", f"{result['score']} kcal/mol")
     
-    ligand_options = {f"{l['name']} ({l['type']})": l for l in ligands}
-    selected_ligand_key = st.sidebar.selectbox("Select Ligand", list(ligand_options.keys()))
-    selected_ligand = ligand_options[selected_ligand_key]
+    with result_col2:
+        strength = result['strength']
+        if "Strong" in strength:
+            st.success(f"💪 {strength}")
+        elif "Moderate" in strength:
+            st.info(f"🔵 {strength}")
+        else:
+            st.warning(f"⚠️ {strength}")
+    
+    with result_col3:
+        st.info("📊 Binding Strength")
+    
+    st.divider()
+    st.subheader("🧠 Biological Explanation")
+    st.write(result['message'])
+
+    # Physics scoring reports which receptor residues the best pose touches
+    interactions = result.get('interactions')
+    if interactions and interactions['residues']:
+        st.subheader("🔗 Interacting Residues")
+        st.dataframe([dict(zip(interactions['columns'], row)) for row in interactions['residues']],
+                     hide_index=True, use_container_width=True)
+
+def fetch_concurrently(*calls):
+    """
+    Runs (function, argument) calls in parallel threads and returns one
+    (result, error) tuple per call, in order. Cache hits return immediately.
+    """
+    ctx = get_script_run_ctx()
+
+    def run(fn, arg):
+        add_script_run_ctx(threading.current_thread(), ctx)
+        try:
+            return fn(arg), None
+        except Exception as e:
+            return None, e
+
+    with ThreadPoolExecutor(max_workers=len(calls)) as pool:
+        futures = [pool.submit(run, fn, arg) for fn, arg in calls]
+        return [future.result() for future in futures]
+
+@st.cache_data(ttl=300)
+def fetch_page(kind, query, page):
+    """Fetches one page of /proteins or /ligands; returns (entries, total matches)."""
+    params = {"limit": PAGE_SIZE, "offset": page * PAGE_SIZE}
+    if query:
+        params["q"] = query
+    response = http_session().get(f"{API_URL}/{kind}", params=params, timeout=5)
+    response.raise_for_status()
+    return response.json(), int(response.headers.get("X-Total-Count", len(response.json())))
+
+def paged_select(kind, label, describe):
+    """Sidebar search box, page picker and selectbox over one page of the catalog."""
+    query = st.sidebar.text_input(f"Search {kind}", key=f"{kind}_query", placeholder="Name starts with...")
+    entries, total = fetch_page(kind, query, 0)
+    pages = max(1, -(-total // PAGE_SIZE))
+    if pages > 1:
+        page = st.sidebar.number_input(f"{label} page (of {pages})", 1, pages, 1, key=f"{kind}_page") - 1
+        if page:
+            entries, total = fetch_page(kind, query, page)
+    if not entries:
+        st.sidebar.warning(f"No {kind} match '{query}'.")
+        st.stop()
+    options = {describe(entry): entry for entry in entries}
+    return options[st.sidebar.selectbox(label, list(options.keys()))]
+
+try:
+    selected_protein = paged_select("proteins", "Select Protein", lambda p: f"{p['name']} ({p['uniprot_id']})")
+    selected_ligand = paged_select("ligands", "Select Ligand", lambda l: f"{l['name']} ({l['type']})")
     
     backend_online = True
     
@@ -106,51 +206,60 @@ except requests.exceptions.RequestException:
 if backend_online:
     st.subheader("🔬 Dual 3D Molecular Visualization")
     
+    # Proteins not yet shown in full detail start as a Cα trace, upgraded below
+    if 'full_structures' not in st.session_state:
+        st.session_state.full_structures = set()
+    uniprot_id = selected_protein['uniprot_id']
+    coarse = uniprot_id not in st.session_state.full_structures
+
+    # Protein and ligand download in parallel; both are memoized across reruns
+    with st.spinner("Loading protein from AlphaFold and ligand from PubChem..."):
+        (pdb_text, protein_error), (sdf_data, ligand_error) = fetch_concurrently(
+            (partial(fetch_protein_pdb, detail="ca" if coarse else "full"), uniprot_id),
+            (fetch_ligand_sdf, selected_ligand['pubchem_cid']),
+        )
+    
     # Top: Dual 3D Viewers
     viewer_col1, viewer_col2 = st.columns(2)
     
     # Left: Protein Viewer
     with viewer_col1:
         st.markdown("#### 🧬 Protein Structure")
-        with st.spinner("Loading protein from AlphaFold..."):
-            try:
-                structure_response = requests.get(f"{API_URL}/structure/{selected_protein['uniprot_id']}")
-                pdb_url = structure_response.json()["pdb_url"]
-                pdb_response = requests.get(pdb_url, timeout=30)
-                
-                if pdb_response.status_code == 200 and len(pdb_response.text) > 100:
-                    view = py3Dmol.view(width=450, height=400)
-                    view.addModel(pdb_response.text, "pdb")
-                    view.setStyle({'cartoon': {'color': 'spectrum'}})
-                    view.zoomTo()
-                    showmol(view, height=400, width=450)
-                    st.success("✅ Protein loaded")
-                else:
-                    st.error("❌ Protein structure unavailable")
-            except Exception as e:
-                st.error(f"❌ Error: {str(e)[:50]}")
+        protein_slot = st.empty()
+        if pdb_text is not None:
+            with protein_slot.container():
+                show_protein(pdb_text, coarse)
+            st.success("✅ Protein loaded")
+        elif isinstance(protein_error, (requests.exceptions.HTTPError, ValueError)):
+            st.error("❌ Protein structure unavailable")
+        else:
+            st.error(f"❌ Error: {str(protein_error)[:50]}")
     
     # Right: Ligand Viewer (NEW in v1.5)
     with viewer_col2:
         st.markdown("#### 💊 Ligand Structure")
-        with st.spinner("Loading ligand from PubChem..."):
-            try:
-                ligand_response = requests.get(
-                    f"{API_URL}/ligand-structure/{selected_ligand['pubchem_cid']}",
-                    timeout=30
-                )
-                if ligand_response.status_code == 200:
-                    sdf_data = ligand_response.json()["sdf_data"]
-                    view = py3Dmol.view(width=450, height=400)
-                    view.addModel(sdf_data, "sdf")
-                    view.setStyle({'stick': {'colorscheme': 'Jmol'}})
-                    view.zoomTo()
-                    showmol(view, height=400, width=450)
-                    st.success("✅ Ligand loaded")
-                else:
-                    st.error(f"❌ Ligand unavailable (CID: {selected_ligand['pubchem_cid']})")
-            except Exception as e:
-                st.error(f"❌ Error: {str(e)[:50]}")
+        if sdf_data is not None:
+            view = py3Dmol.view(width=450, height=400)
+            view.addModel(sdf_data, "sdf")
+            view.setStyle({'stick': {'colorscheme': 'Jmol'}})
+            view.zoomTo()
+            stmol.showmol(view, height=400, width=450)
+            st.success("✅ Ligand loaded")
+        elif isinstance(ligand_error, requests.exceptions.HTTPError):
+            st.error(f"❌ Ligand unavailable (CID: {selected_ligand['pubchem_cid']})")
+        else:
+            st.error(f"❌ Error: {str(ligand_error)[:50]}")
+
+    # Both viewers are up; now swap the coarse trace for the full-atom model
+    if pdb_text is not None and coarse:
+        try:
+            full_pdb = fetch_protein_pdb(uniprot_id)
+        except (requests.exceptions.RequestException, ValueError):
+            full_pdb = None  # keep showing the trace
+        if full_pdb is not None:
+            with protein_slot.container():
+                show_protein(full_pdb)
+            st.session_state.full_structures.add(uniprot_id)
     
     st.divider()
     
@@ -174,37 +283,47 @@ if backend_online:
     st.divider()
     
     # Action: Run Docking Simulation
+    # Docking runs as a backend job; its id survives reruns, so widgets stay
+    # responsive and the latest progress is shown again after every rerun
+    pair = (selected_protein["id"], selected_ligand["id"])
     if st.button("🚀 Run Educational Docking Simulation", type="primary", use_container_width=True):
-        with st.spinner("⚗️ Simulating interaction parameters..."):
-            try:
-                docking_response = requests.post(
-                    f"{API_URL}/dock",
-                    json={"protein_id": selected_protein["id"], "ligand_id": selected_ligand["id"]}
-                )
-                result = docking_response.json()
-                
-                st.success("✅ Docking Simulation Complete!")
-                
-                result_col1, result_col2, result_col3 = st.columns(3)
-                
-                with result_col1:
-                    st.metric("⚡ Interaction Score", f"{result['score']} kcal/mol")
-                
-                with result_col2:
-                    strength = result['strength']
-                    if "Strong" in strength:
-                        st.success(f"💪 {strength}")
-                    elif "Moderate" in strength:
-                        st.info(f"🔵 {strength}")
-                    else:
-                        st.warning(f"⚠️ {strength}")
-                
-                with result_col3:
-                    st.info("📊 Binding Strength")
-                
-                st.divider()
-                st.subheader("🧠 Biological Explanation")
-                st.write(result['message'])
-                
-            except Exception as e:
-                st.error(f"Docking simulation failed: {str(e)}")
+        try:
+            job_response = http_session().post(
+                f"{API_URL}/jobs",
+                json={"protein_id": pair[0], "ligand_id": pair[1]},
+                timeout=10
+            )
+            job_response.raise_for_status()
+            st.session_state.docking_job = (pair, job_response.json()["id"])
+        except requests.exceptions.RequestException as e:
+            st.error(f"Docking simulation failed: {str(e)}")
+    
+    docking_job = st.session_state.get("docking_job")
+    if docking_job and docking_job[0] == pair:
+        job_id = docking_job[1]
+        try:
+            if st.session_state.get("cancel_docking"):
+                http_session().delete(f"{API_URL}/jobs/{job_id}", timeout=10)
+            job = http_session().get(f"{API_URL}/jobs/{job_id}", timeout=10).json()
+            if job["status"] in ("queued", "running"):
+                st.button("✖ Cancel docking", key="cancel_docking")
+            status = st.empty()
+            progress_bar = st.empty()
+            for job in watch_job(job_id):
+                if job["status"] == "queued":
+                    status.info("⏳ Waiting for a docking worker...")
+                elif job["status"] == "running":
+                    best = f" — best score so far {job['best_score']} kcal/mol" if job["best_score"] is not None else ""
+                    status.info(f"⚗️ Simulating interaction parameters...{best}")
+                    progress_bar.progress(job["progress"])
+            progress_bar.empty()
+            status.empty()
+            
+            if job["status"] == "done":
+                show_docking_result(job["result"])
+            elif job["status"] == "cancelled":
+                st.warning("Docking simulation cancelled.")
+            else:
+                st.error(f"Docking simulation failed: {job['error']}")
+        except Exception as e:
+            st.error(f"Docking simulation failed: {str(e)}")
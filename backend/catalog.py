@@ -0,0 +1,160 @@
+# Indexed SQLite catalog of proteins and ligands, rebuilt when the JSON files change
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from backend.metrics import cache_lookup
+from backend.structure_cache import CACHE_DIR, connect_shared
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "data")
+CATALOG_DB = os.environ.get("BIOCANVAS_CATALOG_DB", os.path.join(CACHE_DIR, "catalog.sqlite"))
+
+# Seconds between checks of the JSON files for changes
+RELOAD_INTERVAL = float(os.environ.get("BIOCANVAS_CATALOG_RELOAD_INTERVAL", 1.0))
+
+# table -> (source file, columns in response order, filterable columns, lookup columns)
+TABLES = {
+    "proteins": ("proteins.json", ("id", "name", "uniprot_id", "function", "category"),
+                 ("category",), ("uniprot_id",)),
+    "ligands": ("ligands.json", ("id", "name", "type", "description", "pubchem_cid"),
+                ("type",), ("pubchem_cid",)),
+}
+
+SCHEMA = {
+    "proteins": """CREATE TABLE proteins (
+        id INTEGER PRIMARY KEY, name TEXT NOT NULL, uniprot_id TEXT NOT NULL,
+        function TEXT NOT NULL, category TEXT NOT NULL)""",
+    "ligands": """CREATE TABLE ligands (
+        id INTEGER PRIMARY KEY, name TEXT NOT NULL, type TEXT NOT NULL,
+        description TEXT NOT NULL, pubchem_cid INTEGER NOT NULL)""",
+}
+
+
+class Catalog:
+    """
+    Serves the catalog JSON files through an indexed SQLite database.
+
+    Each table is re-imported when its source file's size or mtime changes,
+    checked at most once per RELOAD_INTERVAL. The stored signature doubles as
+    the table's data version.
+    """
+
+    def __init__(self, db_path: str = CATALOG_DB, data_dir: str = DATA_DIR):
+        self.data_dir = data_dir
+        if db_path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._db = connect_shared(db_path)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA case_sensitive_like=OFF")
+        self._db.execute("CREATE TABLE IF NOT EXISTS catalog_meta (name TEXT PRIMARY KEY, signature TEXT)")
+        self._lock = threading.RLock()
+        self._checked: Dict[str, float] = {}
+        self._versions: Dict[str, str] = {}
+
+    def _signature(self, table: str) -> str:
+        try:
+            st = os.stat(os.path.join(self.data_dir, TABLES[table][0]))
+        except FileNotFoundError:
+            return "missing"
+        return f"{st.st_mtime_ns}-{st.st_size}"
+
+    def _refresh(self, table: str) -> None:
+        """Re-imports a table if its source file changed since the last import."""
+        now = time.monotonic()
+        if now - self._checked.get(table, -RELOAD_INTERVAL) < RELOAD_INTERVAL:
+            return
+        self._checked[table] = now
+        signature = self._signature(table)
+        if self._versions.get(table) == signature:
+            cache_lookup("catalog", "hit")
+            return
+        cache_lookup("catalog", "miss")
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute("SELECT signature FROM catalog_meta WHERE name=?", (table,)).fetchone()
+                if row is None or row["signature"] != signature:
+                    self._import(table)
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO catalog_meta (name, signature) VALUES (?, ?)",
+                        (table, signature),
+                    )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._versions[table] = signature
+
+    def _import(self, table: str) -> None:
+        filename, columns, filters, lookups = TABLES[table]
+        try:
+            with open(os.path.join(self.data_dir, filename), "r") as f:
+                entries = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            entries = []
+        self._db.execute(f"DROP TABLE IF EXISTS {table}")
+        self._db.execute(SCHEMA[table])
+        placeholders = ", ".join("?" for _ in columns)
+        self._db.executemany(
+            f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}) VALUES ({placeholders})",
+            ([entry.get(c) for c in columns] for entry in entries),
+        )
+        self._db.execute(f"CREATE INDEX {table}_name ON {table} (name COLLATE NOCASE)")
+        for column in filters + lookups:
+            self._db.execute(f"CREATE INDEX {table}_{column} ON {table} ({column})")
+
+    def version(self, table: str) -> str:
+        """Opaque data version of a table; changes whenever the source file does."""
+        self._refresh(table)
+        return self._versions[table]
+
+    def list(self, table: str, limit: Optional[int] = None, offset: int = 0,
+             filters: Optional[Dict[str, Any]] = None, prefix: Optional[str] = None
+             ) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Returns one page of entries ordered by id, plus the total match count.
+        filters match whole column values; prefix matches the start of name.
+        """
+        self._refresh(table)
+        _, columns, filterable, _ = TABLES[table]
+        clauses, params = [], []
+        for column, value in (filters or {}).items():
+            if column not in filterable:
+                raise ValueError(f"{table} cannot be filtered by {column}")
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if prefix:
+            escaped = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            clauses.append("name LIKE ? ESCAPE '\\'")
+            params.append(escaped + "%")
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        with self._lock:
+            total = self._db.execute(f"SELECT COUNT(*) FROM {table}{where}", params).fetchone()[0]
+            rows = self._db.execute(
+                f"SELECT {', '.join(columns)} FROM {table}{where} ORDER BY id LIMIT ? OFFSET ?",
+                params + [-1 if limit is None else limit, offset],
+            ).fetchall()
+        return [dict(row) for row in rows], total
+
+    def get(self, table: str, column: str, value: Any) -> Optional[Dict[str, Any]]:
+        """Looks up one entry by id or by a lookup column (uniprot_id, pubchem_cid)."""
+        self._refresh(table)
+        _, columns, _, lookups = TABLES[table]
+        if column != "id" and column not in lookups:
+            raise ValueError(f"{table} cannot be looked up by {column}")
+        with self._lock:
+            row = self._db.execute(
+                f"SELECT {', '.join(columns)} FROM {table} WHERE {column} = ? ORDER BY id LIMIT 1",
+                (value,),
+            ).fetchone()
+        return dict(row) if row is not None else None
+
+    def ids(self, table: str) -> List[int]:
+        self._refresh(table)
+        with self._lock:
+            return [row[0] for row in self._db.execute(f"SELECT id FROM {table} ORDER BY id")]
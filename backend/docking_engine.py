@@ -1,6 +1,36 @@
+import functools
+import hashlib
+import json
 import random
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
-def calculate_docking(protein_id: int, ligand_id: int, seed: int = None) -> dict:
+# Bump whenever scores could change for the same inputs; stored results are keyed by it
+ENGINE_VERSION = "2"
+
+def default_seed(protein_id: int, ligand_id: int) -> int:
+    """Seed used when a request gives none, so every pair always scores the same."""
+    digest = hashlib.sha256(f"{protein_id}:{ligand_id}".encode()).digest()
+    return int.from_bytes(digest[:4], "little")
+
+@functools.lru_cache(maxsize=None)
+def scoring_params(mode: str, rules_version: Optional[str] = None) -> str:
+    """
+    Canonical JSON of the settings that affect scores in a scoring mode;
+    educational scores also depend on the version of the rule table.
+    """
+    params = {"mode": mode}
+    if rules_version is not None:
+        params["rules"] = rules_version
+    if mode == "physics":
+        from backend.pose_search import MC_RUNS, MC_STEPS
+        from backend.scoring import GRID_SPACING
+        params.update(mc_runs=MC_RUNS, mc_steps=MC_STEPS, grid_spacing=GRID_SPACING)
+    return json.dumps(params, sort_keys=True, separators=(",", ":"))
+
+def calculate_docking(protein_id: int, ligand_id: int, seed: int = None,
+                      mode: str = "educational", receptor_key: str = None,
+                      receptor_pdb: str = None, ligand_sdf: str = None,
+                      progress=None, rules=None) -> dict:
     """
     Educational docking simulation that returns instant feedback based on
     biologically accurate protein-ligand interactions.
@@ -8,61 +38,57 @@ def calculate_docking(protein_id: int, ligand_id: int, seed: int = None) -> dict
     Args:
         protein_id: ID of the protein
         ligand_id: ID of the ligand
-        seed: Optional random seed for reproducible results (testing)
+        seed: Random seed; defaults to a fixed per-pair seed (default_seed)
+        mode: "educational" (curated table in data/interactions.json) or "physics" (grid scoring)
+        receptor_key: Cache key of the receptor structure (physics mode)
+        receptor_pdb: Receptor PDB text (physics mode)
+        ligand_sdf: Ligand SDF text (physics mode)
+        progress: Optional callback(runs done, total runs, best score) (physics mode)
+        rules: CompiledRules snapshot the result key was built from; defaults to the current one
     """
-    if seed is not None:
-        random.seed(seed)
-    
-    # Case A: Hemoglobin + Heme B
-    if protein_id == 1 and ligand_id == 1:
-        return {
-            "score": -11.5,
-            "strength": "Strong Binding",
-            "message": "Excellent! Heme is the natural cofactor that binds to Hemoglobin to transport oxygen.",
-            "success": True
-        }
-    
-    # Case B: EGFR + Gefitinib
-    elif protein_id == 7 and ligand_id == 10:
-        return {
-            "score": -9.8,
-            "strength": "Strong Binding",
-            "message": "High affinity! Gefitinib effectively inhibits the EGFR tyrosine kinase domain.",
-            "success": True
-        }
-    
-    # Case C: Pancreatic Alpha-Amylase + Glucose
-    elif protein_id == 10 and ligand_id == 2:
-        return {
-            "score": -6.2,
-            "strength": "Moderate Binding",
-            "message": "Moderate interaction. Glucose is the breakdown product of starch, which Amylase acts upon.",
-            "success": True
-        }
-    
-    # Case D: Insulin + Glucose
-    elif protein_id == 2 and ligand_id == 2:
-        return {
-            "score": -7.1,
-            "strength": "Moderate Binding",
-            "message": "Moderate affinity. Insulin regulates glucose metabolism in cells.",
-            "success": True
-        }
-    
-    # Case E: Lysozyme + Penicillin
-    elif protein_id == 4 and ligand_id == 7:
-        return {
-            "score": -5.8,
-            "strength": "Moderate Binding",
-            "message": "Moderate interaction. Both target bacterial cell walls through different mechanisms.",
-            "success": True
-        }
-    
-    # Case F: Default (any other combination)
-    else:
-        return {
-            "score": round(random.uniform(-4.5, -3.0), 1),
-            "strength": "Weak Binding",
-            "message": "Low complementarity. The shape and chemical properties do not match well.",
-            "success": True
-        }
+    if seed is None:
+        seed = default_seed(protein_id, ligand_id)
+
+    if mode == "physics":
+        if receptor_key is None or receptor_pdb is None or ligand_sdf is None:
+            raise ValueError("physics mode needs receptor_key, receptor_pdb and ligand_sdf")
+        from backend.pose_search import physics_docking
+        return physics_docking(receptor_key, receptor_pdb, ligand_sdf, seed, progress)
+
+    if rules is None:
+        from backend.rules import rule_table
+        rules = rule_table().current()
+    return educational_result(rules.lookup(protein_id, ligand_id), seed)
+
+def educational_result(rule: Optional[Dict[str, Any]], seed: int) -> Dict[str, Any]:
+    """A pair's curated result, or the weak-binding default scored from its seed."""
+    if rule is not None:
+        return dict(rule)
+    # Private generator: seeding the global one is not thread-safe
+    rng = random.Random(seed)
+    return {
+        "score": round(rng.uniform(-4.5, -3.0), 1),
+        "strength": "Weak Binding",
+        "message": "Low complementarity. The shape and chemical properties do not match well.",
+        "success": True
+    }
+
+def educational_docking_many(pairs: Sequence[Tuple[int, int]],
+                             seeds: Optional[Sequence[Optional[int]]] = None,
+                             rules=None) -> List[Dict[str, Any]]:
+    """
+    Curated-table results for many (protein_id, ligand_id) pairs. Their rules
+    are resolved against one version of the table (the `rules` snapshot, or
+    the current one) in a single vectorized lookup.
+    """
+    if rules is None:
+        from backend.rules import rule_table
+        rules = rule_table().current()
+    found = rules.lookup_many([p for p, _ in pairs], [l for _, l in pairs]) if pairs else []
+    results = []
+    for i, (protein_id, ligand_id) in enumerate(pairs):
+        seed = seeds[i] if seeds is not None else None
+        if seed is None:
+            seed = default_seed(protein_id, ligand_id)
+        results.append(educational_result(rules.results[found[i]] if found[i] >= 0 else None, seed))
+    return results
@@ -0,0 +1,176 @@
+# Pre-serialized, pre-compressed response bodies with strong ETags and byte ranges
+import gzip
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, NamedTuple, Optional, Tuple
+
+from fastapi import Request, Response  # type: ignore
+
+from backend.metrics import cache_lookup
+
+try:
+    import brotli  # type: ignore
+except ImportError:  # optional: gzip is always available
+    brotli = None
+
+
+# Bodies larger than this are compressed at cheaper default levels: brotli
+# quality 11 costs seconds per MB of JSON, quality 5 tens of milliseconds for
+# about a sixth more output
+LARGE_BODY = 64 * 1024
+SMALL_LEVELS = (9, 11)   # (gzip level, brotli quality)
+LARGE_LEVELS = (6, 5)
+
+
+class EncodedBody(NamedTuple):
+    """One JSON document serialized once, with every content-coding prepared."""
+    etag: str                   # strong ETag of the identity encoding, without quotes
+    variants: Dict[str, bytes]  # content-coding -> body ("identity", "gzip", "br")
+    headers: Dict[str, str]     # extra headers sent with every variant
+
+
+def encode_json(obj: Any, headers: Optional[Dict[str, str]] = None) -> EncodedBody:
+    raw = json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode()
+    return encode_bytes(raw, headers)
+
+
+def encode_bytes(raw: bytes, headers: Optional[Dict[str, str]] = None,
+                 gzip_level: Optional[int] = None, brotli_quality: Optional[int] = None) -> EncodedBody:
+    """
+    Compresses a body once per content-coding. Unless given, levels are
+    SMALL_LEVELS, or LARGE_LEVELS for bodies over LARGE_BODY bytes.
+    """
+    default_gzip, default_brotli = LARGE_LEVELS if len(raw) > LARGE_BODY else SMALL_LEVELS
+    gzip_level = default_gzip if gzip_level is None else gzip_level
+    brotli_quality = default_brotli if brotli_quality is None else brotli_quality
+    variants = {"identity": raw, "gzip": gzip.compress(raw, compresslevel=gzip_level, mtime=0)}
+    if brotli is not None:
+        variants["br"] = brotli.compress(raw, quality=brotli_quality)
+    return EncodedBody(
+        etag=hashlib.sha256(raw).hexdigest()[:32],
+        variants=variants,
+        headers=headers or {},
+    )
+
+
+def _variant_etag(etag: str, coding: str) -> str:
+    # Strong ETags must differ between content-codings of the same data
+    return f'"{etag}"' if coding == "identity" else f'"{etag}-{coding}"'
+
+
+def _accepted(request: Request) -> Dict[str, float]:
+    accepted = {}
+    for item in request.headers.get("accept-encoding", "").split(","):
+        coding, _, params = item.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        if coding:
+            accepted[coding.strip().lower()] = q
+    return accepted
+
+
+def _byte_range(header: str, length: int) -> Optional[Tuple[int, int]]:
+    """
+    Parses a single-range Range header into an inclusive (first, last) pair.
+    Returns None for headers that should be ignored (multiple ranges, other
+    units, bad syntax); raises ValueError for an unsatisfiable range.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, sep, last = spec.strip().partition("-")
+    if not sep or not (first + last).isdigit():
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        if int(last) == 0 or length == 0:
+            raise ValueError("unsatisfiable suffix range")
+        return max(0, length - int(last)), length - 1
+    start = int(first)
+    if start >= length:
+        raise ValueError("range starts past the end")
+    end = min(int(last), length - 1) if last else length - 1
+    return (start, end) if start <= end else None
+
+
+def encoded_response(request: Request, body: EncodedBody, media_type: str = "application/json") -> Response:
+    """
+    Picks the best pre-compressed variant for Accept-Encoding and answers
+    If-None-Match with a body-less 304 when any variant's ETag matches.
+    A single byte range of the chosen variant is served as a 206 unless an
+    If-Range validator no longer matches.
+    """
+    accepted = _accepted(request)
+    coding = "identity"
+    for candidate in ("br", "gzip"):
+        if candidate in body.variants and accepted.get(candidate, accepted.get("*", 0.0)) > 0:
+            coding = candidate
+            break
+
+    headers = dict(body.headers)
+    headers["ETag"] = _variant_etag(body.etag, coding)
+    headers["Vary"] = "Accept-Encoding"
+    headers["Cache-Control"] = "no-cache"
+    headers["Accept-Ranges"] = "bytes"
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        known = {_variant_etag(body.etag, c) for c in body.variants}
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        if "*" in tags or tags & known:
+            return Response(status_code=304, headers=headers)
+
+    if coding != "identity":
+        headers["Content-Encoding"] = coding
+    content = body.variants[coding]
+
+    range_header = request.headers.get("range")
+    if range_header and request.headers.get("if-range", headers["ETag"]) == headers["ETag"]:
+        try:
+            selected = _byte_range(range_header, len(content))
+        except ValueError:
+            headers["Content-Range"] = f"bytes */{len(content)}"
+            return Response(status_code=416, headers=headers)
+        if selected is not None:
+            first, last = selected
+            headers["Content-Range"] = f"bytes {first}-{last}/{len(content)}"
+            return Response(content=content[first:last + 1], status_code=206,
+                            media_type=media_type, headers=headers)
+    return Response(content=content, media_type=media_type, headers=headers)
+
+
+class EncodedCache:
+    """Bounded LRU of EncodedBody values keyed by (data version, query)."""
+
+    def __init__(self, name: str, maxsize: int = 256):
+        self.name = name
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[Hashable, EncodedBody]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[EncodedBody]:
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+        cache_lookup(self.name, "hit" if body is not None else "miss")
+        return body
+
+    def put(self, key: Hashable, body: EncodedBody) -> None:
+        with self._lock:
+            self._entries[key] = body
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def get_or_build(self, key: Hashable, build: Callable[[], EncodedBody]) -> EncodedBody:
+        body = self.get(key)
+        if body is None:
+            body = build()
+            self.put(key, body)
+        return body
@@ -0,0 +1,306 @@
+# Bit-packed circular fingerprints of the ligand library and vectorized Tanimoto search
+import os
+import struct
+import threading
+import time
+import zlib
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np  # type: ignore
+
+from backend.structure_cache import CACHE_DIR
+from backend.structures import Ligand, heavy_atoms, parse_sdf
+
+# Morgan/ECFP4-style: environments up to radius 2 folded into 2048 bits
+FP_BITS = 2048
+FP_BYTES = FP_BITS // 8
+FP_RADIUS = 2
+
+# Bump when the fingerprint definition changes; stored indexes are rebuilt
+FP_VERSION = 1
+
+FINGERPRINT_FILE = os.path.join(CACHE_DIR, f"fingerprints-v{FP_VERSION}.npz")
+
+# Seconds between saves while the library is being indexed; other workers reload the file
+SAVE_INTERVAL = 30.0
+
+# Rows allocated up front; the matrix doubles whenever it fills up
+INITIAL_CAPACITY = 1024
+
+# Rows scored per block; keeps the temporaries of a search in cache
+SEARCH_BLOCK = 8192
+
+# Set bits per byte value, for NumPy versions without np.bitwise_count
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def _hash(*values: int) -> int:
+    """Stable 32-bit hash of a tuple of ints (Python's hash() is salted per process)."""
+    return zlib.crc32(struct.pack(f"<{len(values)}q", *values))
+
+
+def _ring_atoms(neighbours: List[List[int]]) -> np.ndarray:
+    """Atoms with at least one bond whose ends stay connected without it."""
+    in_ring = np.zeros(len(neighbours), dtype=bool)
+    for a, adjacent in enumerate(neighbours):
+        for b in adjacent:
+            if b < a or (in_ring[a] and in_ring[b]):
+                continue
+            stack, seen, found = [a], {a}, False
+            while stack and not found:
+                node = stack.pop()
+                for nxt in neighbours[node]:
+                    if node == a and nxt == b:
+                        continue
+                    if nxt == b:
+                        in_ring[a] = in_ring[b] = found = True
+                        break
+                    if nxt not in seen:
+                        seen.add(nxt)
+                        stack.append(nxt)
+    return in_ring
+
+
+def fingerprint(ligand: Ligand) -> np.ndarray:
+    """
+    Circular fingerprint of a ligand's heavy-atom graph as FP_BYTES packed
+    bits. Atom invariants are element, heavy degree, hydrogen count, charge
+    and ring membership; each iteration hashes an atom's identifier with its
+    bonded neighbours' (bond order, identifier) pairs.
+    """
+    hydrogens = np.zeros(len(ligand.elements), dtype=np.int64)
+    for a, b, _ in ligand.bonds:
+        if ligand.elements[b] == "H":
+            hydrogens[a] += 1
+        if ligand.elements[a] == "H":
+            hydrogens[b] += 1
+    hydrogens = hydrogens[ligand.elements != "H"]
+
+    heavy = heavy_atoms(ligand)
+    n = len(heavy.elements)
+    neighbours: List[List[int]] = [[] for _ in range(n)]
+    orders: List[List[int]] = [[] for _ in range(n)]
+    for a, b, order in heavy.bonds:
+        neighbours[a].append(b)
+        orders[a].append(order)
+        neighbours[b].append(a)
+        orders[b].append(order)
+    rings = _ring_atoms(neighbours)
+
+    identifiers = [
+        _hash(zlib.crc32(heavy.elements[i].encode()), len(neighbours[i]), int(hydrogens[i]),
+              int(round(float(heavy.charges[i]) * 2)), int(rings[i]))
+        for i in range(n)
+    ]
+    bits = set(identifiers)
+    for _ in range(FP_RADIUS):
+        identifiers = [
+            _hash(identifiers[i], *(v for pair in sorted(zip(orders[i], (identifiers[j] for j in neighbours[i])))
+                                    for v in pair))
+            for i in range(n)
+        ]
+        bits.update(identifiers)
+
+    dense = np.zeros(FP_BITS, dtype=bool)
+    dense[[bit % FP_BITS for bit in bits]] = True
+    return np.packbits(dense)
+
+
+def popcount(packed: np.ndarray) -> np.ndarray:
+    """Set bits per row of an (N, FP_BYTES) uint8 matrix."""
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(packed.view(np.uint64)).sum(axis=-1, dtype=np.int32)
+    return _POPCOUNT[packed].sum(axis=-1, dtype=np.int32)
+
+
+def common_bits(fps: np.ndarray, query: np.ndarray) -> np.ndarray:
+    """Popcount of (row AND query) for every row, in blocks, 64 bits at a time."""
+    words, query_words = fps.view(np.uint64), query.view(np.uint64)
+    common = np.empty(len(fps), dtype=np.int32)
+    block = np.empty((min(SEARCH_BLOCK, len(fps)), words.shape[1]), dtype=np.uint64)
+    for start in range(0, len(fps), SEARCH_BLOCK):
+        rows = words[start:start + SEARCH_BLOCK]
+        anded = np.bitwise_and(rows, query_words, out=block[:len(rows)])
+        common[start:start + len(rows)] = popcount(anded.view(np.uint8))
+    return common
+
+
+class FingerprintIndex:
+    """
+    Fingerprints keyed by PubChem CID in one contiguous (N, FP_BYTES) matrix,
+    with per-row bit counts so a query costs one AND and one popcount per
+    row. Rows are appended to preallocated arrays that grow geometrically,
+    and are never rewritten, so searches work on a snapshot without copying.
+
+    One worker process at a time builds the index (see acquire_builder) and
+    saves it next to the structure store; the others reload what it saved.
+    """
+
+    def __init__(self, path: str = FINGERPRINT_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._cids = np.zeros(INITIAL_CAPACITY, dtype=np.int64)
+        self._fps = np.zeros((INITIAL_CAPACITY, FP_BYTES), dtype=np.uint8)
+        self._counts = np.zeros(INITIAL_CAPACITY, dtype=np.int32)
+        self._size = 0
+        self._rows: Dict[int, int] = {}
+        # Ligand catalog version whose every structure is indexed
+        self.complete_for: Optional[str] = None
+        # CIDs with no usable 3D structure (none upstream, or unparsable); not retried by this process
+        self.unavailable: Set[int] = set()
+        self._unsaved = False
+        self._saved_at = time.monotonic()
+        self._loaded_mtime: Optional[int] = None
+        self._builder_fd: Optional[int] = None
+        self.reload()
+
+    @property
+    def cids(self) -> np.ndarray:
+        return self._cids[:self._size]
+
+    @property
+    def fps(self) -> np.ndarray:
+        return self._fps[:self._size]
+
+    def _append(self, cids: np.ndarray, fps: np.ndarray) -> None:
+        """Adds rows for CIDs not indexed yet; the caller holds self._lock."""
+        fresh, batch = [], set()
+        for i, cid in enumerate(cids.tolist()):
+            if cid not in self._rows and cid not in batch:
+                batch.add(cid)
+                fresh.append(i)
+        if not fresh:
+            return
+        cids, fps = cids[fresh], fps[fresh]
+        start, end = self._size, self._size + len(cids)
+        if end > len(self._cids):
+            capacity = max(2 * len(self._cids), end)
+            # Earlier snapshots keep the old buffers; only the filled rows are copied
+            for name in ("_cids", "_fps", "_counts"):
+                old = getattr(self, name)
+                grown = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+                grown[:start] = old[:start]
+                setattr(self, name, grown)
+        self._cids[start:end] = cids
+        self._fps[start:end] = fps
+        self._counts[start:end] = popcount(fps)
+        self._rows.update((cid, row) for row, cid in enumerate(cids.tolist(), start))
+        self._size = end
+
+    def __len__(self) -> int:
+        return self._size
+
+    def missing(self, cids: Iterable[int]) -> List[int]:
+        """CIDs neither indexed nor known to have no usable structure."""
+        return sorted({int(cid) for cid in cids} - self._rows.keys() - self.unavailable)
+
+    def mark_unavailable(self, cids: Iterable[int]) -> None:
+        self.unavailable.update(int(cid) for cid in cids)
+
+    def get(self, cid: int) -> Optional[np.ndarray]:
+        row = self._rows.get(int(cid))
+        return None if row is None else self._fps[row]
+
+    def add_sdfs(self, records: Sequence[Tuple[int, bytes]]) -> int:
+        """Fingerprints (cid, SDF) records into the index; unparsable ones are marked unavailable."""
+        new_cids, new_fps = [], []
+        for cid, sdf in records:
+            try:
+                fp = fingerprint(parse_sdf(sdf.decode()))
+            except (ValueError, IndexError):
+                self.mark_unavailable([cid])
+                continue
+            new_cids.append(cid)
+            new_fps.append(fp)
+        if not new_cids:
+            return 0
+        with self._lock:
+            self._append(np.array(new_cids, dtype=np.int64), np.stack(new_fps))
+            self._unsaved = True
+        return len(new_cids)
+
+    def save(self, every: float = 0.0) -> None:
+        """Writes the index if rows were added since the last save, at most once per `every` seconds."""
+        with self._lock:
+            if not self._unsaved or time.monotonic() - self._saved_at < every:
+                return
+            cids, fps = self.cids, self.fps
+            self._unsaved = False
+            self._saved_at = time.monotonic()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp_path, cids=cids, fps=fps)
+        os.replace(tmp_path, self.path)
+        self._loaded_mtime = os.stat(self.path).st_mtime_ns
+
+    def reload(self) -> None:
+        """Adds the rows another process saved since the last load; rows only this one has are kept."""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+            if mtime == self._loaded_mtime:
+                return
+            with np.load(self.path) as data:
+                cids, fps = data["cids"].astype(np.int64), np.ascontiguousarray(data["fps"], dtype=np.uint8)
+        except (FileNotFoundError, KeyError, ValueError, OSError):
+            return
+        with self._lock:
+            self._append(cids, fps)
+            self._loaded_mtime = mtime
+
+    def acquire_builder(self) -> bool:
+        """
+        True if this process may build (and save) the index: it holds the
+        builder lock, or no other process does. Never blocks; without flock
+        (Windows, a single process) it always succeeds.
+        """
+        if self._builder_fd is not None:
+            return True
+        try:
+            import fcntl
+        except ImportError:
+            return True
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        fd = os.open(f"{self.path}.lock", os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._builder_fd = fd
+        return True
+
+    def release_builder(self) -> None:
+        if self._builder_fd is not None:
+            os.close(self._builder_fd)
+            self._builder_fd = None
+
+    def search(self, query: np.ndarray, k: int, exclude: Optional[int] = None) -> List[Tuple[int, float]]:
+        """Top-k (cid, Tanimoto similarity) over the whole index, best first."""
+        with self._lock:
+            n = self._size
+            cids, fps, counts = self._cids[:n], self._fps[:n], self._counts[:n]
+            excluded = self._rows.get(int(exclude)) if exclude is not None else None
+        common = common_bits(fps, query)
+        union = counts + popcount(query[None, :])[0] - common
+        similarity = np.divide(common, union, out=np.zeros(len(cids)), where=union > 0)
+        if excluded is not None:
+            similarity[excluded] = -1.0
+        k = min(k, len(cids) - (excluded is not None))
+        if k <= 0:
+            return []
+        top = np.argpartition(-similarity, k - 1)[:k]
+        top = top[np.argsort(-similarity[top], kind="stable")]
+        return [(int(cids[i]), float(similarity[i])) for i in top]
+
+
+_index: Optional[FingerprintIndex] = None
+_index_lock = threading.Lock()
+
+
+def fingerprint_index() -> FingerprintIndex:
+    """The process-wide index, loaded from FINGERPRINT_FILE on first use."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = FingerprintIndex()
+        return _index
@@ -0,0 +1,191 @@
+# Per-residue interaction profiles between a docked ligand pose and its receptor
+from typing import Any, Dict, List, Tuple
+
+import numpy as np  # type: ignore
+
+from backend.scoring import DEFAULT_RADIUS, VDW_RADII, LigandModel
+from backend.spatial_index import CellList
+from backend.structures import POLAR_CARBONS
+
+# Distance cutoffs (Angstrom)
+CONTACT_CUTOFF = 4.0
+HBOND_CUTOFF = 3.5
+HYDROPHOBIC_CUTOFF = 4.0
+STACKING_CUTOFF = 5.5      # ring centroid distance
+STACKING_REACH = 7.0       # residues this close to any ligand atom are checked for stacking
+CLASH_SCALE = 0.75         # clash below this fraction of the summed van der Waals radii
+HBOND_CLASH = 2.2          # donor/acceptor pairs only clash below this distance
+
+# Aromatic ring atoms of the receptor's side chains (the six-membered ring for TRP)
+AROMATIC_RINGS = {
+    b"PHE": (b"CG", b"CD1", b"CD2", b"CE1", b"CE2", b"CZ"),
+    b"TYR": (b"CG", b"CD1", b"CD2", b"CE1", b"CE2", b"CZ"),
+    b"TRP": (b"CD2", b"CE2", b"CE3", b"CZ2", b"CZ3", b"CH2"),
+    b"HIS": (b"CG", b"ND1", b"CD2", b"CE1", b"NE2"),
+}
+
+# Columns of the compact profile rows returned with a docking result
+PROFILE_COLUMNS = ("chain", "res_seq", "resname", "contacts", "hbonds", "hydrophobic", "pi_stacking", "clashes")
+
+_POLAR_PAIRS = np.array([f"{r}:{n}" for r, n in POLAR_CARBONS]).astype("S8")
+
+
+def _ring_geometry(coords: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Centroid and unit normal of a roughly planar ring."""
+    centroid = coords.mean(axis=0)
+    normal = np.linalg.svd(coords - centroid)[2][-1]
+    return centroid, normal
+
+
+def ligand_rings(model: LigandModel) -> List[np.ndarray]:
+    """
+    Atom indices of the ligand's aromatic rings: five- and six-membered
+    cycles of C/N/O/S atoms whose bonds alternate (Kekulé) or are marked
+    aromatic (bond order 4).
+    """
+    ligand = model.ligand
+    n = len(ligand.elements)
+    neighbours: List[Dict[int, int]] = [{} for _ in range(n)]
+    for a, b, order in ligand.bonds:
+        neighbours[a][b] = neighbours[b][a] = int(order)
+
+    rings = {}
+    for a, b, _ in ligand.bonds:
+        # The shortest path from a to b avoiding the a-b bond closes the smallest ring through it
+        previous, depth, frontier = {a: -1}, 0, [a]
+        while frontier and b not in previous and depth < 5:
+            depth += 1
+            reached = []
+            for node in frontier:
+                for other in neighbours[node]:
+                    if other not in previous and not (node == a and other == b):
+                        previous[other] = node
+                        reached.append(other)
+            frontier = reached
+        if b not in previous or depth < 4:
+            continue
+        ring, node = [], b
+        while node != -1:
+            ring.append(node)
+            node = previous[node]
+        rings[frozenset(ring)] = ring
+
+    aromatic = []
+    for ring in rings.values():
+        if not all(ligand.elements[i] in ("C", "N", "O", "S") for i in ring):
+            continue
+        orders = [neighbours[ring[i]][ring[i - 1]] for i in range(len(ring))]
+        if orders.count(4) == len(ring) or orders.count(2) >= (3 if len(ring) == 6 else 2):
+            aromatic.append(np.array(ring))
+    return aromatic
+
+
+def interaction_profile(index: CellList, atoms: np.ndarray, model: LigandModel,
+                        pose: np.ndarray) -> Dict[str, Any]:
+    """
+    Contacts, hydrogen bonds, hydrophobic contacts, π-stacking and clashes of
+    a pose, per receptor residue. `atoms` are the receptor's ATOM_DTYPE
+    records and `index` the cell list over them; distances come from one
+    cell-list pair query, so the cost scales with the ligand, not the receptor.
+    Returns {"columns": PROFILE_COLUMNS, "residues": [[...], ...]} ordered by residue.
+    """
+    lig, rec, dist = index.pairs_within(pose, max(CONTACT_CUTOFF, STACKING_REACH))
+    heavy = atoms["element"][rec] != b"H"
+    lig, rec, dist = lig[heavy], rec[heavy], dist[heavy]
+    residue = atoms["res_index"][rec]
+
+    near = dist < CONTACT_CUTOFF
+    rec_elements = atoms["element"][rec]
+    rec_polar = np.isin(rec_elements, (b"N", b"O"))
+    pairs = np.char.add(np.char.add(atoms["resname"][rec], b":"), atoms["name"][rec])
+    rec_hydrophobic = (np.isin(rec_elements, (b"C", b"S")) & ~np.isin(atoms["name"][rec], (b"C", b"CA"))
+                       & ~np.isin(pairs, _POLAR_PAIRS))
+
+    radii = {element.encode(): radius for element, radius in VDW_RADII.items()}
+    rec_radius = np.array([radii.get(e, DEFAULT_RADIUS) for e in rec_elements], dtype=np.float32)
+    lig_radius = np.array([VDW_RADII.get(e, DEFAULT_RADIUS) for e in model.ligand.elements], dtype=np.float32)
+    hbond_pair = model.hbond[lig] & rec_polar
+    clash = np.where(hbond_pair, dist < HBOND_CLASH, dist < CLASH_SCALE * (lig_radius[lig] + rec_radius))
+
+    columns = {
+        "contacts": near,
+        "hbonds": near & hbond_pair & (dist <= HBOND_CUTOFF),
+        "hydrophobic": (dist <= HYDROPHOBIC_CUTOFF) & model.hydrophobic[lig] & rec_hydrophobic,
+        "clashes": near & clash,
+    }
+    n_residues = int(atoms["res_index"][-1]) + 1 if len(atoms) else 0
+    counts = {name: np.bincount(residue[mask], minlength=n_residues) for name, mask in columns.items()}
+    counts["pi_stacking"] = _stacking(atoms, np.unique(residue), model, pose, n_residues)
+
+    touched = np.nonzero(counts["contacts"] + counts["pi_stacking"])[0]
+    first_atom = np.searchsorted(atoms["res_index"], touched)
+    rows = [
+        [atoms["chain"][f].decode(), int(atoms["res_seq"][f]), atoms["resname"][f].decode()]
+        + [int(counts[name][r]) for name in PROFILE_COLUMNS[3:]]
+        for r, f in zip(touched, first_atom)
+    ]
+    return {"columns": list(PROFILE_COLUMNS), "residues": rows}
+
+
+def _stacking(atoms: np.ndarray, residues: np.ndarray, model: LigandModel,
+              pose: np.ndarray, n_residues: int) -> np.ndarray:
+    """Per-residue count of ligand rings stacked face-to-face or edge-to-face with an aromatic side chain."""
+    stacked = np.zeros(n_residues, dtype=np.int64)
+    rings = ligand_rings(model)
+    if not rings or not len(residues):
+        return stacked
+    ligand_geometry = [_ring_geometry(pose[ring]) for ring in rings]
+    starts = np.searchsorted(atoms["res_index"], residues)
+    ends = np.searchsorted(atoms["res_index"], residues, side="right")
+    for r, start, end in zip(residues, starts, ends):
+        names = AROMATIC_RINGS.get(atoms["resname"][start])
+        if names is None:
+            continue
+        ring_atoms = atoms[start:end]
+        ring_atoms = ring_atoms[np.isin(ring_atoms["name"], names)]
+        if len(ring_atoms) < len(names):
+            continue
+        centroid, normal = _ring_geometry(np.asarray(ring_atoms["xyz"], dtype=np.float64))
+        for lig_centroid, lig_normal in ligand_geometry:
+            if np.linalg.norm(lig_centroid - centroid) > STACKING_CUTOFF:
+                continue
+            angle = np.degrees(np.arccos(min(1.0, abs(float(normal @ lig_normal)))))
+            if angle < 30.0 or angle > 60.0:
+                stacked[r] += 1
+    return stacked
+
+
+def describe(profile: Dict[str, Any], limit: int = 3) -> str:
+    """One-sentence summary of a profile, naming the residues with the most of each interaction."""
+    columns = profile["columns"]
+    rows = profile["residues"]
+
+    def residues_with(column: str) -> Tuple[int, List[str]]:
+        i = columns.index(column)
+        hits = sorted((row for row in rows if row[i]), key=lambda row: -row[i])
+        return sum(row[i] for row in hits), [f"{row[2]}{row[1]}" for row in hits[:limit]]
+
+    def names(labels: List[str], total: int) -> str:
+        more = total - len(labels)
+        return ", ".join(labels) + (f" and {more} more" if more > 0 else "")
+
+    parts = []
+    count, labels = residues_with("hbonds")
+    if count:
+        parts.append(f"{count} hydrogen bond{'s' if count > 1 else ''} ({', '.join(labels)})")
+    hydrophobic_rows = [row for row in rows if row[columns.index("hydrophobic")]]
+    _, labels = residues_with("hydrophobic")
+    if labels:
+        parts.append(f"hydrophobic contacts with {names(labels, len(hydrophobic_rows))}")
+    _, labels = residues_with("pi_stacking")
+    if labels:
+        parts.append(f"π-stacking with {', '.join(labels)}")
+    count, labels = residues_with("clashes")
+    if count:
+        parts.append(f"{count} steric clash{'es' if count > 1 else ''} ({', '.join(labels)})")
+
+    contacted = sum(1 for row in rows if row[columns.index("contacts")])
+    if not contacted:
+        return "The ligand makes no close contacts with the receptor."
+    summary = f"The ligand touches {contacted} residue{'s' if contacted > 1 else ''}"
+    return summary + (": " + "; ".join(parts) if parts else "") + "."
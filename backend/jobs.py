@@ -0,0 +1,387 @@
+# Persistent docking job queue with priorities, per-user fairness and cancellation
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Set, Tuple
+
+from backend.structure_cache import CACHE_DIR, connect_shared
+
+JOBS_DB = os.environ.get("BIOCANVAS_JOBS_DB", os.path.join(CACHE_DIR, "jobs.sqlite"))
+
+# Jobs run concurrently by each backend process
+JOB_WORKERS = int(os.environ.get("BIOCANVAS_JOB_WORKERS", 2))
+
+# Queued jobs allowed per user before submissions are refused
+JOBS_PER_USER = int(os.environ.get("BIOCANVAS_JOBS_PER_USER", 20))
+
+# Highest priority a submission may ask for. The user comes from an unauthenticated
+# header, so by default nobody can jump the queue; lower priorities (down to
+# -JOB_MIN_PRIORITY) only make a job yield to others and are always allowed
+JOB_MAX_PRIORITY = int(os.environ.get("BIOCANVAS_JOB_MAX_PRIORITY", 0))
+JOB_MIN_PRIORITY = -9
+
+# Seconds a running job's lease lasts without a heartbeat; jobs whose lease ran out
+# (their process died, whatever its pid) are re-queued by any live process
+JOB_LEASE = float(os.environ.get("BIOCANVAS_JOB_LEASE", 60.0))
+
+# Seconds finished jobs (done, failed or cancelled) are kept before they are deleted
+JOB_RETENTION = float(os.environ.get("BIOCANVAS_JOB_RETENTION", 7 * 24 * 3600))
+
+POLL_INTERVAL = 1.0    # seconds between checks for jobs submitted to other processes
+EVENT_INTERVAL = 0.5   # seconds between state checks of a watched job
+HEARTBEAT = 15.0       # seconds between keep-alive comments on an idle event stream
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+FINAL = (DONE, FAILED, CANCELLED)
+
+# Runs one job request; reports (runs done, total runs, best score so far or None);
+# each report is also where a cancelled job stops
+Runner = Callable[[Dict[str, Any], Callable[[int, int, Optional[float]], None]], Dict[str, Any]]
+
+logger = logging.getLogger("biocanvas.jobs")
+
+
+class QueueFull(Exception):
+    """The user already has JOBS_PER_USER jobs waiting."""
+
+
+class JobCancelled(Exception):
+    """Raised inside a running job once it has been cancelled."""
+
+
+class _Interrupted(Exception):
+    """Raised inside a running job when its process is shutting down."""
+
+
+class JobQueue:
+    """
+    Docking jobs stored in SQLite, which is also the queue: every backend
+    process runs JOB_WORKERS threads that claim queued jobs with a single
+    transaction, so jobs submitted to one worker process may run in another.
+
+    The next job is the highest-priority one; within a priority, users with
+    fewer running jobs and then users served least recently go first, so one
+    user's long batch cannot starve everyone else.
+    """
+
+    def __init__(self, runner: Runner, db_path: str = JOBS_DB, workers: int = JOB_WORKERS):
+        self.runner = runner
+        self.workers = workers
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._db = connect_shared(db_path)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS jobs (
+                   id TEXT PRIMARY KEY,
+                   user TEXT NOT NULL,
+                   priority INTEGER NOT NULL,
+                   status TEXT NOT NULL,
+                   request TEXT NOT NULL,
+                   result TEXT,
+                   error TEXT,
+                   progress REAL NOT NULL DEFAULT 0,
+                   best_score REAL,
+                   cancel_requested INTEGER NOT NULL DEFAULT 0,
+                   owner TEXT,
+                   created REAL NOT NULL,
+                   started REAL,
+                   finished REAL,
+                   lease_until REAL)"""
+        )
+        columns = {row["name"] for row in self._db.execute("PRAGMA table_info(jobs)")}
+        if "lease_until" not in columns:
+            # Running rows of older databases have no lease and are re-queued at once
+            self._db.execute("ALTER TABLE jobs ADD COLUMN lease_until REAL")
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, priority, created)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_user ON jobs (user, status)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_finished ON jobs (finished)")
+        # Identifies this process's claims; pids repeat across container restarts, tokens do not
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex}"
+        self._next_maintenance = 0.0
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition()
+        self._stopping = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._watchers: Dict[str, Set[Tuple[asyncio.AbstractEventLoop, asyncio.Event]]] = {}
+
+    def submit(self, request: Dict[str, Any], user: str, priority: int = 0) -> Dict[str, Any]:
+        """Queues a job; `priority` is clamped to JOB_MIN_PRIORITY..JOB_MAX_PRIORITY."""
+        job_id = uuid.uuid4().hex
+        priority = min(max(priority, JOB_MIN_PRIORITY), JOB_MAX_PRIORITY)
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                waiting = self._db.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE user=? AND status=?", (user, QUEUED)
+                ).fetchone()[0]
+                if waiting >= JOBS_PER_USER:
+                    raise QueueFull(f"{user} already has {waiting} queued jobs")
+                self._db.execute(
+                    "INSERT INTO jobs (id, user, priority, status, request, created) VALUES (?, ?, ?, ?, ?, ?)",
+                    (job_id, user, priority, QUEUED, json.dumps(request), time.time()),
+                )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        with self._wakeup:
+            self._wakeup.notify()
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db.execute("SELECT * FROM jobs WHERE id=?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["request"] = json.loads(job["request"])
+        job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+        job["cancel_requested"] = bool(job["cancel_requested"])
+        del job["owner"], job["lease_until"]
+        return job
+
+    def counts(self) -> Dict[str, int]:
+        """Number of jobs in each status."""
+        with self._lock:
+            rows = self._db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        counts = {status: 0 for status in (QUEUED, RUNNING) + FINAL}
+        counts.update((status, count) for status, count in rows)
+        return counts
+
+    def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Cancels a queued job at once; a running job stops at its next progress report."""
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET status=?, finished=? WHERE id=? AND status=?",
+                (CANCELLED, time.time(), job_id, QUEUED),
+            )
+            self._db.execute("UPDATE jobs SET cancel_requested=1 WHERE id=? AND status=?", (job_id, RUNNING))
+        self._notify(job_id)
+        return self.get(job_id)
+
+    async def events(self, job_id: str) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """
+        Yields the job's state now and after every change until it finishes.
+        Yields None after HEARTBEAT seconds without a change.
+        """
+        loop = asyncio.get_running_loop()
+        changed = asyncio.Event()
+        watcher = (loop, changed)
+        with self._lock:
+            self._watchers.setdefault(job_id, set()).add(watcher)
+        try:
+            last, idle = None, 0.0
+            while True:
+                changed.clear()
+                job = await asyncio.to_thread(self.get, job_id)
+                if job is None:
+                    return
+                state = (job["status"], job["progress"], job["best_score"], job["cancel_requested"])
+                if state != last:
+                    last, idle = state, 0.0
+                    yield job
+                    if job["status"] in FINAL:
+                        return
+                elif idle >= HEARTBEAT:
+                    idle = 0.0
+                    yield None
+                # Local jobs wake us immediately; jobs in other processes are polled
+                try:
+                    await asyncio.wait_for(changed.wait(), EVENT_INTERVAL)
+                except asyncio.TimeoutError:
+                    idle += EVENT_INTERVAL
+        finally:
+            with self._lock:
+                watchers = self._watchers.get(job_id)
+                if watchers is not None:
+                    watchers.discard(watcher)
+                    if not watchers:
+                        del self._watchers[job_id]
+
+    def _notify(self, job_id: str) -> None:
+        with self._lock:
+            watchers = list(self._watchers.get(job_id, ()))
+        for loop, changed in watchers:
+            try:
+                loop.call_soon_threadsafe(changed.set)
+            except RuntimeError:  # the watcher's loop has closed
+                pass
+
+    def start(self) -> None:
+        """
+        Re-queues jobs whose lease ran out and starts the worker threads, plus
+        one that renews the leases of this process's running jobs.
+        """
+        self._requeue_expired()
+        self._stopping.clear()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        thread = threading.Thread(target=self._heartbeat, name="job-heartbeat", daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Interrupts running jobs, which go back to the queue for the next process."""
+        self._stopping.set()
+        with self._wakeup:
+            self._wakeup.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _requeue_expired(self) -> None:
+        """Re-queues running jobs whose owner stopped renewing their lease."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id FROM jobs WHERE status=? AND (lease_until IS NULL OR lease_until < ?)",
+                (RUNNING, time.time()),
+            ).fetchall()
+        for row in rows:
+            self._requeue(row["id"], expired=True)
+            logger.info("Re-queued job %s, whose process stopped renewing it", row["id"])
+
+    def _renew_leases(self) -> None:
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET lease_until=? WHERE owner=? AND status=?",
+                (time.time() + JOB_LEASE, self.owner, RUNNING),
+            )
+
+    def _heartbeat(self) -> None:
+        while not self._stopping.wait(JOB_LEASE / 3):
+            try:
+                self._renew_leases()
+            except sqlite3.Error:
+                logger.exception("Could not renew job leases")
+
+    def _requeue(self, job_id: str, expired: bool = False) -> None:
+        """
+        Puts a running job back in the queue: one of this process's jobs, or with
+        `expired` anyone's whose lease is still expired (no late heartbeat won).
+        """
+        if expired:
+            condition, args = "(lease_until IS NULL OR lease_until < ?)", (time.time(),)
+        else:
+            condition, args = "owner=?", (self.owner,)
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET status=?, owner=NULL, started=NULL, lease_until=NULL, progress=0, "
+                f"best_score=NULL WHERE id=? AND status=? AND {condition}",
+                (QUEUED, job_id, RUNNING) + args,
+            )
+        self._notify(job_id)
+
+    def _claim(self) -> Optional[Tuple[str, Dict[str, Any]]]:
+        with self._lock:
+            # An idle queue is seen by a plain (indexed) read; the write lock is
+            # only taken when there is a job to claim, and the pick is redone under it
+            if self._db.execute("SELECT 1 FROM jobs WHERE status=? LIMIT 1", (QUEUED,)).fetchone() is None:
+                return None
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute(
+                    """SELECT id, request FROM jobs AS j WHERE status=?
+                       ORDER BY priority DESC,
+                                (SELECT COUNT(*) FROM jobs WHERE user=j.user AND status=?) ASC,
+                                (SELECT MAX(started) FROM jobs WHERE user=j.user) ASC,
+                                created ASC
+                       LIMIT 1""",
+                    (QUEUED, RUNNING),
+                ).fetchone()
+                if row is not None:
+                    now = time.time()
+                    self._db.execute(
+                        "UPDATE jobs SET status=?, owner=?, started=?, lease_until=? WHERE id=?",
+                        (RUNNING, self.owner, now, now + JOB_LEASE, row["id"]),
+                    )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return (row["id"], json.loads(row["request"])) if row is not None else None
+
+    def _work(self) -> None:
+        while not self._stopping.is_set():
+            self._maintain()
+            claimed = self._claim()
+            if claimed is None:
+                with self._wakeup:
+                    self._wakeup.wait(POLL_INTERVAL)
+                continue
+            self._run(*claimed)
+
+    def _maintain(self) -> None:
+        """
+        At most once per JOB_LEASE / 3 across this process's threads: re-queues
+        expired jobs and deletes finished ones older than JOB_RETENTION.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if now < self._next_maintenance:
+                return
+            self._next_maintenance = now + JOB_LEASE / 3
+        self._requeue_expired()
+        self._purge_finished()
+
+    def _purge_finished(self) -> None:
+        with self._lock:
+            purged = self._db.execute(
+                f"DELETE FROM jobs WHERE finished < ? AND status IN ({', '.join('?' * len(FINAL))})",
+                (time.time() - JOB_RETENTION,) + FINAL,
+            ).rowcount
+        if purged:
+            logger.info("Deleted %d jobs finished over %.0fs ago", purged, JOB_RETENTION)
+
+    def _run(self, job_id: str, request: Dict[str, Any]) -> None:
+        self._notify(job_id)
+
+        def progress(done: int, total: int, best: Optional[float] = None) -> None:
+            if self._stopping.is_set():
+                raise _Interrupted()
+            with self._lock:
+                self._db.execute(
+                    "UPDATE jobs SET progress=?, best_score=COALESCE(?, best_score), lease_until=? "
+                    "WHERE id=? AND owner=?",
+                    (done / total, None if best is None else round(best, 2), time.time() + JOB_LEASE,
+                     job_id, self.owner),
+                )
+                row = self._db.execute(
+                    "SELECT cancel_requested, owner FROM jobs WHERE id=?", (job_id,)
+                ).fetchone()
+            self._notify(job_id)
+            if row is None or row["owner"] != self.owner:
+                # The lease ran out and the job went back to the queue; stop this copy
+                raise _Interrupted()
+            if row["cancel_requested"]:
+                raise JobCancelled()
+
+        try:
+            result = self.runner(request, progress)
+        except _Interrupted:
+            self._requeue(job_id)
+        except JobCancelled:
+            self._finish(job_id, CANCELLED)
+        except Exception as e:
+            logger.exception("Job %s failed", job_id)
+            self._finish(job_id, FAILED, error=str(e) or type(e).__name__)
+        else:
+            self._finish(job_id, DONE, result=result)
+
+    def _finish(self, job_id: str, status: str, result: Optional[Dict[str, Any]] = None,
+                error: Optional[str] = None) -> None:
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET status=?, result=?, error=?, owner=NULL, lease_until=NULL, finished=?, "
+                "progress=MAX(progress, ?) WHERE id=? AND owner=?",
+                (status, json.dumps(result) if result is not None else None, error,
+                 time.time(), 1.0 if status == DONE else 0.0, job_id, self.owner),
+            )
+        self._notify(job_id)
+
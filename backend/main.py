@@ -1,15 +1,154 @@
+import asyncio
 import json
+import logging
 import os
-import requests  # type: ignore
-from typing import List, Dict, Any
-from fastapi import FastAPI, HTTPException  # type: ignore
-from fastapi.middleware.cors import CORSMiddleware  # type: ignore
-from pydantic import BaseModel  # type: ignore
-from backend.docking_engine import calculate_docking
-from functools import lru_cache
+import sys
+from contextlib import asynccontextmanager
+from typing import Callable, List, Dict, Any, Optional, Literal, Tuple
+from backend.startup import lazy_module, startup
+with startup.stage("import fastapi"):
+    from fastapi import FastAPI, HTTPException, Request, Response  # type: ignore
+    from fastapi.concurrency import run_in_threadpool  # type: ignore
+    from fastapi.middleware.cors import CORSMiddleware  # type: ignore
+    from fastapi.responses import StreamingResponse  # type: ignore
+    from pydantic import BaseModel  # type: ignore
+# NumPy-backed modules (fingerprints, rules, scoring) are imported where they are first used
+with startup.stage("import backend"):
+    from backend.catalog import Catalog
+    from backend.docking_engine import ENGINE_VERSION, calculate_docking, default_seed, scoring_params
+    from backend.encoded import EncodedBody, EncodedCache, encode_bytes, encode_json, encoded_response
+    from backend.jobs import JobQueue, QueueFull
+    from backend.metrics import METRICS_DIR_ENV, REGISTRY, Gauge, MetricsMiddleware, stage
+    from backend.result_store import ResultKey, ResultStore
+    from backend.screening import LEADERBOARD_SIZE, StoredLeaderboard, iter_ndjson, scoring_version
+    from backend.structure_cache import StructureCache
+    from backend.supervisor import signal_ready
+    from backend.upstream import ALPHAFOLD_URL, PUBCHEM_URL, CircuitOpenError, SingleFlight, UpstreamClient
+    from backend.warmup import DISABLED, Warmup
+
+# Imported on the first upstream request (its errors are only matched once one is raised)
+httpx = lazy_module("httpx")
+
+# Indexed catalog of proteins and ligands, and its serialized pages
+catalog = Catalog()
+catalog_bodies = EncodedCache("catalog_pages")
+
+# Persistent structure store shared by the structure endpoints
+structure_cache = StructureCache()
+
+# Compressed PDB payloads per receptor version and level of detail
+STRUCTURE_PAYLOAD_CACHE = int(os.environ.get("BIOCANVAS_STRUCTURE_PAYLOAD_CACHE", 32))
+structure_bodies = EncodedCache("structure_payloads", STRUCTURE_PAYLOAD_CACHE)
+
+# Docking results keyed by structure versions, engine version, parameters and seed
+results = ResultStore()
+
+# Pooled upstream client; concurrent fetches of one structure share a request
+upstream = UpstreamClient()
+inflight = SingleFlight()
+
+# Optional prefetch of every catalog structure after startup, reported by /health
+warmup = Warmup()
+
+# Resolved AlphaFold versions are rechecked once a day
+ALPHAFOLD_VERSION_TTL = 24 * 3600
+
+# Scoring used by /dock when the request does not choose one
+SCORING_MODE = os.environ.get("BIOCANVAS_SCORING_MODE", "educational")
+
+# Detect pockets for the whole protein catalog in the background at startup
+PRECOMPUTE_POCKETS = os.environ.get("BIOCANVAS_PRECOMPUTE_POCKETS", "").lower() in ("1", "true", "yes", "on")
+
+# Shared snapshot directory of the supervisor's workers; /metrics merges them all
+METRICS_DIR = os.environ.get(METRICS_DIR_ENV) or None
+
+# Catalog page size pre-serialized at startup; matches the frontends' selectbox pages
+WARM_PAGE_SIZE = 50
+
+# Largest catalog page (/proteins, /ligands); also the page size when no limit is given
+MAX_PAGE_SIZE = int(os.environ.get("BIOCANVAS_MAX_PAGE_SIZE", 1000))
+
+logger = logging.getLogger("biocanvas")
+
+# The server's event loop; job threads use it to reach the async upstream client
+main_loop: Optional[asyncio.AbstractEventLoop] = None
+
+async def startup_background(fn: Callable[[], None]) -> None:
+    """Runs a post-ready warm-up step in the threadpool, recorded as a startup stage."""
+    with startup.stage(fn.__name__):
+        try:
+            await run_in_threadpool(fn)
+        except Exception:
+            logger.exception("%s failed; its caches fill on first use", fn.__name__)
+
+def warm_caches() -> None:
+    """Imports the catalog and serializes its default pages: what the frontends load first."""
+    for table, filter_column in (("proteins", "category"), ("ligands", "type")):
+        for limit in (MAX_PAGE_SIZE, WARM_PAGE_SIZE):
+            catalog_body(table, limit, 0, {filter_column: None}, None)
+
+def warm_scoring() -> None:
+    """
+    Runs once the worker is serving, before it signals ready: compiles the
+    interaction rules, maps converted receptors and clears shared arrays that
+    are superseded or over budget.
+    """
+    from backend.rules import rule_table
+    rule_table().current()
+    from backend.structure_format import preload_structures
+    preload_structures()
+    from backend.shared_arrays import shared_store
+    shared_store().collect()
+
+async def warm_then_signal() -> None:
+    """
+    Requests are served from here on, but the supervisor only counts the
+    worker as ready (and, in a rolling restart, only retires its predecessor)
+    once scoring is warm. The catalog warm-up runs after that, outside
+    BIOCANVAS_READY_TIMEOUT: it is serialized across workers and grows with
+    the catalog, so a load balancer that should wait for it polls
+    /health?warm=true instead.
+    """
+    await startup_background(warm_scoring)
+    signal_ready(startup.ready())
+    with startup.stage("warmup"):
+        await warmup.run(warmup_tasks())
+    if warmup.state != DISABLED:
+        # The warm-up fetched every SDF; fingerprint them before the first similarity search
+        start_ligand_indexing()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global main_loop
+    main_loop = asyncio.get_running_loop()
+    with startup.stage("warm_caches"):
+        await run_in_threadpool(warm_caches)
+    with startup.stage("jobs"):
+        jobs.start()
+    if METRICS_DIR:
+        REGISTRY.start_flushing(METRICS_DIR)
+    background = [asyncio.create_task(warm_then_signal())]
+    if PRECOMPUTE_POCKETS:
+        background.append(asyncio.create_task(precompute_pockets()))
+    yield
+    for task in background:
+        task.cancel()
+    if ligand_indexing is not None:
+        ligand_indexing.cancel()
+    await run_in_threadpool(jobs.stop)
+    if METRICS_DIR:
+        REGISTRY.stop_flushing(METRICS_DIR)
+    await upstream.aclose()
+    if "backend.pose_search" in sys.modules:
+        sys.modules["backend.pose_search"].shutdown_executor()
+    if "backend.shared_arrays" in sys.modules:
+        sys.modules["backend.shared_arrays"].shared_store().close()
 
 # Initialize FastAPI app
-app = FastAPI(title="BIOCANVAS API")
+app = FastAPI(title="BIOCANVAS API", lifespan=lifespan)
+
+# Request counts and latency per route; X-Profile requests get a Server-Timing header
+app.add_middleware(MetricsMiddleware)
 
 # Configure CORS to allow frontend communication
 app.add_middleware(
@@ -38,100 +177,674 @@ class Ligand(BaseModel):
 class DockingRequest(BaseModel):
     protein_id: int
     ligand_id: int
+    mode: Optional[Literal["educational", "physics"]] = None
+    seed: Optional[int] = None
+
+class BatchPair(BaseModel):
+    """One pair of a batch; batches are always scored with the curated table, so a `mode` is rejected."""
+    model_config = {"extra": "forbid"}
+
+    protein_id: int
+    ligand_id: int
+    seed: Optional[int] = None
 
-# Data Loading Helper with caching
-@lru_cache(maxsize=128)
+class BatchDockingRequest(BaseModel):
+    pairs: List[BatchPair]
+    top_k: Optional[int] = None
+
+class JobRequest(DockingRequest):
+    priority: int = 0
+
+class ScreenRequest(BaseModel):
+    protein_ids: Optional[List[int]] = None
+    ligand_ids: Optional[List[int]] = None
+    top_k: Optional[int] = None
+
+# Best ligands per protein across all batch runs and screens, kept in the
+# result store's database so every worker serves the same board
+leaderboard = StoredLeaderboard(results)
+
+def check_top_k(k: Optional[int], name: str = "top_k") -> None:
+    """Rankings hold at most LEADERBOARD_SIZE ligands per protein; larger requests are rejected."""
+    if k is not None and not 1 <= k <= LEADERBOARD_SIZE:
+        raise HTTPException(status_code=422, detail=f"{name} must be between 1 and {LEADERBOARD_SIZE}")
+
+# Data Loading Helper backed by the catalog store
 def load_data(filename: str) -> List[Dict[str, Any]]:
-    """Load JSON data from the data/ folder with caching for performance."""
-    try:
-        # Construct absolute path to data folder (one level up from backend/)
-        data_path = os.path.join(os.path.dirname(__file__), "..", "data", filename)
-        with open(data_path, "r") as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        return []
+    """Load every entry of a data/ file; reloaded automatically when the file changes."""
+    table = os.path.splitext(filename)[0]
+    return catalog.list(table)[0]
 
 # API Endpoints
 @app.get("/health")
-def health_check():
-    """Health check endpoint for backend readiness."""
-    return {"status": "healthy", "service": "BIOCANVAS API"}
+def health_check(response: Response, warm: bool = False):
+    """
+    Health check endpoint for backend readiness, with catalog warm-up progress.
+    With ?warm=true it answers 503 until the warm-up has finished.
+    """
+    if warm and not warmup.warm:
+        response.status_code = 503
+    return {
+        "status": "healthy" if warmup.warm else "warming",
+        "service": "BIOCANVAS API",
+        "warmup": warmup.status(),
+        "startup": startup.report(),
+    }
+
+STRUCTURE_CACHE_BYTES = Gauge("biocanvas_structure_cache_bytes", "Bytes held by the structure store.", shared=True)
+JOBS_BY_STATUS = Gauge("biocanvas_jobs", "Docking jobs in the shared queue by status.", ("status",), shared=True)
+
+@app.get("/metrics")
+def get_metrics() -> Response:
+    """
+    Prometheus metrics of every worker under the supervisor, merged from their
+    snapshots by whichever worker handles the scrape (this process alone
+    when run without the supervisor).
+    """
+    STRUCTURE_CACHE_BYTES.set(structure_cache.total_bytes())
+    for status, count in jobs.counts().items():
+        JOBS_BY_STATUS.labels(status).set(count)
+    return Response(REGISTRY.render(METRICS_DIR), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+def catalog_page(table: str, request: Request, limit: Optional[int], offset: int,
+                 filters: Dict[str, Any], q: Optional[str]) -> Response:
+    """
+    One page of a catalog table, serialized and compressed once per data
+    version; the full match count goes in X-Total-Count. Pages hold at most
+    MAX_PAGE_SIZE entries, which is also the default.
+    """
+    if (limit is not None and limit < 0) or offset < 0:
+        raise HTTPException(status_code=422, detail="limit and offset must not be negative")
+    if limit is not None and limit > MAX_PAGE_SIZE:
+        raise HTTPException(status_code=422, detail=f"limit must be at most {MAX_PAGE_SIZE}")
+    if limit is None:
+        limit = MAX_PAGE_SIZE
+
+    return encoded_response(request, catalog_body(table, limit, offset, filters, q))
+
+def catalog_body(table: str, limit: Optional[int], offset: int,
+                 filters: Dict[str, Any], q: Optional[str]) -> EncodedBody:
+    def build():
+        items, total = catalog.list(table, limit=limit, offset=offset, filters=filters, prefix=q)
+        return encode_json(items, {"X-Total-Count": str(total)})
+
+    key = (table, catalog.version(table), limit, offset, tuple(sorted(filters.items())), q)
+    return catalog_bodies.get_or_build(key, build)
+
+def catalog_entry(table: str, column: str, value: Any) -> Dict[str, Any]:
+    entry = catalog.get(table, column, value)
+    if entry is None:
+        raise HTTPException(status_code=404, detail=f"No {table[:-1]} with {column} {value}")
+    return entry
 
 @app.get("/proteins", response_model=List[Protein])
-def get_proteins():
-    """Returns the curated list of proteins available for docking."""
-    return load_data("proteins.json")
+def get_proteins(request: Request, limit: Optional[int] = None, offset: int = 0,
+                 category: Optional[str] = None, q: Optional[str] = None):
+    """Returns the curated list of proteins available for docking (paginated, filterable)."""
+    return catalog_page("proteins", request, limit, offset, {"category": category}, q)
+
+@app.get("/proteins/uniprot/{uniprot_id}", response_model=Protein)
+def get_protein_by_uniprot(uniprot_id: str):
+    return catalog_entry("proteins", "uniprot_id", uniprot_id)
+
+@app.get("/proteins/{protein_id}", response_model=Protein)
+def get_protein(protein_id: int):
+    return catalog_entry("proteins", "id", protein_id)
 
 @app.get("/ligands", response_model=List[Ligand])
-def get_ligands():
-    """Returns the library of small molecule ligands."""
-    return load_data("ligands.json")
+def get_ligands(request: Request, limit: Optional[int] = None, offset: int = 0,
+                type: Optional[str] = None, q: Optional[str] = None):
+    """Returns the library of small molecule ligands (paginated, filterable)."""
+    return catalog_page("ligands", request, limit, offset, {"type": type}, q)
+
+@app.get("/ligands/cid/{cid}", response_model=Ligand)
+def get_ligand_by_cid(cid: int):
+    return catalog_entry("ligands", "pubchem_cid", cid)
+
+@app.get("/ligands/{ligand_id}", response_model=Ligand)
+def get_ligand(ligand_id: int):
+    return catalog_entry("ligands", "id", ligand_id)
+
+# Ligands fetched and fingerprinted per step of the background library index
+FINGERPRINT_CHUNK = 64
+
+# Seconds between reloads of the index file while another worker builds it
+FINGERPRINT_RELOAD = 10.0
+
+# Background task filling the fingerprint index, started by the first similarity search
+ligand_indexing: Optional[asyncio.Task] = None
+
+async def index_ligands(fingerprints, cids: List[int]) -> None:
+    """
+    Fetches SDFs through the structure store and fingerprints them. Ligands
+    PubChem has no 3D structure for are marked unavailable; transient
+    upstream failures are left to be retried.
+    """
+    async def fetch(cid: int) -> Optional[Tuple[int, Optional[bytes]]]:
+        try:
+            return cid, await fetch_cached("pubchem", str(cid), "3d", pubchem_sdf_url(cid), timeout=10)
+        except HTTPException as e:
+            return (cid, None) if e.status_code == 404 else None
+        except (httpx.HTTPError, CircuitOpenError):
+            return None
+
+    fetched = [record for record in await asyncio.gather(*(fetch(cid) for cid in cids)) if record]
+    fingerprints.mark_unavailable(cid for cid, sdf in fetched if sdf is None)
+    await run_in_threadpool(fingerprints.add_sdfs, [(cid, sdf) for cid, sdf in fetched if sdf is not None])
+
+async def index_ligand_library() -> None:
+    """
+    Fingerprints every catalog ligand not yet in the index, FINGERPRINT_CHUNK
+    at a time so searches see the index grow. Only one worker process builds
+    and saves it; the others reload the saved file until the builder is done,
+    then index whatever it left out. The index counts as complete for the
+    catalog version once every ligand is indexed or unavailable.
+    """
+    from backend.fingerprints import SAVE_INTERVAL, fingerprint_index
+    fingerprints = await run_in_threadpool(fingerprint_index)
+    version = catalog.version("ligands")
+    if fingerprints.complete_for == version:
+        return
+    while not fingerprints.acquire_builder():
+        await run_in_threadpool(fingerprints.reload)
+        await asyncio.sleep(FINGERPRINT_RELOAD)
+    try:
+        await run_in_threadpool(fingerprints.reload)
+        cids = [ligand["pubchem_cid"] for ligand in load_data("ligands.json")]
+        missing = fingerprints.missing(cids)
+        for start in range(0, len(missing), FINGERPRINT_CHUNK):
+            await index_ligands(fingerprints, missing[start:start + FINGERPRINT_CHUNK])
+            await run_in_threadpool(fingerprints.save, SAVE_INTERVAL)
+        await run_in_threadpool(fingerprints.save)
+    finally:
+        fingerprints.release_builder()
+    if not fingerprints.missing(cids):
+        fingerprints.complete_for = version
+
+def start_ligand_indexing() -> None:
+    """Starts index_ligand_library in the background unless it is already running."""
+    global ligand_indexing
+
+    async def run() -> None:
+        try:
+            await index_ligand_library()
+        except Exception:
+            logger.exception("Indexing the ligand library failed; the next similarity search retries")
+
+    if ligand_indexing is None or ligand_indexing.done():
+        ligand_indexing = asyncio.create_task(run())
+
+@app.get("/ligands/{ligand_id}/similar")
+async def get_similar_ligands(ligand_id: int, response: Response, k: int = 10) -> List[Dict[str, Any]]:
+    """
+    Library ligands most similar to this one by fingerprint Tanimoto
+    similarity, best first. Searches whatever is indexed so far while the
+    library is indexed in the background; X-Index-Complete says whether
+    that covered the whole catalog.
+    """
+    if k < 1:
+        raise HTTPException(status_code=422, detail="k must be positive")
+    cid = catalog_entry("ligands", "id", ligand_id)["pubchem_cid"]
+    from backend.fingerprints import fingerprint_index
+    fingerprints = await run_in_threadpool(fingerprint_index)
+    start_ligand_indexing()
+    if fingerprints.get(cid) is None and cid not in fingerprints.unavailable:
+        await index_ligands(fingerprints, [cid])
+    query = fingerprints.get(cid)
+    if query is None:
+        raise HTTPException(status_code=404, detail=f"No 3D structure to fingerprint for CID {cid}")
+
+    similar = []
+    for match_cid, similarity in await run_in_threadpool(fingerprints.search, query, k, cid):
+        entry = catalog.get("ligands", "pubchem_cid", match_cid)
+        if entry is not None:
+            similar.append({**entry, "similarity": round(similarity, 3)})
+    complete = fingerprints.complete_for == catalog.version("ligands")
+    response.headers["X-Index-Complete"] = "true" if complete else "false"
+    return similar
+
+async def fetch_cached(source: str, ident: str, version: str, url: str, timeout: float) -> bytes:
+    """
+    Returns the upstream file from the structure store, downloading it on a miss.
+    404s are cached negatively; offline mode never contacts the upstream.
+    Concurrent misses for the same key share a single download.
+    """
+    entry = structure_cache.lookup(source, ident, version)
+    if entry is not None:
+        if entry.negative:
+            raise HTTPException(status_code=404, detail="Structure not found")
+        return entry.data
+    if structure_cache.offline:
+        raise HTTPException(status_code=503, detail="Offline mode: structure not cached")
+
+    async def download() -> bytes:
+        response = await upstream.get(url, timeout=timeout)
+        if response.status_code == 404:
+            await asyncio.to_thread(structure_cache.put_negative, source, ident, version)
+            raise HTTPException(status_code=404, detail="Structure not found")
+        if response.status_code != 200:
+            raise HTTPException(status_code=502, detail=f"Upstream returned {response.status_code}")
+        await asyncio.to_thread(structure_cache.put, source, ident, version, response.content)
+        return response.content
+
+    return await inflight.do((source, ident, version), download)
+
+async def resolve_alphafold_version(uniprot_id: str) -> str:
+    """Looks up the latest AlphaFold model version, falling back to v4."""
+    entry = structure_cache.lookup("alphafold-api", uniprot_id, "latest")
+    if entry is not None and not entry.negative:
+        return entry.data.decode()
+    if structure_cache.offline:
+        return "4"
+
+    async def query() -> str:
+        try:
+            api_response = await upstream.get(
+                f"{ALPHAFOLD_URL}/api/prediction/{uniprot_id}",
+                timeout=10
+            )
+            if api_response.status_code != 200:
+                return "4"
+            version = str(api_response.json()[0]['latestVersion'])
+        except (httpx.HTTPError, CircuitOpenError, KeyError, IndexError, ValueError):
+            return "4"
+        await asyncio.to_thread(
+            structure_cache.put, "alphafold-api", uniprot_id, "latest",
+            version.encode(), ALPHAFOLD_VERSION_TTL
+        )
+        return version
+
+    return await inflight.do(("alphafold-api", uniprot_id), query)
+
+def alphafold_pdb_url(uniprot_id: str, version: str) -> str:
+    return f"{ALPHAFOLD_URL}/files/AF-{uniprot_id}-F1-model_v{version}.pdb"
+
+def pubchem_sdf_url(cid: int) -> str:
+    return f"{PUBCHEM_URL}/rest/pug/compound/cid/{cid}/SDF?record_type=3d"
 
 @app.get("/structure/{uniprot_id}")
-def get_structure(uniprot_id: str) -> Dict[str, str]:
+async def get_structure(uniprot_id: str) -> Dict[str, str]:
     """Generates the direct download link for the AlphaFold 3D structure."""
+    version = await resolve_alphafold_version(uniprot_id)
+    pdb_url = alphafold_pdb_url(uniprot_id, version)
     try:
-        # Query AlphaFold API to get latest version
-        api_response = requests.get(
-            f"https://alphafold.ebi.ac.uk/api/prediction/{uniprot_id}", 
-            timeout=10
-        )
-        if api_response.status_code == 200:
-            data = api_response.json()[0]
-            latest_version = data['latestVersion']
-            pdb_url = f"https://alphafold.ebi.ac.uk/files/AF-{uniprot_id}-F1-model_v{latest_version}.pdb"
-            
-            # Verify URL is accessible
-            verify_response = requests.head(pdb_url, timeout=5)
-            if verify_response.status_code != 200:
-                raise Exception("PDB file not accessible")
-        else:
-            # Fallback to v4 and verify
-            pdb_url = f"https://alphafold.ebi.ac.uk/files/AF-{uniprot_id}-F1-model_v4.pdb"
-            verify_response = requests.head(pdb_url, timeout=5)
-            if verify_response.status_code != 200:
-                raise HTTPException(status_code=404, detail="Structure not found")
-    except (requests.exceptions.RequestException, KeyError, IndexError) as e:
-        # Final fallback to v4
-        pdb_url = f"https://alphafold.ebi.ac.uk/files/AF-{uniprot_id}-F1-model_v4.pdb"
-    
+        # Downloading once into the store doubles as the accessibility check
+        await fetch_cached("alphafold", uniprot_id, f"v{version}", pdb_url, timeout=15)
+    except (httpx.HTTPError, CircuitOpenError):
+        # Upstream unreachable: hand out the URL and let the client try
+        pass
+
     return {"uniprot_id": uniprot_id, "pdb_url": pdb_url}
 
+def find_entry(filename: str, entry_id: int) -> Dict[str, Any]:
+    entry = catalog.get(os.path.splitext(filename)[0], "id", entry_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail=f"Unknown id {entry_id} in {filename}")
+    return entry
+
+def receptor_key(uniprot_id: str, version: str) -> str:
+    """Identifies one version of an AlphaFold model in the derived-data caches."""
+    return f"{uniprot_id}-v{version}"
+
+async def load_receptor(uniprot_id: str, version: str) -> bytes:
+    """Fetches an AlphaFold PDB, mapping upstream outages to 503."""
+    try:
+        return await fetch_cached("alphafold", uniprot_id, f"v{version}",
+                                  alphafold_pdb_url(uniprot_id, version), timeout=15)
+    except (httpx.HTTPError, CircuitOpenError) as e:
+        raise HTTPException(status_code=503, detail=f"Structure service unavailable: {str(e)}")
+
+async def load_complex(protein_id: int, ligand_id: int) -> Dict[str, str]:
+    """Fetches the receptor PDB and ligand SDF needed for physics scoring."""
+    protein = find_entry("proteins.json", protein_id)
+    ligand = find_entry("ligands.json", ligand_id)
+    uniprot_id = protein["uniprot_id"]
+    cid = ligand["pubchem_cid"]
+    version = await resolve_alphafold_version(uniprot_id)
+    try:
+        pdb, sdf = await asyncio.gather(
+            load_receptor(uniprot_id, version),
+            fetch_cached("pubchem", str(cid), "3d", pubchem_sdf_url(cid), timeout=10),
+        )
+    except (httpx.HTTPError, CircuitOpenError) as e:
+        raise HTTPException(status_code=503, detail=f"Structure service unavailable: {str(e)}")
+    return {
+        "receptor_key": receptor_key(uniprot_id, version),
+        "receptor_pdb": pdb.decode(),
+        "ligand_sdf": sdf.decode(),
+    }
+
+def compute_pockets(key: str, pdb: bytes) -> bytes:
+    """Runs pocket detection on a receptor and returns the ranked pockets as JSON."""
+    from backend.pockets import find_pockets
+    from backend.structure_format import receptor_atoms
+    return json.dumps(find_pockets(receptor_atoms(key, pdb.decode))).encode()
+
+async def pockets_for(uniprot_id: str) -> Tuple[str, List[Dict[str, Any]]]:
+    """
+    Returns the structure version and its ranked pockets, computing them once
+    per version. Only catalog proteins are searched, since a cold search
+    costs seconds of CPU per model.
+    """
+    from backend.pockets import POCKET_ALGORITHM_VERSION
+    catalog_entry("proteins", "uniprot_id", uniprot_id)
+    version = await resolve_alphafold_version(uniprot_id)
+    key = receptor_key(uniprot_id, version)
+    entry = structure_cache.lookup("pockets", key, POCKET_ALGORITHM_VERSION)
+    if entry is not None and not entry.negative:
+        return version, json.loads(entry.data)
+
+    async def compute() -> bytes:
+        pdb = await load_receptor(uniprot_id, version)
+        data = await run_in_threadpool(compute_pockets, key, pdb)
+        await asyncio.to_thread(structure_cache.put, "pockets", key, POCKET_ALGORITHM_VERSION, data)
+        return data
+
+    data = await inflight.do(("pockets", key), compute)
+    return version, json.loads(data)
+
+async def precompute_pockets() -> None:
+    """Fills the pocket cache for every catalog protein, one at a time."""
+    for protein in load_data("proteins.json"):
+        try:
+            await pockets_for(protein["uniprot_id"])
+        except HTTPException as e:
+            logger.warning("Pocket precompute skipped %s: %s", protein["uniprot_id"], e.detail)
+
+def prepare_receptor(key: str, pdb: bytes) -> None:
+    """Maps a receptor's atoms and builds its spatial index and scoring grids."""
+    from backend.scoring import get_grids
+    from backend.spatial_index import receptor_index
+    receptor_index(key, pdb.decode)
+    get_grids(key, pdb.decode)
+
+async def warm_protein(uniprot_id: str) -> None:
+    version = await resolve_alphafold_version(uniprot_id)
+    pdb = await load_receptor(uniprot_id, version)
+    await run_in_threadpool(prepare_receptor, receptor_key(uniprot_id, version), pdb)
+
+async def warm_ligand(cid: int) -> None:
+    await fetch_cached("pubchem", str(cid), "3d", pubchem_sdf_url(cid), timeout=10)
+
+def warmup_tasks() -> List[Tuple[str, str, Callable[[], Any]]]:
+    """One warm-up task per catalog protein and ligand."""
+    tasks = [("protein", p["uniprot_id"], lambda u=p["uniprot_id"]: warm_protein(u))
+             for p in load_data("proteins.json")]
+    tasks += [("ligand", str(l["pubchem_cid"]), lambda c=l["pubchem_cid"]: warm_ligand(c))
+              for l in load_data("ligands.json")]
+    return tasks
+
+def structure_payload(key: str, pdb: bytes, detail: str, residues: Optional[List[Tuple[str, int]]]) -> EncodedBody:
+    """The PDB body served for one level of detail; "full" is the AlphaFold file itself."""
+    if detail == "full":
+        raw = pdb
+    else:
+        from backend.structure_format import receptor_atoms
+        from backend.structures import format_pdb_atoms, select_detail
+        raw = format_pdb_atoms(select_detail(receptor_atoms(key, pdb.decode), detail, residues))
+    return encode_bytes(raw, {"X-Structure-Detail": detail}, gzip_level=6, brotli_quality=5)
+
+@app.get("/structure/{uniprot_id}/pdb")
+async def get_structure_pdb(uniprot_id: str, request: Request,
+                            detail: Literal["full", "backbone", "ca", "pocket"] = "full",
+                            pocket: int = 1) -> Response:
+    """
+    Serves the AlphaFold model itself, gzip/brotli-compressed with ETags and
+    byte ranges. Lower levels of detail ("ca" trace, "backbone", or the
+    residues lining pocket rank `pocket`) let viewers draw a coarse model first.
+    """
+    version = await resolve_alphafold_version(uniprot_id)
+    key = receptor_key(uniprot_id, version)
+    body_key = (key, detail, pocket if detail == "pocket" else None)
+    body = structure_bodies.get(body_key)
+    if body is None:
+        pdb = await load_receptor(uniprot_id, version)
+        residues = None
+        if detail == "pocket":
+            _, pockets = await pockets_for(uniprot_id)
+            ranked = [p for p in pockets if p["rank"] == pocket]
+            if not ranked:
+                raise HTTPException(status_code=404, detail=f"No pocket {pocket} in {uniprot_id}")
+            residues = [(r["chain"], r["res_seq"]) for r in ranked[0]["residues"]]
+        body = await run_in_threadpool(structure_payload, key, pdb, detail, residues)
+        structure_bodies.put(body_key, body)
+    return encoded_response(request, body, media_type="chemical/x-pdb")
+
+@app.get("/pockets/{uniprot_id}")
+async def get_pockets(uniprot_id: str) -> Dict[str, Any]:
+    """Ranked candidate binding pockets in the AlphaFold model of a protein."""
+    version, pockets = await pockets_for(uniprot_id)
+    return {"uniprot_id": uniprot_id, "alphafold_version": version, "pockets": pockets}
+
+def current_rules():
+    """One snapshot of the interaction rules, used for both a request's result keys and its scores."""
+    from backend.rules import rule_table
+    return rule_table().current()
+
+def educational_keys(rules) -> Callable[[int, int, Optional[int]], ResultKey]:
+    """
+    Builds result keys for curated-table scoring. Each catalog entry is looked
+    up once per builder, so screens stay cheap; the UniProt id and PubChem CID
+    stand in for structure versions, and `rules` (the snapshot the results
+    are scored with) for the rule table's version.
+    """
+    versions: Dict[Tuple[str, int], str] = {}
+    params = scoring_params("educational", rules.version)
+
+    def version(table: str, entry_id: int) -> str:
+        if (table, entry_id) not in versions:
+            entry = catalog.get(table, "id", entry_id)
+            column = "uniprot_id" if table == "proteins" else "pubchem_cid"
+            versions[(table, entry_id)] = str(entry[column]) if entry is not None else ""
+        return versions[(table, entry_id)]
+
+    def key_for(protein_id: int, ligand_id: int, seed: Optional[int] = None) -> ResultKey:
+        return ResultKey(
+            protein_id, ligand_id, version("proteins", protein_id), version("ligands", ligand_id),
+            ENGINE_VERSION, params,
+            default_seed(protein_id, ligand_id) if seed is None else seed,
+        )
+
+    return key_for
+
+async def physics_key(protein_id: int, ligand_id: int, seed: Optional[int] = None) -> ResultKey:
+    """Result key for grid scoring, which depends on the AlphaFold model version."""
+    protein = find_entry("proteins.json", protein_id)
+    ligand = find_entry("ligands.json", ligand_id)
+    version = await resolve_alphafold_version(protein["uniprot_id"])
+    return ResultKey(
+        protein_id, ligand_id, receptor_key(protein["uniprot_id"], version),
+        f"{ligand['pubchem_cid']}-3d", ENGINE_VERSION, scoring_params("physics"),
+        default_seed(protein_id, ligand_id) if seed is None else seed,
+    )
+
+def educational_docking(protein_id: int, ligand_id: int, seed: Optional[int] = None) -> Dict[str, Any]:
+    rules = current_rules()
+    key = educational_keys(rules)(protein_id, ligand_id, seed)
+    result = results.get(key)
+    if result is None:
+        with stage("dock_educational"):
+            result = calculate_docking(protein_id, ligand_id, seed=key.seed, rules=rules)
+        results.put(key, result)
+    return result
+
 @app.post("/dock")
-def dock_protein_ligand(request: DockingRequest) -> Dict[str, Any]:
+async def dock_protein_ligand(request: DockingRequest) -> Dict[str, Any]:
     """Performs educational docking simulation between a protein and ligand."""
-    return calculate_docking(request.protein_id, request.ligand_id)
+    mode = request.mode or SCORING_MODE
+    if mode != "physics":
+        return await run_in_threadpool(educational_docking, request.protein_id, request.ligand_id, request.seed)
+
+    key = await physics_key(request.protein_id, request.ligand_id, request.seed)
+    result = await asyncio.to_thread(results.get, key)
+    if result is not None:
+        return result
+
+    async def compute() -> Dict[str, Any]:
+        structures = await load_complex(request.protein_id, request.ligand_id)
+        result = await run_in_threadpool(
+            calculate_docking, request.protein_id, request.ligand_id, key.seed, mode, **structures
+        )
+        await asyncio.to_thread(results.put, key, result)
+        return result
+
+    return await inflight.do(("dock", key), compute)
+
+def run_docking_job(request: Dict[str, Any], progress) -> Dict[str, Any]:
+    """
+    Runs one queued /jobs request in a job worker thread. Educational runs
+    report progress only before and after scoring, which is where a
+    cancellation takes effect.
+    """
+    protein_id, ligand_id, seed = request["protein_id"], request["ligand_id"], request.get("seed")
+    mode = request.get("mode") or SCORING_MODE
+    if mode != "physics":
+        progress(0, 1)
+        result = educational_docking(protein_id, ligand_id, seed)
+        progress(1, 1, result["score"])
+        return result
+
+    def run(coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, main_loop).result()
+
+    key = run(physics_key(protein_id, ligand_id, seed))
+    result = results.get(key)
+    if result is None:
+        structures = run(load_complex(protein_id, ligand_id))
+        result = calculate_docking(protein_id, ligand_id, key.seed, mode, progress=progress, **structures)
+        results.put(key, result)
+    return result
+
+# Persistent docking job queue shared by all worker processes
+jobs = JobQueue(run_docking_job)
+
+def job_or_404(job: Optional[Dict[str, Any]], job_id: str) -> Dict[str, Any]:
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"No job {job_id}")
+    return job
+
+@app.post("/jobs", status_code=202)
+def submit_job(request: JobRequest, http_request: Request) -> Dict[str, Any]:
+    """
+    Queues a docking run and returns its job id at once. Jobs are fair-shared
+    between users (the X-User header, or the client address); `priority` is
+    capped by BIOCANVAS_JOB_MAX_PRIORITY, and the job shows the one applied.
+    """
+    catalog_entry("proteins", "id", request.protein_id)
+    catalog_entry("ligands", "id", request.ligand_id)
+    user = http_request.headers.get("x-user") or (http_request.client.host if http_request.client else "anonymous")
+    try:
+        return jobs.submit(request.model_dump(exclude={"priority"}), user, request.priority)
+    except QueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e))
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str) -> Dict[str, Any]:
+    """Status, progress, best score so far and, once done, the result of a job."""
+    return job_or_404(jobs.get(job_id), job_id)
+
+@app.get("/jobs/{job_id}/events")
+def job_events(job_id: str) -> StreamingResponse:
+    """Server-sent events: the job's state after every change, until it finishes."""
+    job_or_404(jobs.get(job_id), job_id)
+
+    async def stream():
+        async for job in jobs.events(job_id):
+            if job is None:
+                yield b": keep-alive\n\n"
+            else:
+                yield f"event: {job['status']}\ndata: {json.dumps(job)}\n\n".encode()
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache"})
+
+@app.delete("/jobs/{job_id}")
+def cancel_job(job_id: str) -> Dict[str, Any]:
+    """Cancels a queued or running job; finished jobs are returned unchanged."""
+    return job_or_404(jobs.cancel(job_id), job_id)
+
+@app.post("/dock/batch")
+def dock_batch(request: BatchDockingRequest) -> StreamingResponse:
+    """Docks a list of protein-ligand pairs, streaming one NDJSON line per result."""
+    check_top_k(request.top_k)
+    pairs = [(pair.protein_id, pair.ligand_id, pair.seed) for pair in request.pairs]
+    rules = current_rules()
+    return StreamingResponse(
+        iter_ndjson(pairs, leaderboard, request.top_k, results, educational_keys(rules), rules),
+        media_type="application/x-ndjson"
+    )
+
+@app.post("/screen")
+def screen(request: ScreenRequest) -> StreamingResponse:
+    """
+    Docks every selected protein against every selected ligand (the whole
+    catalog by default), streaming one NDJSON line per result.
+    """
+    check_top_k(request.top_k)
+    protein_ids = catalog.ids("proteins")
+    ligand_ids = catalog.ids("ligands")
+    for requested, known, kind in (
+        (request.protein_ids, protein_ids, "protein"),
+        (request.ligand_ids, ligand_ids, "ligand"),
+    ):
+        unknown = sorted(set(requested or []) - set(known))
+        if unknown:
+            raise HTTPException(status_code=404, detail=f"Unknown {kind} ids: {unknown}")
+    if request.protein_ids is not None:
+        protein_ids = request.protein_ids
+    if request.ligand_ids is not None:
+        ligand_ids = request.ligand_ids
+
+    pairs = ((p, l, None) for p in protein_ids for l in ligand_ids)
+    rules = current_rules()
+    return StreamingResponse(
+        iter_ndjson(pairs, leaderboard, request.top_k, results, educational_keys(rules), rules),
+        media_type="application/x-ndjson"
+    )
+
+@app.get("/results/export")
+def export_results(engine_version: Optional[str] = None) -> StreamingResponse:
+    """
+    Streams every stored docking result with its full key as NDJSON, ordered
+    by protein and ligand; engine_version restricts it to one engine.
+    """
+    def lines():
+        for row in results.export(engine_version):
+            yield (json.dumps(row) + "\n").encode()
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@app.get("/leaderboard/{protein_id}")
+def get_leaderboard(protein_id: int, k: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Returns the best-scoring ligands docked against a protein so far, across all workers."""
+    check_top_k(k, "k")
+    return leaderboard.top(protein_id, k, scoring_version(current_rules()))
 
 @app.get("/ligand-structure/{cid}")
-def get_ligand_structure(cid: int) -> Dict[str, str]:
+async def get_ligand_structure(cid: int) -> Dict[str, str]:
     """
     Fetches 3D coordinates (SDF format) for ligand visualization from PubChem.
     Returns the raw SDF data containing atomic positions and bonds.
     """
-    # Construct PubChem API URL for 3D structure
-    url = f"https://pubchem.ncbi.nlm.nih.gov/rest/pug/compound/cid/{cid}/SDF?record_type=3d"
-    
     try:
-        # Fetch data from PubChem
-        response = requests.get(url, timeout=10)
-        
-        # Validate response
-        if response.status_code != 200:
+        sdf = await fetch_cached("pubchem", str(cid), "3d", pubchem_sdf_url(cid), timeout=10)
+    except HTTPException as e:
+        if e.status_code == 404:
             raise HTTPException(
                 status_code=404, 
                 detail=f"Structure not found in PubChem for CID {cid}"
             )
-        
-        # Return SDF data
-        return {"sdf_data": response.text}
-        
-    except requests.exceptions.Timeout:
+        raise
+    except httpx.TimeoutException:
         raise HTTPException(
             status_code=504, 
             detail="PubChem request timed out"
         )
-    except requests.exceptions.RequestException as e:
+    except (httpx.HTTPError, CircuitOpenError) as e:
         raise HTTPException(
             status_code=503, 
             detail=f"PubChem service unavailable: {str(e)}"
         )
+
+    # Return SDF data
+    return {"sdf_data": sdf.decode()}
@@ -0,0 +1,393 @@
+# In-process metrics in Prometheus text format, merged across workers, plus opt-in per-request timing breakdowns
+import bisect
+import contextvars
+import glob
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds, from cache hits to full physics docking runs
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Requests carrying this header get a Server-Timing header with their stage timings
+PROFILE_HEADER = "x-profile"
+
+# Directory where each worker process keeps a snapshot of its metrics, so that
+# whichever worker answers a scrape reports the whole pool; the supervisor
+# creates one for its workers. Unset, /metrics covers only the answering process.
+METRICS_DIR_ENV = "BIOCANVAS_METRICS_DIR"
+
+# Seconds between a worker's snapshots; a scrape is at most this far behind the other workers
+METRICS_FLUSH_INTERVAL = float(os.environ.get("BIOCANVAS_METRICS_FLUSH_INTERVAL", 5.0))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        REGISTRY.register(self)
+
+    def labels(self, *values: str, **kwargs: str):
+        if kwargs:
+            values = tuple(kwargs[name] for name in self.labelnames)
+        key = tuple(str(v) for v in values)
+        with self._lock:
+            child = self._children.get(key)
+            if child is None:
+                child = self._children[key] = self._new_child()
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def snapshot(self) -> Dict[Tuple[str, ...], Any]:
+        """The current value of every label combination, as plain JSON-able data."""
+        raise NotImplementedError
+
+    def merge(self, snapshots: List[Dict[Tuple[str, ...], Any]]) -> Dict[Tuple[str, ...], Any]:
+        raise NotImplementedError
+
+    def _samples(self, data: Dict[Tuple[str, ...], Any]) -> Iterator[str]:
+        raise NotImplementedError
+
+    def render(self, data: Optional[Dict[Tuple[str, ...], Any]] = None) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples(self.snapshot() if data is None else data))
+        return "\n".join(lines)
+
+
+class _Value:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = float(value)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self) -> _Value:
+        return _Value()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def snapshot(self) -> Dict[Tuple[str, ...], Any]:
+        with self._lock:
+            children = list(self._children.items())
+        return {values: child.value for values, child in children}
+
+    def merge(self, snapshots: List[Dict[Tuple[str, ...], Any]]) -> Dict[Tuple[str, ...], Any]:
+        merged: Dict[Tuple[str, ...], Any] = {}
+        for data in snapshots:
+            for values, value in data.items():
+                merged[values] = merged.get(values, 0.0) + value
+        return merged
+
+    def _samples(self, data: Dict[Tuple[str, ...], Any]) -> Iterator[str]:
+        for values, value in sorted(data.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(value)}"
+
+
+class Gauge(Counter):
+    """
+    Across workers a gauge is summed over the live ones, unless it is `shared`:
+    a reading of state every worker sees alike (set just before rendering),
+    which is then taken from the worker answering the scrape.
+    """
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), shared: bool = False):
+        self.shared = shared
+        super().__init__(name, help, labelnames)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.labels().dec(amount)
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+
+class _Buckets:
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        i = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help, labelnames)
+
+    def _new_child(self) -> _Buckets:
+        return _Buckets(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def snapshot(self) -> Dict[Tuple[str, ...], Any]:
+        with self._lock:
+            children = list(self._children.items())
+        data = {}
+        for values, child in children:
+            with child._lock:
+                data[values] = [list(child.counts), child.sum]
+        return data
+
+    def merge(self, snapshots: List[Dict[Tuple[str, ...], Any]]) -> Dict[Tuple[str, ...], Any]:
+        merged: Dict[Tuple[str, ...], Any] = {}
+        for data in snapshots:
+            for values, (counts, total) in data.items():
+                if values not in merged:
+                    merged[values] = [[0] * (len(self.buckets) + 1), 0.0]
+                merged[values][0] = [a + b for a, b in zip(merged[values][0], counts)]
+                merged[values][1] += total
+        return merged
+
+    def _samples(self, data: Dict[Tuple[str, ...], Any]) -> Iterator[str]:
+        for values, (counts, total) in sorted(data.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, values, le)} {cumulative}"
+            labels = _format_labels(self.labelnames, values)
+            yield f"{self.name}_sum{labels} {_format_value(total)}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._flusher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def register(self, metric: _Metric) -> None:
+        self._metrics.append(metric)
+
+    def snapshot(self) -> Dict[str, List[Tuple[Tuple[str, ...], Any]]]:
+        return {metric.name: list(metric.snapshot().items()) for metric in self._metrics}
+
+    def flush(self, directory: str) -> None:
+        """Writes this process's snapshot to directory/<pid>.json, replacing the previous one."""
+        path = os.path.join(directory, f"{os.getpid()}.json")
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.snapshot(), f, separators=(",", ":"))
+        os.replace(tmp, path)
+
+    def start_flushing(self, directory: str, interval: float = METRICS_FLUSH_INTERVAL) -> None:
+        """Flushes a snapshot every `interval` seconds from a daemon thread until stop_flushing()."""
+        if self._flusher is not None:
+            return
+        self._stop.clear()
+
+        def loop() -> None:
+            while not self._stop.wait(interval):
+                try:
+                    self.flush(directory)
+                except OSError:
+                    pass
+
+        self._flusher = threading.Thread(target=loop, name="metrics-flush", daemon=True)
+        self._flusher.start()
+
+    def stop_flushing(self, directory: str) -> None:
+        """Stops the flusher and leaves a final snapshot, so counts of an exited worker stay in the totals."""
+        if self._flusher is not None:
+            self._stop.set()
+            self._flusher.join()
+            self._flusher = None
+        self.flush(directory)
+
+    def _snapshots(self, directory: str) -> List[Tuple[bool, Dict[str, Dict[Tuple[str, ...], Any]]]]:
+        """(live, snapshot) of every other process that flushed into directory."""
+        found = []
+        for path in glob.glob(os.path.join(directory, "*.json")):
+            pid = int(os.path.basename(path)[:-len(".json")])
+            if pid == os.getpid():
+                continue
+            try:
+                with open(path) as f:
+                    raw = json.load(f)
+            except (OSError, ValueError):
+                continue
+            found.append((_pid_alive(pid), {name: {tuple(values): data for values, data in children}
+                                            for name, children in raw.items()}))
+        return found
+
+    def render(self, directory: Optional[str] = None) -> str:
+        """
+        All metrics in Prometheus text exposition format 0.0.4: of this process
+        alone, or with `directory` merged with every worker's latest snapshot.
+        Counters and histograms include workers that have exited, so totals
+        do not drop when a worker is replaced; gauges only count live workers.
+        """
+        if directory is None:
+            return "\n".join(metric.render() for metric in self._metrics) + "\n"
+        others = self._snapshots(directory)
+        rendered = []
+        for metric in self._metrics:
+            own = metric.snapshot()
+            if isinstance(metric, Gauge):
+                if metric.shared:
+                    rendered.append(metric.render(own))
+                    continue
+                others_data = [data.get(metric.name, {}) for live, data in others if live]
+            else:
+                others_data = [data.get(metric.name, {}) for _, data in others]
+            rendered.append(metric.render(metric.merge([own] + others_data)))
+        return "\n".join(rendered) + "\n"
+
+
+REGISTRY = Registry()
+
+# Shared instruments; each module records into these rather than defining its own
+REQUESTS = Counter("biocanvas_http_requests_total", "HTTP requests by route and status.",
+                   ("method", "route", "status"))
+REQUEST_LATENCY = Histogram("biocanvas_http_request_duration_seconds",
+                            "Time until the response headers were sent.", ("method", "route"))
+IN_FLIGHT = Gauge("biocanvas_http_requests_in_flight", "HTTP requests being handled.")
+UPSTREAM_REQUESTS = Counter("biocanvas_upstream_requests_total",
+                            "AlphaFold/PubChem requests by outcome.", ("host", "outcome"))
+UPSTREAM_LATENCY = Histogram("biocanvas_upstream_request_duration_seconds",
+                             "Latency of AlphaFold/PubChem requests.", ("host",))
+CACHE_LOOKUPS = Counter("biocanvas_cache_lookups_total",
+                        "Cache lookups by cache and result (hit, miss, ...).", ("cache", "result"))
+STAGE_LATENCY = Histogram("biocanvas_stage_duration_seconds",
+                          "Time spent in named processing stages such as docking steps.", ("stage",))
+
+
+def cache_lookup(cache: str, result: str, count: int = 1) -> None:
+    if count:
+        CACHE_LOOKUPS.labels(cache, result).inc(count)
+
+
+# Stage timings of the current request, when it asked for a profile
+_profile: "contextvars.ContextVar[Optional[List[Tuple[str, float]]]]" = contextvars.ContextVar(
+    "biocanvas_profile", default=None
+)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """
+    Times a block into biocanvas_stage_duration_seconds and, for profiled
+    requests, into their Server-Timing header. Context variables follow
+    run_in_threadpool and asyncio.to_thread, so blocks in worker threads count.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_LATENCY.labels(name).observe(elapsed)
+        timings = _profile.get()
+        if timings is not None:
+            timings.append((name, elapsed))
+
+
+def server_timing(timings: List[Tuple[str, float]], total: float) -> str:
+    entries = [f"{name};dur={elapsed * 1000:.2f}" for name, elapsed in timings]
+    entries.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(entries)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording request counts, in-flight requests and latency
+    per route template. Requests with an X-Profile header get a Server-Timing
+    response header listing the stages they went through.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profiled = any(name == PROFILE_HEADER.encode() for name, _ in scope.get("headers", ()))
+        timings: Optional[List[Tuple[str, float]]] = [] if profiled else None
+        token = _profile.set(timings)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_metrics(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                elapsed = time.perf_counter() - start
+                route = scope.get("route")
+                REQUEST_LATENCY.labels(scope["method"], getattr(route, "path", "unmatched")).observe(elapsed)
+                if timings is not None:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", server_timing(timings, elapsed).encode()))
+                    message = dict(message, headers=headers)
+            await send(message)
+
+        IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            IN_FLIGHT.dec()
+            _profile.reset(token)
+            route = scope.get("route")
+            REQUESTS.labels(scope["method"], getattr(route, "path", "unmatched"), str(status)).inc()
@@ -0,0 +1,171 @@
+# Grid-based binding pocket detection on AlphaFold models
+from typing import Any, Dict, List
+
+import numpy as np  # type: ignore
+
+from backend.spatial_index import CellList
+
+# Bump whenever the algorithm or its parameters change; cached results are keyed by it
+POCKET_ALGORITHM_VERSION = "1"
+
+POCKET_SPACING = 1.0     # grid spacing (A)
+PROBE_CLEARANCE = 3.0    # grid points closer than this to an atom are protein
+RAY_LENGTH = 10.0        # how far buriedness rays look for protein (A)
+MIN_BURIEDNESS = 10      # of 14 rays must hit protein
+MIN_VOLUME = 20          # grid points (A^3 at 1 A spacing)
+LINING_DISTANCE = 4.0    # residues with an atom this close line the pocket
+MAX_POCKETS = 10
+
+# 6 axis and 8 body-diagonal ray directions
+RAY_DIRECTIONS = np.array(
+    [[1, 0, 0], [-1, 0, 0], [0, 1, 0], [0, -1, 0], [0, 0, 1], [0, 0, -1]]
+    + [[x, y, z] for x in (1, -1) for y in (1, -1) for z in (1, -1)]
+)
+
+
+def _occupancy(coords: np.ndarray, origin: np.ndarray, shape: tuple) -> np.ndarray:
+    """Grid points within PROBE_CLEARANCE of an atom, marked atom by atom in a window around each."""
+    occupied = np.zeros(shape, dtype=bool)
+    axes = [origin[d] + POCKET_SPACING * np.arange(shape[d]) for d in range(3)]
+    window = int(np.ceil(PROBE_CLEARANCE / POCKET_SPACING))
+    limit = PROBE_CLEARANCE * PROBE_CLEARANCE
+    for atom in coords.astype(np.float64):
+        centre = np.rint((atom - origin) / POCKET_SPACING).astype(int)
+        lo = np.maximum(centre - window, 0)
+        hi = np.minimum(centre + window + 1, shape)
+        block = tuple(slice(lo[d], hi[d]) for d in range(3))
+        dx = axes[0][block[0]] - atom[0]
+        dy = axes[1][block[1]] - atom[1]
+        dz = axes[2][block[2]] - atom[2]
+        occupied[block] |= dx[:, None, None] ** 2 + dy[None, :, None] ** 2 + dz[None, None, :] ** 2 < limit
+    return occupied
+
+
+def _shifted(shape: tuple, offset: np.ndarray) -> tuple:
+    """
+    (target, source) slices so that target[p] pairs with source[p + offset]
+    inside the grid, or None once the offset leaves the grid along some axis.
+    """
+    target, source = [], []
+    for size, o in zip(shape, offset):
+        if abs(o) >= size:
+            return None
+        target.append(slice(max(0, -o), size - max(0, o)))
+        source.append(slice(max(0, o), size + min(0, o)))
+    return tuple(target), tuple(source)
+
+
+def _buriedness(occupied: np.ndarray) -> np.ndarray:
+    """Counts, for every grid point, the rays that run into protein within RAY_LENGTH."""
+    buried = np.zeros(occupied.shape, dtype=np.int8)
+    hit = np.empty(occupied.shape, dtype=bool)
+    for direction in RAY_DIRECTIONS:
+        hit[...] = False
+        n_steps = int(RAY_LENGTH / (POCKET_SPACING * np.linalg.norm(direction)))
+        for step in range(1, n_steps + 1):
+            slices = _shifted(occupied.shape, step * direction)
+            if slices is None:
+                break
+            hit[slices[0]] |= occupied[slices[1]]
+        buried += hit
+    return buried
+
+
+def _label_clusters(mask: np.ndarray) -> np.ndarray:
+    """
+    6-connected components of a boolean grid by union-find over neighbour
+    pairs (hook to the smaller root, then pointer jumping), so the cost
+    grows with the number of masked points, not with cluster diameter.
+    Each component is labelled with its smallest flat index; -1 outside the mask.
+    """
+    flat = np.flatnonzero(mask)
+    node = np.full(mask.size, -1, dtype=np.int64)
+    node[flat] = np.arange(len(flat))
+    node = node.reshape(mask.shape)
+    edges = []
+    for axis in range(3):
+        lo = [slice(None)] * 3
+        hi = [slice(None)] * 3
+        lo[axis], hi[axis] = slice(0, -1), slice(1, None)
+        a, b = node[tuple(lo)].ravel(), node[tuple(hi)].ravel()
+        both = (a >= 0) & (b >= 0)
+        edges.append((a[both], b[both]))
+    a = np.concatenate([e[0] for e in edges])
+    b = np.concatenate([e[1] for e in edges])
+
+    parent = np.arange(len(flat))
+    while True:
+        root_a, root_b = parent[a], parent[b]
+        differ = root_a != root_b
+        if not differ.any():
+            break
+        root_a, root_b = root_a[differ], root_b[differ]
+        np.minimum.at(parent, np.maximum(root_a, root_b), np.minimum(root_a, root_b))
+        while True:
+            jumped = parent[parent]
+            if np.array_equal(jumped, parent):
+                break
+            parent = jumped
+
+    labels = np.full(mask.size, -1, dtype=np.int64)
+    labels[flat] = flat[parent]
+    return labels.reshape(mask.shape)
+
+
+def find_pockets(atoms: np.ndarray) -> List[Dict[str, Any]]:
+    """
+    Finds buried solvent cavities in a structure (ATOM_DTYPE records) and ranks
+    them by volume x buriedness x mean pLDDT of the lining residues, so pockets
+    lined by low-confidence loops rank below well-predicted ones.
+    """
+    atoms = atoms[atoms["element"] != b"H"]
+    if len(atoms) == 0:
+        return []
+    coords = np.ascontiguousarray(atoms["xyz"], dtype=np.float32)
+    index = CellList(coords)
+
+    origin = coords.min(axis=0) - PROBE_CLEARANCE
+    shape = tuple(np.ceil((coords.max(axis=0) + PROBE_CLEARANCE - origin) / POCKET_SPACING).astype(int) + 1)
+    occupied = _occupancy(coords, origin, shape)
+
+    buried = _buriedness(occupied)
+    labels = _label_clusters(~occupied & (buried >= MIN_BURIEDNESS)).ravel()
+
+    # Only pocket points get coordinates; the grid itself stays boolean
+    in_pocket = labels >= 0
+    _, inverse, volumes = np.unique(labels[in_pocket], return_inverse=True, return_counts=True)
+    pocket_points = origin + np.stack(np.unravel_index(np.flatnonzero(in_pocket), shape), axis=1) * POCKET_SPACING
+    pocket_buried = buried.ravel()[in_pocket]
+
+    pockets = []
+    for c in np.flatnonzero(volumes >= MIN_VOLUME):
+        members = pocket_points[inverse == c]
+        _, lining, _ = index.pairs_within(members, LINING_DISTANCE)
+        residues = np.unique(atoms["res_index"][lining])
+        if len(residues) == 0:
+            continue
+        # pLDDT is per residue; take one value per lining residue
+        first_atom = np.searchsorted(atoms["res_index"], residues)
+        plddt = float(atoms["plddt"][first_atom].mean())
+        burial = float(pocket_buried[inverse == c].mean()) / len(RAY_DIRECTIONS)
+        volume = float(volumes[c]) * POCKET_SPACING ** 3
+        lo, hi = members.min(axis=0), members.max(axis=0)
+        pockets.append({
+            "center": [round(float(v), 3) for v in members.mean(axis=0)],
+            "box_min": [round(float(v), 3) for v in lo],
+            "box_max": [round(float(v), 3) for v in hi],
+            "volume": volume,
+            "buriedness": round(burial, 3),
+            "mean_plddt": round(plddt, 2),
+            "score": round(volume * burial * plddt / 100.0, 2),
+            "residues": [
+                {"chain": atoms["chain"][i].decode(), "res_seq": int(atoms["res_seq"][i]),
+                 "resname": atoms["resname"][i].decode()}
+                for i in first_atom
+            ],
+        })
+
+    pockets.sort(key=lambda p: p["score"], reverse=True)
+    for rank, pocket in enumerate(pockets[:MAX_POCKETS], start=1):
+        pocket["rank"] = rank
+    return pockets[:MAX_POCKETS]
@@ -0,0 +1,304 @@
+# Monte Carlo pose search spread across a process pool
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, as_completed
+from typing import Callable, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+import numpy as np  # type: ignore
+
+from backend.interactions import describe, interaction_profile
+from backend.metrics import stage
+from backend.scoring import (
+    GridMaps, LigandModel, binding_strength, contact_points, get_grids, prepare_ligand,
+    random_rotations, score_poses,
+)
+from backend.spatial_index import receptor_index
+from backend.structure_format import receptor_atoms
+from backend.structures import parse_sdf
+
+# Search effort per docking call
+MC_RUNS = int(os.environ.get("BIOCANVAS_MC_RUNS", 16))
+MC_STEPS = int(os.environ.get("BIOCANVAS_MC_STEPS", 50))
+MC_TEMPERATURE = 1.2      # kcal/mol
+MC_CANDIDATES = 8         # perturbed poses evaluated together at each step
+LOCAL_ITERATIONS = 8      # Solis-Wets iterations after each move
+INITIAL_PLACEMENTS = 64   # random rigid poses tried to seed each run
+
+# Worker processes; 0 runs the search in the calling process
+DOCK_WORKERS = int(os.environ.get("BIOCANVAS_DOCK_WORKERS", os.cpu_count() or 1))
+
+# Chunks per worker when progress is reported; more chunks mean finer updates
+PROGRESS_CHUNKS_PER_WORKER = 4
+
+# Called with (runs finished, total runs, best energy so far); may raise to abort
+Progress = Callable[[int, int, float], None]
+
+
+class Poses(NamedTuple):
+    """A batch of B poses in rigid-body plus torsion space."""
+    translation: np.ndarray  # (B, 3)
+    rotation: np.ndarray     # (B, 3, 3)
+    torsions: np.ndarray     # (B, R) radians, relative to the input conformation
+
+
+class SearchResult(NamedTuple):
+    energy: float
+    coords: np.ndarray          # (A, 3) best pose
+    run_energies: List[float]   # best energy of each run, in run order
+
+
+class TorsionTree(NamedTuple):
+    axes: np.ndarray   # (R, 2) atom indices (fixed side, moving side)
+    moving: np.ndarray  # (R, A) bool mask of atoms rotated by each torsion
+
+
+def torsion_tree(model: LigandModel) -> TorsionTree:
+    """Works out which atoms move when each rotatable bond turns."""
+    n = len(model.ligand.elements)
+    neighbours = [[] for _ in range(n)]
+    for a, b, _ in model.ligand.bonds:
+        neighbours[a].append(b)
+        neighbours[b].append(a)
+    masks = np.zeros((len(model.rotatable), n), dtype=bool)
+    for t, (a, b) in enumerate(model.rotatable):
+        stack, seen = [b], {a, b}
+        while stack:
+            node = stack.pop()
+            for nxt in neighbours[node]:
+                if nxt not in seen:
+                    seen.add(nxt)
+                    stack.append(nxt)
+        seen.discard(a)
+        masks[t, list(seen)] = True
+    return TorsionTree(axes=model.rotatable, moving=masks)
+
+
+def axis_rotations(axes: np.ndarray, angles: np.ndarray) -> np.ndarray:
+    """Rodrigues rotation matrices for (B, 3) axes and (B,) angles."""
+    axes = axes / np.sqrt((axes * axes).sum(axis=1, keepdims=True))
+    x, y, z = axes.T
+    k = np.zeros((len(axes), 3, 3))
+    k[:, 0, 1], k[:, 0, 2] = -z, y
+    k[:, 1, 0], k[:, 1, 2] = z, -x
+    k[:, 2, 0], k[:, 2, 1] = -y, x
+    s = np.sin(angles)[:, None, None]
+    c = np.cos(angles)[:, None, None]
+    return np.eye(3) + s * k + (1 - c) * (k @ k)
+
+
+def pose_coords(local: np.ndarray, tree: TorsionTree, poses: Poses) -> np.ndarray:
+    """Applies torsions, then rigid-body rotation and translation; returns (B, A, 3)."""
+    coords = np.repeat(local[None], len(poses.translation), axis=0)
+    for t, ((a, b), mask) in enumerate(zip(tree.axes, tree.moving)):
+        origin = coords[:, b:b + 1]
+        rot = axis_rotations(coords[:, b] - coords[:, a], poses.torsions[:, t])
+        coords[:, mask] = np.einsum("bij,baj->bai", rot, coords[:, mask] - origin) + origin
+    return np.einsum("bij,baj->bai", poses.rotation, coords) + poses.translation[:, None, :]
+
+
+def perturb(rng: np.random.Generator, poses: Poses, scale: np.ndarray) -> Poses:
+    """
+    One random move per pose: shift, rotate, or twist a torsion.
+    Torsions are resampled outright at scale >= 1 and nudged below it.
+    """
+    b = len(poses.translation)
+    n_torsions = poses.torsions.shape[1]
+    kind = rng.integers(3 if n_torsions else 2, size=b)
+    scale = np.broadcast_to(scale, (b,))
+
+    shift = rng.normal(size=(b, 3)) * scale[:, None] * (kind == 0)[:, None]
+    angles = rng.normal(size=b) * 0.3 * scale * (kind == 1)
+    turn = axis_rotations(rng.normal(size=(b, 3)), angles)
+
+    torsions = poses.torsions.copy()
+    if n_torsions:
+        rows = np.flatnonzero(kind == 2)
+        cols = rng.integers(n_torsions, size=len(rows))
+        resample = scale[rows] >= 1.0
+        torsions[rows, cols] = np.where(
+            resample,
+            rng.uniform(-np.pi, np.pi, size=len(rows)),
+            torsions[rows, cols] + rng.normal(size=len(rows)) * scale[rows],
+        )
+    return Poses(translation=poses.translation + shift, rotation=turn @ poses.rotation, torsions=torsions)
+
+
+def _select(mask: np.ndarray, new: Poses, old: Poses) -> Poses:
+    return Poses(
+        translation=np.where(mask[:, None], new.translation, old.translation),
+        rotation=np.where(mask[:, None, None], new.rotation, old.rotation),
+        torsions=np.where(mask[:, None], new.torsions, old.torsions),
+    )
+
+
+def local_optimise(grids: GridMaps, model: LigandModel, local: np.ndarray, tree: TorsionTree,
+                   poses: Poses, energies: np.ndarray, rng: np.random.Generator):
+    """Solis-Wets style local search run on every pose of the batch at once."""
+    step = np.full(len(energies), 0.5)
+    successes = np.zeros(len(energies), dtype=int)
+    failures = np.zeros(len(energies), dtype=int)
+    for _ in range(LOCAL_ITERATIONS):
+        candidates = perturb(rng, poses, step)
+        e = score_poses(grids, model, pose_coords(local, tree, candidates))
+        better = e < energies
+        poses = _select(better, candidates, poses)
+        energies = np.where(better, e, energies)
+        successes = np.where(better, successes + 1, 0)
+        failures = np.where(better, 0, failures + 1)
+        step = np.where(successes >= 4, step * 2.0, step)
+        step = np.where(failures >= 4, step * 0.5, step)
+        successes = np.where(successes >= 4, 0, successes)
+        failures = np.where(failures >= 4, 0, failures)
+    return poses, energies
+
+
+def monte_carlo_run(grids: GridMaps, model: LigandModel, seed: np.random.SeedSequence,
+                    n_steps: int = MC_STEPS) -> Tuple[float, np.ndarray]:
+    """One independent Monte Carlo run with its own RNG; returns best energy and coordinates."""
+    rng = np.random.default_rng(seed)
+    local = (model.ligand.coords - model.ligand.coords.mean(axis=0)).astype(np.float64)
+    tree = torsion_tree(model)
+    n_torsions = len(tree.axes)
+
+    # Start from the best of a few random rigid placements on the receptor surface
+    centres = contact_points(grids)
+    if len(centres) == 0:
+        centres = (grids.origin + np.array(grids.maps.shape[1:]) * grids.spacing / 2.0)[None, :]
+    starts = Poses(
+        translation=centres[rng.integers(len(centres), size=INITIAL_PLACEMENTS)].astype(np.float64),
+        rotation=random_rotations(rng, INITIAL_PLACEMENTS),
+        torsions=np.zeros((INITIAL_PLACEMENTS, n_torsions)),
+    )
+    energies = score_poses(grids, model, pose_coords(local, tree, starts))
+    i = int(np.argmin(energies))
+    current = Poses(starts.translation[i:i + 1], starts.rotation[i:i + 1], starts.torsions[i:i + 1])
+    energy = float(energies[i])
+
+    best, best_energy = current, energy
+    for _ in range(n_steps):
+        batch = Poses(*(np.repeat(field, MC_CANDIDATES, axis=0) for field in current))
+        candidates = perturb(rng, batch, np.ones(MC_CANDIDATES))
+        e = score_poses(grids, model, pose_coords(local, tree, candidates))
+        candidates, e = local_optimise(grids, model, local, tree, candidates, e, rng)
+        j = int(np.argmin(e))
+        if e[j] < energy or rng.random() < np.exp((energy - e[j]) / MC_TEMPERATURE):
+            current = Poses(candidates.translation[j:j + 1], candidates.rotation[j:j + 1],
+                            candidates.torsions[j:j + 1])
+            energy = float(e[j])
+            if energy < best_energy:
+                best, best_energy = current, energy
+    return best_energy, pose_coords(local, tree, best)[0].astype(np.float32)
+
+
+def _no_pdb() -> str:
+    raise RuntimeError("pose search workers only map grids the parent has already built")
+
+
+def _run_chunk(grids: Union[GridMaps, str], model: LigandModel, seeds: Sequence[np.random.SeedSequence],
+               n_steps: int) -> List[Tuple[float, np.ndarray]]:
+    if isinstance(grids, str):
+        # A receptor key: map the shared grids instead of unpickling a copy
+        grids = get_grids(grids, _no_pdb)
+    return [monte_carlo_run(grids, model, seed, n_steps) for seed in seeds]
+
+
+_executor: Optional[Executor] = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> Optional[Executor]:
+    """Lazily starts the shared process pool (None when DOCK_WORKERS is 0)."""
+    global _executor
+    if DOCK_WORKERS <= 0:
+        return None
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=DOCK_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _executor
+
+
+def shutdown_executor() -> None:
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(cancel_futures=True)
+            _executor = None
+
+
+def search_poses(grids: GridMaps, model: LigandModel, seed: Optional[int] = None,
+                 n_runs: int = MC_RUNS, n_steps: int = MC_STEPS,
+                 progress: Optional[Progress] = None,
+                 receptor_key: Optional[str] = None) -> SearchResult:
+    """
+    Runs n_runs independent Monte Carlo searches in parallel.
+    Every run draws from its own child of SeedSequence(seed), so the result
+    depends only on the seed, never on the number of workers or chunks.
+    progress is called as runs complete; an exception it raises cancels the
+    remaining runs and propagates. With the grids' receptor_key, pool workers
+    map the shared grids rather than receiving a pickled copy.
+    """
+    seeds = np.random.SeedSequence(seed).spawn(n_runs)
+    executor = get_executor()
+    results: List[Optional[Tuple[float, np.ndarray]]] = [None] * n_runs
+    finished, best_energy = 0, float("inf")
+
+    def report(runs: List[Tuple[float, np.ndarray]]) -> None:
+        nonlocal finished, best_energy
+        finished += len(runs)
+        best_energy = min([best_energy] + [energy for energy, _ in runs])
+        if progress is not None:
+            progress(finished, n_runs, best_energy)
+
+    if executor is None:
+        for i, seed_seq in enumerate(seeds):
+            results[i] = monte_carlo_run(grids, model, seed_seq, n_steps)
+            report([results[i]])
+    else:
+        # One chunk per worker, a few more when someone is watching the progress
+        n_chunks = min(DOCK_WORKERS * (PROGRESS_CHUNKS_PER_WORKER if progress else 1), n_runs)
+        bounds = np.linspace(0, n_runs, n_chunks + 1).astype(int)
+        futures = {
+            executor.submit(_run_chunk, receptor_key or grids, model, seeds[lo:hi], n_steps): lo
+            for lo, hi in zip(bounds[:-1], bounds[1:]) if hi > lo
+        }
+        try:
+            for future in as_completed(futures):
+                lo = futures[future]
+                runs = future.result()
+                for offset, run in enumerate(runs):
+                    results[lo + offset] = run
+                report(runs)
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+
+    run_energies = [energy for energy, _ in results]
+    best = int(np.argmin(run_energies))
+    return SearchResult(energy=run_energies[best], coords=results[best][1], run_energies=run_energies)
+
+
+def physics_docking(receptor_key: str, pdb_text: str, sdf_text: str,
+                    seed: Optional[int] = None, progress: Optional[Progress] = None) -> dict:
+    """Docks a ligand against a receptor with Monte Carlo search over the grid scoring function."""
+    with stage("grids"):
+        grids = get_grids(receptor_key, lambda: pdb_text)
+    with stage("ligand_prep"):
+        model = prepare_ligand(parse_sdf(sdf_text))
+    with stage("pose_search"):
+        result = search_poses(grids, model, seed, progress=progress, receptor_key=receptor_key)
+    with stage("interactions"):
+        profile = interaction_profile(receptor_index(receptor_key, lambda: pdb_text),
+                                      receptor_atoms(receptor_key, lambda: pdb_text), model, result.coords)
+    score = round(result.energy, 1)
+    return {
+        "score": score,
+        "strength": binding_strength(score),
+        "message": f"Best pose of {len(result.run_energies)} Monte Carlo runs. {describe(profile)}",
+        "interactions": profile,
+        "success": True
+    }
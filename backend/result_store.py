@@ -0,0 +1,225 @@
+# Persistent docking result cache keyed by structure versions, engine version, parameters and seed
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from backend.metrics import cache_lookup
+from backend.structure_cache import CACHE_DIR, connect_shared
+
+RESULTS_DB = os.environ.get("BIOCANVAS_RESULTS_DB", os.path.join(CACHE_DIR, "results.sqlite"))
+
+# Results kept in memory, and on disk, before the least recently used are evicted
+RESULT_CACHE_SIZE = int(os.environ.get("BIOCANVAS_RESULT_CACHE_SIZE", 65536))
+RESULT_DISK_ENTRIES = int(os.environ.get("BIOCANVAS_RESULT_DISK_ENTRIES", 1_000_000))
+
+# SQLite limits the number of bound parameters per statement
+_LOOKUP_BATCH = 500
+
+
+class ResultKey(NamedTuple):
+    """Everything a docking result depends on."""
+    protein_id: int
+    ligand_id: int
+    protein_version: str   # e.g. UniProt id, or receptor key with AlphaFold version
+    ligand_version: str    # e.g. PubChem CID and record type
+    engine_version: str
+    params: str            # canonical JSON of the scoring parameters
+    seed: int
+
+    def ident(self) -> str:
+        return json.dumps(list(self), separators=(",", ":"))
+
+
+class ResultStore:
+    """
+    Two-level LRU of docking results: a bounded in-memory OrderedDict in front
+    of a SQLite table that is trimmed to RESULT_DISK_ENTRIES rows by last access.
+    Every field of the key is stored, so the table doubles as an exportable
+    protein x ligand matrix.
+    """
+
+    def __init__(self, db_path: str = RESULTS_DB, memory_entries: int = RESULT_CACHE_SIZE,
+                 disk_entries: int = RESULT_DISK_ENTRIES):
+        self.db_path = db_path
+        self.memory_entries = memory_entries
+        self.disk_entries = disk_entries
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._db = connect_shared(db_path)
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS results (
+                   ident TEXT PRIMARY KEY,
+                   protein_id INTEGER NOT NULL,
+                   ligand_id INTEGER NOT NULL,
+                   protein_version TEXT NOT NULL,
+                   ligand_version TEXT NOT NULL,
+                   engine_version TEXT NOT NULL,
+                   params TEXT NOT NULL,
+                   seed INTEGER NOT NULL,
+                   result TEXT NOT NULL,
+                   created REAL NOT NULL,
+                   last_access REAL NOT NULL)"""
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS results_lru ON results (last_access)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS results_pair ON results (protein_id, ligand_id)")
+        # Best score per pair for the leaderboard, per scoring version (engine and rule
+        # table); shared by every process on the database
+        columns = [row[1] for row in self._db.execute("PRAGMA table_info(leaderboard)")]
+        if columns and "version" not in columns:
+            # Rows of older databases do not say which version scored them; they are rebuilt
+            self._db.execute("DROP TABLE leaderboard")
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS leaderboard (
+                   version TEXT NOT NULL,
+                   protein_id INTEGER NOT NULL,
+                   ligand_id INTEGER NOT NULL,
+                   score REAL NOT NULL,
+                   PRIMARY KEY (version, protein_id, ligand_id))"""
+        )
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[ResultKey, Dict[str, Any]]" = OrderedDict()
+        self._rows = self._db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def _remember(self, key: ResultKey, result: Dict[str, Any]) -> None:
+        self._memory[key] = result
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key: ResultKey) -> Optional[Dict[str, Any]]:
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys: Sequence[ResultKey]) -> Dict[ResultKey, Dict[str, Any]]:
+        """Returns the stored results among keys; misses are absent from the dict."""
+        found: Dict[ResultKey, Dict[str, Any]] = {}
+        missing: Dict[str, ResultKey] = {}
+        with self._lock:
+            for key in keys:
+                result = self._memory.get(key)
+                if result is not None:
+                    self._memory.move_to_end(key)
+                    found[key] = result
+                else:
+                    missing[key.ident()] = key
+            cache_lookup("results", "hit", len(found))
+            if not missing:
+                return found
+
+            idents = list(missing)
+            for i in range(0, len(idents), _LOOKUP_BATCH):
+                batch = idents[i:i + _LOOKUP_BATCH]
+                rows = self._db.execute(
+                    f"SELECT ident, result FROM results WHERE ident IN ({', '.join('?' * len(batch))})",
+                    batch,
+                ).fetchall()
+                if rows:
+                    self._db.executemany(
+                        "UPDATE results SET last_access=? WHERE ident=?",
+                        [(time.time(), ident) for ident, _ in rows],
+                    )
+                for ident, data in rows:
+                    key = missing[ident]
+                    found[key] = json.loads(data)
+                    self._remember(key, found[key])
+                cache_lookup("results", "disk", len(rows))
+                cache_lookup("results", "miss", len(batch) - len(rows))
+        return found
+
+    def put(self, key: ResultKey, result: Dict[str, Any]) -> None:
+        self.put_many([(key, result)])
+
+    def put_many(self, items: Sequence[Tuple[ResultKey, Dict[str, Any]]]) -> None:
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.executemany(
+                    """INSERT OR REPLACE INTO results
+                       (ident, protein_id, ligand_id, protein_version, ligand_version,
+                        engine_version, params, seed, result, created, last_access)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                    [(key.ident(),) + tuple(key) + (json.dumps(result), now, now) for key, result in items],
+                )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            for key, result in items:
+                self._remember(key, result)
+            self._rows += len(items)
+            if self._rows > self.disk_entries:
+                self._evict()
+
+    def _evict(self) -> None:
+        """Trims the table to disk_entries rows, dropping the least recently used."""
+        self._rows = self._db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        excess = self._rows - self.disk_entries
+        if excess > 0:
+            self._db.execute(
+                "DELETE FROM results WHERE ident IN "
+                "(SELECT ident FROM results ORDER BY last_access LIMIT ?)",
+                (excess,),
+            )
+            self._rows -= excess
+
+    def offer_best(self, entries: Sequence[Tuple[int, int, float]], capacity: int, version: str) -> None:
+        """
+        Records (protein_id, ligand_id, score) entries scored by `version` on the
+        leaderboard, keeping each pair's best (lowest) score and the `capacity`
+        best ligands per protein. Rows of every other version are dropped, since
+        their scores are not comparable.
+        """
+        if not entries:
+            return
+        proteins = sorted({protein_id for protein_id, _, _ in entries})
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.execute("DELETE FROM leaderboard WHERE version != ?", (version,))
+                self._db.executemany(
+                    """INSERT INTO leaderboard (version, protein_id, ligand_id, score) VALUES (?, ?, ?, ?)
+                       ON CONFLICT (version, protein_id, ligand_id) DO UPDATE SET score=MIN(score, excluded.score)""",
+                    [(version, protein_id, ligand_id, score) for protein_id, ligand_id, score in entries],
+                )
+                self._db.executemany(
+                    """DELETE FROM leaderboard WHERE version=? AND protein_id=? AND ligand_id NOT IN
+                       (SELECT ligand_id FROM leaderboard WHERE version=? AND protein_id=?
+                        ORDER BY score, ligand_id LIMIT ?)""",
+                    [(version, protein_id, version, protein_id, capacity) for protein_id in proteins],
+                )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def best(self, protein_id: int, k: int, version: str) -> List[Tuple[int, float]]:
+        """The k best (ligand_id, score) pairs scored by `version` on a protein's leaderboard, best first."""
+        with self._lock:
+            return self._db.execute(
+                """SELECT ligand_id, score FROM leaderboard WHERE version=? AND protein_id=?
+                   ORDER BY score, ligand_id LIMIT ?""",
+                (version, protein_id, k),
+            ).fetchall()
+
+    def export(self, engine_version: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Every stored result with its key, ordered by protein and ligand."""
+        query = ("SELECT protein_id, ligand_id, protein_version, ligand_version, engine_version, "
+                 "params, seed, result FROM results")
+        params: List[Any] = []
+        if engine_version is not None:
+            query += " WHERE engine_version=?"
+            params.append(engine_version)
+        query += " ORDER BY protein_id, ligand_id"
+        # A separate connection so a long export does not hold the store's lock
+        db = sqlite3.connect(self.db_path, check_same_thread=False)
+        try:
+            for row in db.execute(query, params):
+                *key, result = row
+                yield dict(zip(ResultKey._fields, key), result=json.loads(result))
+        finally:
+            db.close()
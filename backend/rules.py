@@ -0,0 +1,166 @@
+# Curated protein–ligand interaction rules, compiled into a dense lookup table and reloaded when the file changes
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np  # type: ignore
+
+from backend.catalog import DATA_DIR, RELOAD_INTERVAL
+from backend.metrics import cache_lookup
+
+RULES_FILE = os.environ.get("BIOCANVAS_RULES_FILE", os.path.join(DATA_DIR, "interactions.json"))
+
+logger = logging.getLogger("biocanvas.rules")
+
+
+class CompiledRules:
+    """
+    One version of the rule table. rows[protein_id, ligand_id] is the index
+    of the pair's rule in `results`, or -1, so a pair resolves with one
+    array read and a whole protein×ligand matrix with one fancy index.
+    """
+
+    def __init__(self, version: str, rows: np.ndarray, results: List[Dict[str, Any]]):
+        self.version = version
+        self.rows = rows
+        self.results = results
+
+    def __len__(self) -> int:
+        return len(self.results)
+
+    def lookup(self, protein_id: int, ligand_id: int) -> Optional[Dict[str, Any]]:
+        """The rule's result for one pair, or None if the pair has no rule."""
+        n_proteins, n_ligands = self.rows.shape
+        if not (0 <= protein_id < n_proteins and 0 <= ligand_id < n_ligands):
+            return None
+        row = self.rows[protein_id, ligand_id]
+        return None if row < 0 else self.results[row]
+
+    def lookup_many(self, protein_ids: Any, ligand_ids: Any) -> np.ndarray:
+        """
+        Rule indices (-1 for none) of many pairs. The id arrays broadcast, so
+        ids[:, None] against ids[None, :] looks up a whole screening matrix.
+        """
+        proteins, ligands = np.broadcast_arrays(np.asarray(protein_ids, dtype=np.int64),
+                                                np.asarray(ligand_ids, dtype=np.int64))
+        n_proteins, n_ligands = self.rows.shape
+        if not self.rows.size:
+            return np.full(proteins.shape, -1, dtype=np.int32)
+        inside = (proteins >= 0) & (proteins < n_proteins) & (ligands >= 0) & (ligands < n_ligands)
+        found = self.rows[np.clip(proteins, 0, n_proteins - 1), np.clip(ligands, 0, n_ligands - 1)]
+        return np.where(inside, found, np.int32(-1))
+
+
+def compile_rules(entries: List[Dict[str, Any]], version: str) -> CompiledRules:
+    """
+    Builds the dense lookup table from rule entries. Raises ValueError on a
+    malformed entry or a pair listed twice, naming the entry.
+    """
+    if not isinstance(entries, list):
+        raise ValueError("the rules file must hold a JSON list")
+    pairs: List[Tuple[int, int]] = []
+    results: List[Dict[str, Any]] = []
+    for i, entry in enumerate(entries):
+        try:
+            protein_id, ligand_id = int(entry["protein_id"]), int(entry["ligand_id"])
+            result = {"score": float(entry["score"]), "strength": str(entry["strength"]),
+                      "message": str(entry["message"]), "success": True}
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"rule {i} is malformed ({e!r})") from None
+        if protein_id < 0 or ligand_id < 0:
+            raise ValueError(f"rule {i} has a negative id")
+        pairs.append((protein_id, ligand_id))
+        results.append(result)
+
+    shape = (max((p for p, _ in pairs), default=-1) + 1, max((l for _, l in pairs), default=-1) + 1)
+    rows = np.full(shape, -1, dtype=np.int32)
+    for i, (protein_id, ligand_id) in enumerate(pairs):
+        if rows[protein_id, ligand_id] >= 0:
+            raise ValueError(f"rule {i} repeats protein {protein_id} + ligand {ligand_id}")
+        rows[protein_id, ligand_id] = i
+    return CompiledRules(version, rows, results)
+
+
+EMPTY = compile_rules([], "none")
+
+
+class RuleTable:
+    """
+    Serves the compiled rules of RULES_FILE. The file is re-read when its size
+    or mtime changes, checked at most once per RELOAD_INTERVAL; an invalid
+    file is logged and the previous rules stay in force. The version is a
+    digest of the file's contents, so stored results survive restarts.
+    """
+
+    def __init__(self, path: str = RULES_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._checked = -RELOAD_INTERVAL
+        self._signature: Optional[str] = None
+        self._rules = EMPTY
+
+    def _stat_signature(self) -> str:
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return "missing"
+        return f"{st.st_mtime_ns}-{st.st_size}"
+
+    def _fresh(self) -> bool:
+        # Nothing is skipped until the first load has finished, so no reader sees EMPTY meanwhile
+        return self._signature is not None and time.monotonic() - self._checked < RELOAD_INTERVAL
+
+    def _refresh(self) -> None:
+        if self._fresh():
+            return
+        with self._lock:
+            if self._fresh():
+                return
+            signature = self._stat_signature()
+            if signature == self._signature:
+                cache_lookup("rules", "hit")
+            else:
+                cache_lookup("rules", "miss")
+                self._load()
+                self._signature = signature
+            self._checked = time.monotonic()
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, "rb") as f:
+                raw = f.read()
+        except FileNotFoundError:
+            self._rules = EMPTY
+            return
+        try:
+            self._rules = compile_rules(json.loads(raw), hashlib.sha256(raw).hexdigest()[:16])
+        except ValueError as e:
+            logger.warning("Keeping the previous %d interaction rules; %s is invalid: %s",
+                           len(self._rules), self.path, e)
+            return
+        logger.info("Loaded %d interaction rules from %s", len(self._rules), self.path)
+
+    def current(self) -> CompiledRules:
+        """The rules in force, reloaded first if the file changed."""
+        self._refresh()
+        return self._rules
+
+    def version(self) -> str:
+        return self.current().version
+
+
+_table: Optional[RuleTable] = None
+_table_lock = threading.Lock()
+
+
+def rule_table() -> RuleTable:
+    """The process-wide table over RULES_FILE."""
+    global _table
+    with _table_lock:
+        if _table is None:
+            _table = RuleTable()
+        return _table
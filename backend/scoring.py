@@ -0,0 +1,261 @@
+# Grid-based physics scoring for protein-ligand poses
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, NamedTuple, Optional, Tuple
+
+import numpy as np  # type: ignore
+
+from backend.metrics import cache_lookup, stage
+from backend.shared_arrays import Lease, receptor_bundle, shared_store
+from backend.structure_cache import CACHE_DIR
+from backend.structure_format import receptor_atoms
+from backend.structures import Ligand, Receptor, heavy_atoms, receptor_from_atoms
+
+# Grid geometry (Angstrom)
+GRID_SPACING = float(os.environ.get("BIOCANVAS_GRID_SPACING", 1.0))
+GRID_PADDING = 6.0
+CUTOFF = 8.0
+
+# Number of receptors whose grids are kept in memory
+GRID_CACHE_SIZE = int(os.environ.get("BIOCANVAS_GRID_CACHE_SIZE", 16))
+
+# Vina-like radii and term weights
+VDW_RADII = {"C": 1.9, "N": 1.8, "O": 1.7, "S": 2.0, "P": 2.1, "F": 1.5, "Cl": 1.8, "Br": 2.0, "I": 2.2}
+DEFAULT_RADIUS = 1.9
+PROBE_RADIUS = 1.9
+W_GAUSS1 = -0.0356
+W_GAUSS2 = -0.00516
+W_REPULSION = 0.840
+W_HYDROPHOBIC = -0.0351
+W_HBOND = -0.587
+W_ELEC = 0.05
+W_ROT = 0.0585
+
+# Map channels
+STERIC, HYDROPHOBIC, HBOND, ELEC = range(4)
+
+HYDROPHOBIC_ELEMENTS = ("C", "Cl", "Br", "I", "F", "S")
+HBOND_ELEMENTS = ("N", "O")
+
+
+class GridMaps(NamedTuple):
+    origin: np.ndarray  # (3,) float32
+    spacing: float
+    maps: np.ndarray    # (4, nx, ny, nz) float32, weights already applied
+
+
+class LigandModel(NamedTuple):
+    """Heavy-atom ligand with per-atom scoring types."""
+    ligand: Ligand
+    hydrophobic: np.ndarray  # (A,) bool
+    hbond: np.ndarray        # (A,) bool
+    rotatable: np.ndarray    # (R, 2) int32 atom pairs of rotatable bonds
+
+
+def build_grids(receptor: Receptor, spacing: float = GRID_SPACING) -> GridMaps:
+    """Precomputes steric, hydrophobic, H-bond and electrostatic maps around a receptor."""
+    coords = receptor.coords.astype(np.float64)
+    origin = coords.min(axis=0) - GRID_PADDING
+    shape = np.ceil((coords.max(axis=0) + GRID_PADDING - origin) / spacing).astype(int) + 1
+    maps = np.zeros((4,) + tuple(shape), dtype=np.float32)
+    axes = [origin[d] + spacing * np.arange(shape[d]) for d in range(3)]
+    window = int(np.ceil(CUTOFF / spacing))
+    radii = np.array([VDW_RADII.get(e, DEFAULT_RADIUS) for e in receptor.elements])
+    hbond = np.isin(receptor.elements, HBOND_ELEMENTS)
+
+    for i in range(len(coords)):
+        centre = np.rint((coords[i] - origin) / spacing).astype(int)
+        lo = np.maximum(centre - window, 0)
+        hi = np.minimum(centre + window + 1, shape)
+        block = tuple(slice(lo[d], hi[d]) for d in range(3))
+        dx = axes[0][block[0]] - coords[i, 0]
+        dy = axes[1][block[1]] - coords[i, 1]
+        dz = axes[2][block[2]] - coords[i, 2]
+        r = np.sqrt(dx[:, None, None] ** 2 + dy[None, :, None] ** 2 + dz[None, None, :] ** 2)
+        inside = r < CUTOFF
+        d = r - radii[i] - PROBE_RADIUS
+
+        steric = (
+            W_GAUSS1 * np.exp(-(d / 0.5) ** 2)
+            + W_GAUSS2 * np.exp(-((d - 3.0) / 2.0) ** 2)
+            + W_REPULSION * np.where(d < 0, d * d, 0.0)
+        )
+        maps[STERIC][block] += np.where(inside, steric, 0.0)
+        if receptor.hydrophobic[i]:
+            maps[HYDROPHOBIC][block] += np.where(inside, W_HYDROPHOBIC * np.clip(1.5 - d, 0.0, 1.0), 0.0)
+        if hbond[i]:
+            maps[HBOND][block] += np.where(inside, W_HBOND * np.clip(-d / 0.7, 0.0, 1.0), 0.0)
+        if receptor.charges[i]:
+            # Distance-dependent dielectric (4r), clamped inside 1 A
+            rc = np.maximum(r, 1.0)
+            maps[ELEC][block] += np.where(inside, W_ELEC * 332.0 * receptor.charges[i] / (4.0 * rc * rc), 0.0)
+
+    return GridMaps(origin=origin.astype(np.float32), spacing=spacing, maps=maps)
+
+
+def interpolate(grids: GridMaps, points: np.ndarray) -> np.ndarray:
+    """Trilinear interpolation of every map at (P, 3) points; returns (4, P)."""
+    maps = grids.maps
+    shape = np.array(maps.shape[1:])
+    f = (points - grids.origin) / grids.spacing
+    f = np.clip(f, 0.0, shape - 1.000001)
+    i0 = np.floor(f).astype(np.int64)
+    t = (f - i0).astype(np.float32)
+    flat = maps.reshape(4, -1)
+    sy, sz = shape[1] * shape[2], shape[2]
+    base = i0[:, 0] * sy + i0[:, 1] * sz + i0[:, 2]
+
+    # All eight cell corners in one gather: offsets (8,) and weights (8, P)
+    corners = np.array([[cx, cy, cz] for cx in (0, 1) for cy in (0, 1) for cz in (0, 1)])
+    offsets = corners @ np.array([sy, sz, 1])
+    w = np.stack([1.0 - t, t])  # (2, P, 3)
+    weights = w[corners[:, 0], :, 0] * w[corners[:, 1], :, 1] * w[corners[:, 2], :, 2]
+    return (flat[:, base[None, :] + offsets[:, None]] * weights).sum(axis=1)
+
+
+def prepare_ligand(ligand: Ligand) -> LigandModel:
+    """Strips hydrogens and assigns scoring types and rotatable bonds."""
+    heavy = heavy_atoms(ligand)
+    n = len(heavy.elements)
+    neighbours = [[] for _ in range(n)]
+    for a, b, _ in heavy.bonds:
+        neighbours[a].append(b)
+        neighbours[b].append(a)
+
+    hbond = np.isin(heavy.elements, HBOND_ELEMENTS)
+    hydrophobic = np.array([
+        heavy.elements[i] in HYDROPHOBIC_ELEMENTS and not any(hbond[j] for j in neighbours[i])
+        for i in range(n)
+    ], dtype=bool)
+
+    rotatable = [
+        (a, b) for a, b, order in heavy.bonds
+        if order == 1
+        and len(neighbours[a]) > 1 and len(neighbours[b]) > 1
+        and not _in_ring(neighbours, a, b)
+    ]
+    return LigandModel(
+        ligand=heavy,
+        hydrophobic=hydrophobic,
+        hbond=hbond,
+        rotatable=np.array(rotatable, dtype=np.int32).reshape(-1, 2),
+    )
+
+
+def _in_ring(neighbours, a: int, b: int) -> bool:
+    """True if b is still reachable from a without using the a-b bond."""
+    stack, seen = [a], {a}
+    while stack:
+        node = stack.pop()
+        for nxt in neighbours[node]:
+            if node == a and nxt == b:
+                continue
+            if nxt == b:
+                return True
+            if nxt not in seen:
+                seen.add(nxt)
+                stack.append(nxt)
+    return False
+
+
+def score_poses(grids: GridMaps, model: LigandModel, poses: np.ndarray) -> np.ndarray:
+    """Scores (K, A, 3) ligand coordinates; returns (K,) energies in kcal/mol."""
+    k, a, _ = poses.shape
+    values = interpolate(grids, poses.reshape(-1, 3)).reshape(4, k, a)
+    per_atom = (
+        values[STERIC]
+        + values[HYDROPHOBIC] * model.hydrophobic
+        + values[HBOND] * model.hbond
+        + values[ELEC] * model.ligand.charges
+    )
+    return per_atom.sum(axis=1) / (1.0 + W_ROT * len(model.rotatable))
+
+
+def random_rotations(rng: np.random.Generator, n: int) -> np.ndarray:
+    """Uniformly distributed rotation matrices from random unit quaternions."""
+    q = rng.normal(size=(n, 4))
+    q /= np.linalg.norm(q, axis=1, keepdims=True)
+    w, x, y, z = q.T
+    return np.stack([
+        np.stack([1 - 2 * (y * y + z * z), 2 * (x * y - z * w), 2 * (x * z + y * w)], axis=-1),
+        np.stack([2 * (x * y + z * w), 1 - 2 * (x * x + z * z), 2 * (y * z - x * w)], axis=-1),
+        np.stack([2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x * x + y * y)], axis=-1),
+    ], axis=1)
+
+
+def contact_points(grids: GridMaps, threshold: float = -0.2) -> np.ndarray:
+    """Grid points touching the receptor surface without clashing, as (P, 3) coordinates."""
+    idx = np.argwhere(grids.maps[STERIC] < threshold)
+    return (grids.origin + idx * grids.spacing).astype(np.float32)
+
+
+# Per-receptor grid cache: in memory (LRU), in shared memory across processes, and as .npz files on disk
+_grid_cache: "OrderedDict[str, Tuple[GridMaps, Optional[Lease]]]" = OrderedDict()
+_grid_lock = threading.Lock()
+GRID_DIR = os.path.join(CACHE_DIR, "grids")
+
+
+def _grids_from_disk(receptor_key: str, load_pdb: Callable[[], str]) -> GridMaps:
+    """Loads the grids saved for a receptor, building and saving them if there are none."""
+    path = os.path.join(GRID_DIR, f"{receptor_key}-{GRID_SPACING:g}.npz")
+    try:
+        with np.load(path) as data:
+            grids = GridMaps(origin=data["origin"], spacing=float(data["spacing"]), maps=data["maps"])
+        cache_lookup("grids", "disk")
+    except (FileNotFoundError, KeyError, ValueError):
+        cache_lookup("grids", "miss")
+        with stage("build_grids"):
+            grids = build_grids(receptor_from_atoms(receptor_atoms(receptor_key, load_pdb)))
+        os.makedirs(GRID_DIR, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp_path, origin=grids.origin, spacing=grids.spacing, maps=grids.maps)
+        os.replace(tmp_path, path)
+    return grids
+
+
+def get_grids(receptor_key: str, load_pdb: Callable[[], str]) -> GridMaps:
+    """
+    Returns the grid maps for a receptor, building and caching them on first use.
+    load_pdb is only called if the receptor has no structure file yet. The maps
+    are published once to shared memory and mapped read-only by every process.
+    """
+    with _grid_lock:
+        cached = _grid_cache.get(receptor_key)
+        if cached is not None:
+            _grid_cache.move_to_end(receptor_key)
+            cache_lookup("grids", "hit")
+            return cached[0]
+
+    def build() -> Dict[str, np.ndarray]:
+        grids = _grids_from_disk(receptor_key, load_pdb)
+        return {"origin": grids.origin, "spacing": np.array([grids.spacing]), "maps": grids.maps}
+
+    lease: Optional[Lease]
+    try:
+        lease = shared_store().get_or_publish(*receptor_bundle("grids", receptor_key, f"{GRID_SPACING:g}"), build)
+        arrays = lease.arrays
+    except OSError:
+        # Shared memory full or unavailable: keep a private copy
+        lease, arrays = None, build()
+    grids = GridMaps(origin=arrays["origin"], spacing=float(arrays["spacing"][0]), maps=arrays["maps"])
+
+    evicted = []
+    with _grid_lock:
+        if receptor_key in _grid_cache:
+            evicted.append(_grid_cache[receptor_key][1])
+        _grid_cache[receptor_key] = (grids, lease)
+        while len(_grid_cache) > GRID_CACHE_SIZE:
+            evicted.append(_grid_cache.popitem(last=False)[1][1])
+    for old in evicted:
+        if old is not None:
+            old.release()
+    return grids
+
+
+def binding_strength(score: float) -> str:
+    if score <= -8.0:
+        return "Strong Binding"
+    if score <= -5.0:
+        return "Moderate Binding"
+    return "Weak Binding"
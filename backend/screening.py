@@ -0,0 +1,128 @@
+# Batch docking and full-matrix screening helpers
+import json
+import os
+import threading
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from backend.docking_engine import ENGINE_VERSION, educational_docking_many
+from backend.result_store import ResultKey, ResultStore
+
+# Number of best ligands retained per protein by the server-side leaderboard
+LEADERBOARD_SIZE = int(os.environ.get("BIOCANVAS_LEADERBOARD_SIZE", 10))
+
+# Pairs looked up in the result store with one query
+SCREEN_BATCH = 256
+
+
+def scoring_version(rules=None) -> str:
+    """
+    Engine and rule-table version educational scores are computed with (the
+    current rules by default); leaderboards only rank scores of one version.
+    """
+    if rules is None:
+        from backend.rules import rule_table
+        rules = rule_table().current()
+    return f"{ENGINE_VERSION}/{rules.version}"
+
+
+class Leaderboard:
+    """
+    Keeps the best-scoring (most negative) ligands seen for each protein, in
+    this process. Offering scores of another scoring version starts it over.
+    """
+
+    def __init__(self, capacity: int = LEADERBOARD_SIZE):
+        self.capacity = capacity
+        self.version = ""
+        self._scores: Dict[int, Dict[int, float]] = {}
+        self._lock = threading.Lock()
+
+    def offer(self, protein_id: int, ligand_id: int, score: float, version: str = "") -> None:
+        with self._lock:
+            if version != self.version:
+                self._scores, self.version = {}, version
+            board = self._scores.setdefault(protein_id, {})
+            board[ligand_id] = min(score, board.get(ligand_id, score))
+            if len(board) > self.capacity:
+                worst = max(board, key=board.get)
+                del board[worst]
+
+    def offer_many(self, entries: Iterable[Tuple[int, int, float]], version: str = "") -> None:
+        for protein_id, ligand_id, score in entries:
+            self.offer(protein_id, ligand_id, score, version)
+
+    def top(self, protein_id: int, k: Optional[int] = None, version: str = "") -> List[Dict[str, Any]]:
+        with self._lock:
+            board = dict(self._scores.get(protein_id, {})) if version == self.version else {}
+        ranked = sorted(board.items(), key=lambda item: item[1])[:k or self.capacity]
+        return [{"ligand_id": ligand_id, "score": score} for ligand_id, score in ranked]
+
+
+class StoredLeaderboard(Leaderboard):
+    """
+    A leaderboard kept in the result store's database, so every worker
+    process (and every restart) ranks the same results.
+    """
+
+    def __init__(self, store: ResultStore, capacity: int = LEADERBOARD_SIZE):
+        self.capacity = capacity
+        self.store = store
+
+    def offer(self, protein_id: int, ligand_id: int, score: float, version: str = "") -> None:
+        self.offer_many([(protein_id, ligand_id, score)], version)
+
+    def offer_many(self, entries: Iterable[Tuple[int, int, float]], version: str = "") -> None:
+        self.store.offer_best(list(entries), self.capacity, version)
+
+    def top(self, protein_id: int, k: Optional[int] = None, version: str = "") -> List[Dict[str, Any]]:
+        return [{"ligand_id": ligand_id, "score": score}
+                for ligand_id, score in self.store.best(protein_id, k or self.capacity, version)]
+
+
+def iter_ndjson(pairs: Iterable[Tuple[int, int, Optional[int]]], leaderboard: Leaderboard,
+                top_k: Optional[int] = None, results: Optional[ResultStore] = None,
+                key_for: Optional[Callable[[int, int, Optional[int]], ResultKey]] = None,
+                rules=None) -> Iterator[bytes]:
+    """
+    Scores each (protein_id, ligand_id, seed) triple (seed None for the pair's
+    default) and yields one JSON line per result
+    as soon as its batch is computed. With a result store (and key_for to build
+    its keys), stored results are reused and only new pairs are scored; `rules`
+    is the rule-table snapshot key_for was built from, so every new result is
+    scored with the rules its key names. Every result is offered to
+    `leaderboard` under the scoring version of `rules`; with top_k, a final
+    line ranks this run's own results for every protein it touched.
+    """
+    if rules is None:
+        from backend.rules import rule_table
+        rules = rule_table().current()
+    version = scoring_version(rules)
+    run_board = Leaderboard(top_k) if top_k else None
+    seen: Dict[int, None] = {}
+    pairs = iter(pairs)
+    while True:
+        batch = list(islice(pairs, SCREEN_BATCH))
+        if not batch:
+            break
+        keys = [key_for(p, l, seed) for p, l, seed in batch] if results is not None else []
+        stored = results.get_many(keys) if results is not None else {}
+        missing = [i for i in range(len(batch)) if not keys or keys[i] not in stored]
+        computed = dict(zip(missing, educational_docking_many(
+            [batch[i][:2] for i in missing], [batch[i][2] for i in missing], rules=rules)))
+        new = [(keys[i], computed[i]) for i in missing] if keys else []
+        offered = []
+        for i, (protein_id, ligand_id, _) in enumerate(batch):
+            result = computed[i] if i in computed else stored[keys[i]]
+            offered.append((protein_id, ligand_id, result["score"]))
+            if run_board is not None:
+                run_board.offer(protein_id, ligand_id, result["score"])
+            seen[protein_id] = None
+            line = {"protein_id": protein_id, "ligand_id": ligand_id, **result}
+            yield (json.dumps(line) + "\n").encode()
+        if results is not None:
+            results.put_many(new)
+        leaderboard.offer_many(offered, version)
+    if run_board is not None:
+        ranking = {str(pid): run_board.top(pid) for pid in seen}
+        yield (json.dumps({"leaderboard": ranking}) + "\n").encode()
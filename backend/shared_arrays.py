@@ -0,0 +1,288 @@
+# Versioned NumPy arrays published once in shared memory and mapped read-only by every worker
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np  # type: ignore
+
+try:
+    import fcntl
+except ImportError:  # Windows: no flock, and os.kill(pid, 0) would terminate lease holders
+    fcntl = None
+
+from backend.metrics import cache_lookup
+from backend.structure_cache import CACHE_DIR
+
+# Bundles live in RAM under /dev/shm when available; one directory per cache directory
+_SHM = "/dev/shm"
+SHARED_DIR = os.environ.get("BIOCANVAS_SHARED_DIR") or (
+    os.path.join(_SHM, "biocanvas-" + hashlib.sha256(os.path.abspath(CACHE_DIR).encode()).hexdigest()[:12])
+    if os.path.isdir(_SHM) and os.access(_SHM, os.W_OK)
+    else os.path.join(CACHE_DIR, "shared")
+)
+
+# Bundles without leases are evicted, least recently attached first, above this size
+SHARED_MAX_BYTES = int(os.environ.get("BIOCANVAS_SHARED_MAX_BYTES", 1024 * 1024 * 1024))
+
+LEASES = ".leases"
+PUBLISHED = ".published"   # mtime orders versions; the bundle's own mtime records the last attach
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def receptor_bundle(kind: str, receptor_key: str, *params: str) -> Tuple[str, str]:
+    """
+    (name, version) of a per-receptor bundle. Receptor keys look like
+    "P00533-v4"; the name stays the same across AlphaFold versions so that
+    publishing a new version supersedes the old one.
+    """
+    ident, sep, af_version = receptor_key.rpartition("-v")
+    name = f"{kind}-{ident if sep else receptor_key}"
+    return name, "-".join((f"v{af_version}" if sep else "v0",) + params)
+
+
+class Lease:
+    """A read-only mapping of one published bundle; release() when done with it."""
+
+    def __init__(self, store: "SharedArrays", name: str, version: str, arrays: Dict[str, np.ndarray]):
+        self.store = store
+        self.name = name
+        self.version = version
+        self.arrays = arrays
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self.store._release(self.name, self.version)
+
+    def __enter__(self) -> "Lease":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.release()
+
+
+class SharedArrays:
+    """
+    Named, versioned bundles of arrays stored as .npy files under `root`
+    and memory-mapped read-only, so every process maps the same pages.
+
+    A process holding a bundle keeps a lease file named after its pid in the
+    bundle's .leases directory (one per process, reference-counted inside
+    it). Publishing a new version of a name supersedes the older ones; they
+    and any bundles over the size budget are deleted once no live process
+    holds a lease. Mappings that already exist stay valid after deletion.
+    """
+
+    def __init__(self, root: str = SHARED_DIR, max_bytes: int = SHARED_MAX_BYTES):
+        self.root = os.path.abspath(root)
+        self.max_bytes = max_bytes
+        os.makedirs(self.root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._refs: Dict[Tuple[str, str], int] = {}
+
+    def _path(self, name: str, version: str) -> str:
+        return os.path.join(self.root, name, version)
+
+    def attach(self, name: str, version: str) -> Optional[Lease]:
+        """Maps a published bundle, or returns None if it does not exist."""
+        path = self._path(name, version)
+        with self._lock:
+            first = (name, version) not in self._refs
+            if first:
+                try:
+                    # The lease goes in before the arrays are mapped; collect() checks leases first
+                    os.close(os.open(os.path.join(path, LEASES, str(os.getpid())), os.O_CREAT | os.O_WRONLY, 0o644))
+                except FileNotFoundError:
+                    cache_lookup("shared_arrays", "miss")
+                    return None
+            try:
+                arrays = {
+                    entry[:-len(".npy")]: np.load(os.path.join(path, entry), mmap_mode="r")
+                    for entry in os.listdir(path) if entry.endswith(".npy")
+                }
+            except FileNotFoundError:
+                if first:
+                    self._unlink_lease(name, version)
+                cache_lookup("shared_arrays", "miss")
+                return None
+            self._refs[(name, version)] = self._refs.get((name, version), 0) + 1
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        cache_lookup("shared_arrays", "hit")
+        return Lease(self, name, version, arrays)
+
+    def _unlink_lease(self, name: str, version: str) -> None:
+        try:
+            os.unlink(os.path.join(self._path(name, version), LEASES, str(os.getpid())))
+        except FileNotFoundError:
+            pass
+
+    def _release(self, name: str, version: str) -> None:
+        with self._lock:
+            count = self._refs.get((name, version), 0) - 1
+            if count > 0:
+                self._refs[(name, version)] = count
+                return
+            self._refs.pop((name, version), None)
+            self._unlink_lease(name, version)
+
+    def publish(self, name: str, version: str, arrays: Dict[str, np.ndarray]) -> None:
+        """Writes a bundle atomically; a bundle another process published first wins."""
+        os.makedirs(os.path.join(self.root, name), exist_ok=True)
+        tmp_path = tempfile.mkdtemp(dir=os.path.join(self.root, name), prefix=".tmp-")
+        try:
+            os.mkdir(os.path.join(tmp_path, LEASES))
+            open(os.path.join(tmp_path, PUBLISHED), "w").close()
+            for key, array in arrays.items():
+                np.save(os.path.join(tmp_path, f"{key}.npy"), np.ascontiguousarray(array))
+            os.rename(tmp_path, self._path(name, version))
+        except OSError:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            if not os.path.isdir(self._path(name, version)):
+                raise
+        self.collect()
+
+    def get_or_publish(self, name: str, version: str,
+                       build: Callable[[], Dict[str, np.ndarray]]) -> Lease:
+        """
+        Attaches a bundle, building and publishing it on a miss. A lock file
+        per name makes concurrent misses in other processes wait for one build.
+        Raises OSError where bundles cannot be shared, so callers keep a
+        private copy instead.
+        """
+        if fcntl is None:
+            raise OSError("Shared arrays need flock, which this platform lacks")
+        lease = self.attach(name, version)
+        if lease is not None:
+            return lease
+        os.makedirs(os.path.join(self.root, name), exist_ok=True)
+        fd = os.open(os.path.join(self.root, name, ".lock"), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            lease = self.attach(name, version)
+            if lease is None:
+                self.publish(name, version, build())
+                lease = self.attach(name, version)
+        finally:
+            os.close(fd)
+        if lease is None:
+            raise FileNotFoundError(f"Shared bundle {name}@{version} was evicted while publishing")
+        return lease
+
+    def _leased(self, path: str) -> bool:
+        """True if a live process holds a lease; removes leases of dead processes."""
+        leased = False
+        try:
+            holders = os.listdir(os.path.join(path, LEASES))
+        except FileNotFoundError:
+            return False
+        for holder in holders:
+            if holder.isdigit() and _pid_alive(int(holder)):
+                leased = True
+            else:
+                try:
+                    os.unlink(os.path.join(path, LEASES, holder))
+                except FileNotFoundError:
+                    pass
+        return leased
+
+    def _remove(self, path: str) -> None:
+        # Renaming first makes the removal atomic for attach(); mapped pages stay valid
+        trash = os.path.join(os.path.dirname(path), f".trash-{os.getpid()}-{time.monotonic_ns()}")
+        try:
+            os.rename(path, trash)
+        except FileNotFoundError:
+            return
+        shutil.rmtree(trash, ignore_errors=True)
+
+    def _remove_stale(self, directory: str, max_age: float = 3600.0) -> None:
+        """Removes half-written and half-deleted bundles left behind by crashed processes."""
+        try:
+            entries = [e for e in os.scandir(directory) if e.name.startswith((".tmp-", ".trash-"))]
+        except (FileNotFoundError, NotADirectoryError):
+            return
+        for entry in entries:
+            try:
+                if time.time() - entry.stat().st_mtime > max_age:
+                    shutil.rmtree(entry.path, ignore_errors=True)
+            except FileNotFoundError:
+                pass
+
+    def collect(self) -> None:
+        """Deletes superseded bundles and evicts unleased ones over the size budget."""
+        if fcntl is None:
+            return
+        bundles = []   # (last attached, size, path)
+        try:
+            names = [n for n in os.listdir(self.root) if not n.startswith(".")]
+        except FileNotFoundError:
+            return
+        for name in names:
+            directory = os.path.join(self.root, name)
+            self._remove_stale(directory)
+            try:
+                versions = sorted(
+                    (os.stat(os.path.join(directory, v, PUBLISHED)).st_mtime, v)
+                    for v in os.listdir(directory) if not v.startswith(".")
+                )
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+            for i, (_, version) in enumerate(versions):
+                path = os.path.join(directory, version)
+                superseded = i < len(versions) - 1
+                if superseded and not self._leased(path):
+                    self._remove(path)
+                    continue
+                try:
+                    size = sum(e.stat().st_size for e in os.scandir(path) if e.is_file())
+                    bundles.append((os.stat(path).st_mtime, size, path))
+                except FileNotFoundError:
+                    continue
+
+        total = sum(size for _, size, _ in bundles)
+        for _, size, path in sorted(bundles):
+            if total <= self.max_bytes:
+                break
+            if not self._leased(path):
+                self._remove(path)
+                total -= size
+
+    def close(self) -> None:
+        """Drops every lease this process holds."""
+        with self._lock:
+            held = list(self._refs)
+            self._refs.clear()
+        for name, version in held:
+            self._unlink_lease(name, version)
+
+
+_stores: Dict[str, SharedArrays] = {}
+_stores_lock = threading.Lock()
+
+
+def _store_for(root: str) -> SharedArrays:
+    with _stores_lock:
+        if root not in _stores:
+            _stores[root] = SharedArrays(root)
+        return _stores[root]
+
+
+def shared_store() -> SharedArrays:
+    """The process-wide store under SHARED_DIR."""
+    return _store_for(os.path.abspath(SHARED_DIR))
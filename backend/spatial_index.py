@@ -0,0 +1,195 @@
+# Cell-list spatial index over receptor atoms for radius, k-nearest and contact queries
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np  # type: ignore
+
+from backend.metrics import cache_lookup
+from backend.shared_arrays import Lease, receptor_bundle, shared_store
+from backend.structure_format import receptor_atoms
+
+# Edge of a cubic cell in Angstrom; close to typical contact cutoffs
+CELL_SIZE = 4.0
+
+# Number of receptors whose indexes are kept in memory
+INDEX_CACHE_SIZE = 32
+
+
+class CellList:
+    """
+    Buckets points into cubic cells, sorted so each cell is a contiguous run.
+    Queries only look at cells overlapping the search radius, so contact
+    enumeration costs O(N_query * local density) instead of O(N_query * N_atoms).
+    """
+
+    def __init__(self, coords: np.ndarray, cell_size: float = CELL_SIZE):
+        self.coords = np.ascontiguousarray(coords, dtype=np.float32).reshape(-1, 3)
+        self.cell_size = cell_size
+        if len(self.coords):
+            self.origin = self.coords.min(axis=0)
+            cells = self._cells(self.coords)
+            self.dims = cells.max(axis=0) + 1
+        else:
+            self.origin = np.zeros(3, dtype=np.float32)
+            cells = np.zeros((0, 3), dtype=np.int64)
+            self.dims = np.ones(3, dtype=np.int64)
+        flat = np.ravel_multi_index(cells.T, self.dims)
+        self.order = np.argsort(flat, kind="stable")
+        # starts[c]:starts[c + 1] are the positions in `order` of atoms in cell c
+        self.starts = np.searchsorted(flat[self.order], np.arange(int(np.prod(self.dims)) + 1))
+
+    def __len__(self) -> int:
+        return len(self.coords)
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        return {"coords": self.coords, "cell_size": np.array([self.cell_size]), "origin": self.origin,
+                "dims": self.dims, "order": self.order, "starts": self.starts}
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray]) -> "CellList":
+        """Rebuilds an index from to_arrays() output (e.g. read-only shared mappings) without copying."""
+        index = cls.__new__(cls)
+        index.coords, index.origin, index.dims = arrays["coords"], arrays["origin"], arrays["dims"]
+        index.order, index.starts = arrays["order"], arrays["starts"]
+        index.cell_size = float(arrays["cell_size"][0])
+        return index
+
+    def _cells(self, points: np.ndarray) -> np.ndarray:
+        return np.floor((points - self.origin) / self.cell_size).astype(np.int64)
+
+    def pairs_within(self, points: np.ndarray, radius: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        All (point, atom) pairs closer than radius.
+        Returns point indices, atom indices and distances as flat arrays.
+        """
+        points = np.asarray(points, dtype=np.float32).reshape(-1, 3)
+        empty = (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32))
+        if len(points) == 0 or len(self.coords) == 0:
+            return empty
+
+        reach = int(np.ceil(radius / self.cell_size))
+        steps = np.arange(-reach, reach + 1)
+        offsets = np.stack(np.meshgrid(steps, steps, steps, indexing="ij"), axis=-1).reshape(-1, 3)
+        cells = self._cells(points)[:, None, :] + offsets[None, :, :]   # (P, K, 3)
+        valid = np.all((cells >= 0) & (cells < self.dims), axis=-1)
+        point_ids = np.nonzero(valid)[0]
+        flat = np.ravel_multi_index(cells[valid].T, self.dims)
+
+        start, end = self.starts[flat], self.starts[flat + 1]
+        counts = end - start
+        total = int(counts.sum())
+        if total == 0:
+            return empty
+        # Expand every (point, cell) into one entry per atom in that cell
+        run_offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+        atom_ids = self.order[np.repeat(start, counts) + run_offsets]
+        point_ids = np.repeat(point_ids, counts)
+
+        delta = points[point_ids] - self.coords[atom_ids]
+        dist = np.sqrt((delta * delta).sum(axis=1))
+        keep = dist < radius
+        return point_ids[keep], atom_ids[keep], dist[keep]
+
+    def query_radius(self, point: np.ndarray, radius: float) -> np.ndarray:
+        """Indices of atoms within radius of a single point, nearest first."""
+        _, atoms, dist = self.pairs_within(np.asarray(point).reshape(1, 3), radius)
+        return atoms[np.argsort(dist, kind="stable")]
+
+    def query_knn(self, points: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        The k nearest atoms of each point as (P, k) index and distance arrays.
+        Rows are padded with -1 / inf when the index holds fewer than k atoms.
+        The search radius doubles from one cell until it holds k atoms; points
+        still short once it spans the box (e.g. points far outside it) are
+        answered by a scan over all atoms instead of an ever larger cell window.
+        """
+        points = np.asarray(points, dtype=np.float32).reshape(-1, 3)
+        indices = np.full((len(points), k), -1, dtype=np.int64)
+        distances = np.full((len(points), k), np.inf, dtype=np.float32)
+        k_avail = min(k, len(self.coords))
+        if not k_avail or not len(points):
+            return indices, distances
+        pending = np.arange(len(points))
+        radius = self.cell_size
+        diagonal = float(np.linalg.norm(self.dims * self.cell_size))
+
+        while len(pending) and radius <= diagonal:
+            p, a, d = self.pairs_within(points[pending], radius)
+            done = np.bincount(p, minlength=len(pending)) >= k_avail
+            sel = done[p]
+            self._fill_nearest(pending, p[sel], a[sel], d[sel], k_avail, indices, distances)
+            pending = pending[~done]
+            radius *= 2.0
+
+        # A point's k nearest can lie as far as its distance to the box plus the diagonal, so
+        # points still pending (mostly ones well outside the box) are scanned exactly
+        chunk = max(1, (1 << 22) // len(self.coords))
+        for begin in range(0, len(pending), chunk):
+            rows = pending[begin:begin + chunk]
+            delta = points[rows][:, None, :] - self.coords[None, :, :]
+            d = np.sqrt((delta * delta).sum(axis=-1))
+            nearest = np.argpartition(d, k_avail - 1, axis=1)[:, :k_avail] if k_avail < d.shape[1] \
+                else np.broadcast_to(np.arange(d.shape[1]), d.shape)
+            p = np.repeat(np.arange(len(rows)), k_avail)
+            a = nearest.ravel()
+            self._fill_nearest(rows, p, a, d[p, a], k_avail, indices, distances)
+        return indices, distances
+
+    @staticmethod
+    def _fill_nearest(rows: np.ndarray, p: np.ndarray, a: np.ndarray, d: np.ndarray, k: int,
+                      indices: np.ndarray, distances: np.ndarray) -> None:
+        """Writes the k nearest of the (row position, atom, distance) candidates into each row."""
+        order = np.lexsort((d, p))
+        p, a, d = p[order], a[order], d[order]
+        counts = np.bincount(p, minlength=len(rows))
+        rank = np.arange(len(p)) - np.repeat(np.cumsum(counts) - counts, counts)
+        first = rank < k
+        indices[rows[p[first]], rank[first]] = a[first]
+        distances[rows[p[first]], rank[first]] = d[first]
+
+    def contacts(self, ligand_coords: np.ndarray, cutoff: float = 4.0) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Ligand-receptor atom pairs within cutoff: (ligand index, receptor index, distance)."""
+        return self.pairs_within(ligand_coords, cutoff)
+
+
+_index_cache: "OrderedDict[str, Tuple[CellList, Optional[Lease]]]" = OrderedDict()
+_index_lock = threading.Lock()
+
+
+def receptor_index(receptor_key: str, load_pdb: Callable[[], str]) -> CellList:
+    """
+    Returns the cached cell list over a receptor's atoms. Atom indices refer
+    to the receptor's structure records, so residues can be looked up directly.
+    The index arrays are published once to shared memory for every process.
+    """
+    with _index_lock:
+        cached = _index_cache.get(receptor_key)
+        if cached is not None:
+            _index_cache.move_to_end(receptor_key)
+            cache_lookup("spatial_index", "hit")
+            return cached[0]
+
+    def build() -> Dict[str, np.ndarray]:
+        cache_lookup("spatial_index", "miss")
+        return CellList(receptor_atoms(receptor_key, load_pdb)["xyz"]).to_arrays()
+
+    lease: Optional[Lease]
+    try:
+        lease = shared_store().get_or_publish(*receptor_bundle("index", receptor_key, f"{CELL_SIZE:g}"), build)
+        arrays = lease.arrays
+    except OSError:
+        lease, arrays = None, build()
+    index = CellList.from_arrays(arrays)
+
+    evicted = []
+    with _index_lock:
+        if receptor_key in _index_cache:
+            evicted.append(_index_cache[receptor_key][1])
+        _index_cache[receptor_key] = (index, lease)
+        while len(_index_cache) > INDEX_CACHE_SIZE:
+            evicted.append(_index_cache.popitem(last=False)[1][1])
+    for old in evicted:
+        if old is not None:
+            old.release()
+    return index
@@ -0,0 +1,102 @@
+# Cold-start profile (spawn to ready, per stage and per deferred import) and lazily imported modules
+import importlib
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# Wall-clock time (time.time()) at which the parent spawned this process
+SPAWNED_AT_ENV = "BIOCANVAS_SPAWNED_AT"
+
+logger = logging.getLogger("biocanvas.startup")
+
+
+class StartupProfile:
+    """
+    Startup stages of this process, timed from when its parent spawned it
+    (or from this module's import), and how long each lazily imported
+    module took on first use.
+    """
+
+    def __init__(self):
+        now = time.time()
+        try:
+            self.spawned_at = float(os.environ[SPAWNED_AT_ENV])
+        except (KeyError, ValueError):
+            self.spawned_at = now
+        # The interpreter, site packages and whatever ran before this module
+        self.stages: List[Tuple[str, float]] = [("interpreter", max(0.0, now - self.spawned_at))]
+        self.imports: Dict[str, float] = {}
+        self.ready_after: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.stages.append((name, time.perf_counter() - start))
+
+    def record_import(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.imports[name] = seconds
+
+    def ready(self) -> Dict[str, Any]:
+        """Marks the process ready, logs the profile and returns it."""
+        self.ready_after = time.time() - self.spawned_at
+        report = self.report()
+        logger.info("Ready %.2fs after spawn (%s)", self.ready_after,
+                    ", ".join(f"{name} {seconds:.2f}s" for name, seconds in report["stages"].items()))
+        return report
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            stages, imports = list(self.stages), dict(self.imports)
+        return {
+            "ready_s": round(self.ready_after, 4) if self.ready_after is not None else None,
+            "stages": {name: round(seconds, 4) for name, seconds in stages},
+            "imports": {name: round(seconds, 4) for name, seconds in imports.items()},
+        }
+
+
+startup = StartupProfile()
+
+
+class LazyModule:
+    """
+    Stands in for a module until one of its attributes is used, then imports
+    it (once, thread-safely) and records the import time in the profile.
+    Attribute lookups in `except` clauses only run when an exception is being
+    matched, so `except lazy.Error:` does not force the import either.
+    """
+
+    def __init__(self, name: str, profile: StartupProfile = startup):
+        self._name = name
+        self._profile = profile
+        self._module: Any = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> Any:
+        with self._lock:
+            if self._module is None:
+                loaded = self._name in sys.modules
+                start = time.perf_counter()
+                self._module = importlib.import_module(self._name)
+                if not loaded:
+                    self._profile.record_import(self._name, time.perf_counter() - start)
+        return self._module
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self._module if self._module is not None else self._load(), attr)
+
+    def __repr__(self) -> str:
+        return f"<lazy module {self._name!r}{'' if self._module is None else ' (loaded)'}>"
+
+
+def lazy_module(name: str) -> LazyModule:
+    return LazyModule(name)
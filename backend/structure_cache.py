@@ -0,0 +1,226 @@
+# Persistent on-disk store for upstream structure files (AlphaFold PDBs, PubChem SDFs)
+import hashlib
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import NamedTuple, Optional
+
+from backend.metrics import cache_lookup
+
+
+def _env_flag(name: str) -> bool:
+    return os.environ.get(name, "").strip().lower() in ("1", "true", "yes", "on")
+
+
+# Configuration (overridable through the environment)
+CACHE_DIR = os.environ.get(
+    "BIOCANVAS_CACHE_DIR",
+    os.path.join(os.path.dirname(__file__), "..", ".cache"),
+)
+MAX_BYTES = int(os.environ.get("BIOCANVAS_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+NEGATIVE_TTL = float(os.environ.get("BIOCANVAS_NEGATIVE_TTL", 3600))
+OFFLINE = _env_flag("BIOCANVAS_OFFLINE")
+
+
+def connect_shared(db_path: str) -> sqlite3.Connection:
+    """
+    Opens a SQLite database shared by the backend processes, in WAL mode.
+    Processes switching a new file to WAL at once can get "database is
+    locked" without the busy timeout applying, so that switch is retried.
+    """
+    db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None, timeout=30)
+    deadline = time.monotonic() + 30
+    while True:
+        try:
+            db.execute("PRAGMA journal_mode=WAL")
+            return db
+        except sqlite3.OperationalError:
+            if time.monotonic() >= deadline:
+                db.close()
+                raise
+            time.sleep(0.05)
+
+
+class CacheEntry(NamedTuple):
+    data: Optional[bytes]
+    negative: bool
+
+
+class StructureCache:
+    """
+    Content-addressed structure store keyed by (source, id, version).
+
+    Blobs live under objects/ named by their SHA-256 digest and are written
+    atomically; a small SQLite index maps keys to digests and tracks access
+    times for size-bounded LRU eviction. Upstream 404s are recorded as
+    negative entries that expire after a TTL.
+    """
+
+    def __init__(self, root: str = CACHE_DIR, max_bytes: int = MAX_BYTES,
+                 negative_ttl: float = NEGATIVE_TTL, offline: bool = OFFLINE):
+        self.root = os.path.abspath(root)
+        self.max_bytes = max_bytes
+        self.negative_ttl = negative_ttl
+        self.offline = offline
+        self._objects = os.path.join(self.root, "objects")
+        os.makedirs(self._objects, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = connect_shared(os.path.join(self.root, "index.sqlite"))
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS entries (
+                   source TEXT NOT NULL,
+                   ident TEXT NOT NULL,
+                   version TEXT NOT NULL,
+                   digest TEXT,
+                   size INTEGER NOT NULL DEFAULT 0,
+                   last_access REAL NOT NULL,
+                   expires REAL,
+                   PRIMARY KEY (source, ident, version)
+               )"""
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_lru ON entries (last_access)")
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self._objects, digest[:2], digest)
+
+    def lookup(self, source: str, ident: str, version: str = "",
+               allow_stale: Optional[bool] = None) -> Optional[CacheEntry]:
+        """
+        Returns the cached entry, or None on a miss.
+        Expired entries are ignored unless allow_stale is set (defaults to offline mode).
+        """
+        if allow_stale is None:
+            allow_stale = self.offline
+        key = (source, str(ident), version)
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT digest, expires FROM entries WHERE source=? AND ident=? AND version=?",
+                key,
+            ).fetchone()
+            if row is None:
+                cache_lookup(source, "miss")
+                return None
+            digest, expires = row
+            if expires is not None and expires < now and not allow_stale:
+                cache_lookup(source, "expired")
+                return None
+            if digest is None:
+                cache_lookup(source, "negative")
+                return CacheEntry(data=None, negative=True)
+            try:
+                with open(self._blob_path(digest), "rb") as f:
+                    data = f.read()
+            except FileNotFoundError:
+                # Blob removed behind our back; drop the dangling entry
+                self._db.execute(
+                    "DELETE FROM entries WHERE source=? AND ident=? AND version=?", key
+                )
+                cache_lookup(source, "miss")
+                return None
+            self._db.execute(
+                "UPDATE entries SET last_access=? WHERE source=? AND ident=? AND version=?",
+                (now,) + key,
+            )
+        cache_lookup(source, "hit")
+        return CacheEntry(data=data, negative=False)
+
+    def put(self, source: str, ident: str, version: str, data: bytes,
+            ttl: Optional[float] = None) -> None:
+        """Stores data under the key, replacing any previous (or negative) entry."""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
+                raise
+        now = time.time()
+        expires = now + ttl if ttl is not None else None
+        with self._lock:
+            old = self._replace_entry(source, str(ident), version, digest, len(data), now, expires)
+            self._release_blob(old)
+            self._evict()
+
+    def put_negative(self, source: str, ident: str, version: str = "",
+                     ttl: Optional[float] = None) -> None:
+        """Records that the upstream has no such structure (e.g. HTTP 404)."""
+        now = time.time()
+        expires = now + (self.negative_ttl if ttl is None else ttl)
+        with self._lock:
+            old = self._replace_entry(source, str(ident), version, None, 0, now, expires)
+            self._release_blob(old)
+
+    def total_bytes(self) -> int:
+        with self._lock:
+            return self._total_bytes()
+
+    def _replace_entry(self, source, ident, version, digest, size, now, expires) -> Optional[str]:
+        row = self._db.execute(
+            "SELECT digest FROM entries WHERE source=? AND ident=? AND version=?",
+            (source, ident, version),
+        ).fetchone()
+        self._db.execute(
+            "INSERT OR REPLACE INTO entries (source, ident, version, digest, size, last_access, expires) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (source, ident, version, digest, size, now, expires),
+        )
+        if row is not None and row[0] != digest:
+            return row[0]
+        return None
+
+    def _release_blob(self, digest: Optional[str]) -> None:
+        """Deletes a blob once no entry references it any more."""
+        if digest is None:
+            return
+        refs = self._db.execute(
+            "SELECT COUNT(*) FROM entries WHERE digest=?", (digest,)
+        ).fetchone()[0]
+        if refs == 0:
+            try:
+                os.unlink(self._blob_path(digest))
+            except FileNotFoundError:
+                pass
+
+    def _total_bytes(self) -> int:
+        row = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM "
+            "(SELECT DISTINCT digest, size FROM entries WHERE digest IS NOT NULL)"
+        ).fetchone()
+        return row[0]
+
+    def _evict(self) -> None:
+        """Drops least-recently-used entries until the store fits in max_bytes."""
+        total = self._total_bytes()
+        if total <= self.max_bytes:
+            return
+        rows = self._db.execute(
+            "SELECT source, ident, version, digest FROM entries "
+            "WHERE digest IS NOT NULL ORDER BY last_access"
+        ).fetchall()
+        for source, ident, version, digest in rows:
+            if total <= self.max_bytes:
+                break
+            self._db.execute(
+                "DELETE FROM entries WHERE source=? AND ident=? AND version=?",
+                (source, ident, version),
+            )
+            refs = self._db.execute(
+                "SELECT COUNT(*) FROM entries WHERE digest=?", (digest,)
+            ).fetchone()[0]
+            if refs == 0:
+                total = self._total_bytes()
+                try:
+                    os.unlink(self._blob_path(digest))
+                except FileNotFoundError:
+                    pass
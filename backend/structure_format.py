@@ -0,0 +1,116 @@
+# Versioned binary structure files that workers memory-map instead of re-parsing PDB text
+import json
+import os
+import struct
+import tempfile
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import numpy as np  # type: ignore
+
+from backend.metrics import cache_lookup
+from backend.structure_cache import CACHE_DIR
+from backend.structures import ATOM_DTYPE, parse_pdb_atoms
+
+# File layout: MAGIC | u32 format version | u32 header length | JSON header | padding | atom records
+MAGIC = b"BCSTRUCT"
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+_PREAMBLE = struct.Struct("<8sII")
+
+STRUCTURE_DIR = os.path.join(CACHE_DIR, "structures")
+
+
+def write_structure(path: str, atoms: np.ndarray, meta: Optional[Dict[str, Any]] = None) -> None:
+    """Atomically writes an ATOM_DTYPE array with its metadata."""
+    header = json.dumps({
+        "n_atoms": len(atoms),
+        "dtype": np.lib.format.dtype_to_descr(ATOM_DTYPE),
+        "meta": meta or {},
+    }).encode()
+    offset = _PREAMBLE.size + len(header)
+    padding = b" " * (-offset % ALIGNMENT)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(_PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header) + len(padding)))
+            f.write(header + padding)
+            f.write(np.ascontiguousarray(atoms, dtype=ATOM_DTYPE).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def read_header(path: str) -> Tuple[Dict[str, Any], int]:
+    """Returns the JSON header and the byte offset of the atom records."""
+    with open(path, "rb") as f:
+        magic, version, header_len = _PREAMBLE.unpack(f.read(_PREAMBLE.size))
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a BIOCANVAS structure file")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"{path} has format version {version}, expected {FORMAT_VERSION}")
+        header = json.loads(f.read(header_len))
+    if np.dtype(np.lib.format.descr_to_dtype(header["dtype"])) != ATOM_DTYPE:
+        raise ValueError(f"{path} was written with a different atom layout")
+    return header, _PREAMBLE.size + header_len
+
+
+def load_structure(path: str) -> np.ndarray:
+    """Memory-maps the atom records read-only; pages are shared by every process."""
+    header, offset = read_header(path)
+    if header["n_atoms"] == 0:
+        return np.zeros(0, dtype=ATOM_DTYPE)
+    return np.memmap(path, dtype=ATOM_DTYPE, mode="r", offset=offset, shape=(header["n_atoms"],))
+
+
+_mapped: Dict[str, np.ndarray] = {}
+_mapped_lock = threading.Lock()
+
+
+def receptor_atoms(receptor_key: str, load_pdb: Callable[[], str]) -> np.ndarray:
+    """
+    Returns the memory-mapped atoms of a receptor, converting its PDB text
+    (obtained through load_pdb) into a structure file on first use.
+    """
+    with _mapped_lock:
+        atoms = _mapped.get(receptor_key)
+    if atoms is not None:
+        cache_lookup("structure_files", "hit")
+        return atoms
+
+    path = os.path.join(STRUCTURE_DIR, f"{receptor_key}.bcs")
+    try:
+        atoms = load_structure(path)
+        cache_lookup("structure_files", "disk")
+    except (FileNotFoundError, ValueError):
+        cache_lookup("structure_files", "miss")
+        write_structure(path, parse_pdb_atoms(load_pdb()), {"receptor_key": receptor_key})
+        atoms = load_structure(path)
+
+    with _mapped_lock:
+        _mapped[receptor_key] = atoms
+    return atoms
+
+
+def preload_structures() -> int:
+    """Maps every valid structure file already on disk; returns how many were mapped."""
+    try:
+        names = [n for n in os.listdir(STRUCTURE_DIR) if n.endswith(".bcs")]
+    except FileNotFoundError:
+        return 0
+    mapped = 0
+    for name in names:
+        try:
+            atoms = load_structure(os.path.join(STRUCTURE_DIR, name))
+        except (OSError, ValueError, struct.error):
+            continue
+        with _mapped_lock:
+            _mapped.setdefault(name[:-len(".bcs")], atoms)
+        mapped += 1
+    return mapped
@@ -0,0 +1,221 @@
+# Parsers turning PDB and SDF text into NumPy arrays
+from typing import NamedTuple
+
+import numpy as np  # type: ignore
+
+# Formal charges of ionisable side-chain atoms at physiological pH
+RESIDUE_CHARGES = {
+    ("LYS", "NZ"): 1.0,
+    ("ARG", "NH1"): 0.5,
+    ("ARG", "NH2"): 0.5,
+    ("ASP", "OD1"): -0.5,
+    ("ASP", "OD2"): -0.5,
+    ("GLU", "OE1"): -0.5,
+    ("GLU", "OE2"): -0.5,
+}
+
+# Carbons bonded to N or O, which do not count as hydrophobic
+POLAR_CARBONS = {
+    ("SER", "CB"), ("THR", "CB"), ("ASP", "CG"), ("ASN", "CG"), ("GLU", "CD"),
+    ("GLN", "CD"), ("ARG", "CD"), ("ARG", "CZ"), ("LYS", "CE"), ("TYR", "CZ"),
+    ("PRO", "CD"), ("HIS", "CG"), ("HIS", "CD2"), ("HIS", "CE1"), ("TRP", "CD1"),
+    ("TRP", "CE2"),
+}
+
+# Molfile atom-block charge codes
+SDF_CHARGE_CODES = {1: 3.0, 2: 2.0, 3: 1.0, 5: -1.0, 6: -2.0, 7: -3.0}
+
+
+class Receptor(NamedTuple):
+    coords: np.ndarray       # (N, 3) float32
+    elements: np.ndarray     # (N,) element symbols
+    charges: np.ndarray      # (N,) float32
+    hydrophobic: np.ndarray  # (N,) bool
+
+
+class Ligand(NamedTuple):
+    coords: np.ndarray    # (N, 3) float32
+    elements: np.ndarray  # (N,) element symbols
+    charges: np.ndarray   # (N,) float32
+    bonds: np.ndarray     # (M, 3) int32: atom i, atom j, bond order (0-based atoms)
+
+
+# Columnar per-atom record shared by scoring, pocket detection and the viewer
+ATOM_DTYPE = np.dtype([
+    ("xyz", "<f4", (3,)),
+    ("element", "S2"),
+    ("name", "S4"),
+    ("resname", "S3"),
+    ("res_index", "<i4"),  # 0-based running residue index
+    ("res_seq", "<i4"),    # residue number as written in the file
+    ("chain", "S1"),
+    ("plddt", "<f4"),      # B-factor column; per-residue confidence in AlphaFold models
+])
+
+
+def _column(rows: np.ndarray, start: int, end: int) -> np.ndarray:
+    """Fixed-width column of an (N, 80) byte matrix as an (N,) bytes array."""
+    return np.ascontiguousarray(rows[:, start:end]).view(f"S{end - start}").ravel()
+
+
+def parse_pdb_atoms(text: str) -> np.ndarray:
+    """
+    Parses ATOM/HETATM records of the first model into an ATOM_DTYPE array.
+    Columns are sliced from a fixed-width byte matrix rather than line by line.
+    """
+    data = text.encode() if isinstance(text, str) else text
+    end = data.find(b"\nENDMDL")
+    if end != -1:
+        data = data[:end]
+    lines = [
+        line.ljust(80)[:80] for line in data.split(b"\n")
+        if line.startswith(b"ATOM  ") or line.startswith(b"HETATM")
+    ]
+    atoms = np.zeros(len(lines), dtype=ATOM_DTYPE)
+    if not lines:
+        return atoms
+    rows = np.frombuffer(b"".join(lines), dtype=np.uint8).reshape(-1, 80)
+
+    atoms["xyz"][:, 0] = _column(rows, 30, 38).astype(np.float32)
+    atoms["xyz"][:, 1] = _column(rows, 38, 46).astype(np.float32)
+    atoms["xyz"][:, 2] = _column(rows, 46, 54).astype(np.float32)
+    names = np.char.strip(_column(rows, 12, 16))
+    elements = np.char.strip(_column(rows, 76, 78))
+    missing = elements == b""
+    if missing.any():
+        elements[missing] = np.char.lstrip(names[missing], b"0123456789").astype("S1")
+    atoms["element"] = np.char.capitalize(elements)
+    atoms["name"] = names
+    atoms["resname"] = np.char.strip(_column(rows, 17, 20))
+    atoms["chain"] = _column(rows, 21, 22)
+    atoms["res_seq"] = _column(rows, 22, 26).astype(np.int32)
+    plddt = _column(rows, 60, 66)
+    atoms["plddt"] = np.where(np.char.strip(plddt) == b"", b"0", plddt).astype(np.float32)
+
+    # A new residue starts wherever chain, number or insertion code changes
+    residue_ids = _column(rows, 21, 27)
+    starts = np.ones(len(lines), dtype=bool)
+    starts[1:] = residue_ids[1:] != residue_ids[:-1]
+    atoms["res_index"] = np.cumsum(starts) - 1
+    return atoms
+
+
+def receptor_from_atoms(atoms: np.ndarray) -> Receptor:
+    """Heavy-atom scoring view (types and charges) of an ATOM_DTYPE array."""
+    atoms = atoms[atoms["element"] != b"H"]
+    elements = atoms["element"].astype("U2")
+    names = atoms["name"].astype("U4")
+    resnames = atoms["resname"].astype("U3")
+    pairs = np.char.add(np.char.add(resnames, ":"), names)
+
+    charge_keys = np.array([f"{r}:{n}" for r, n in RESIDUE_CHARGES])
+    charge_values = np.array(list(RESIDUE_CHARGES.values()), dtype=np.float32)
+    order = np.argsort(charge_keys)
+    pos = np.clip(np.searchsorted(charge_keys[order], pairs), 0, len(order) - 1)
+    matched = charge_keys[order][pos] == pairs
+    charges = np.where(matched, charge_values[order][pos], 0.0).astype(np.float32)
+
+    polar = np.isin(pairs, [f"{r}:{n}" for r, n in POLAR_CARBONS])
+    hydrophobic = np.isin(elements, ("C", "S")) & ~np.isin(names, ("C", "CA")) & ~polar
+    return Receptor(
+        coords=np.ascontiguousarray(atoms["xyz"], dtype=np.float32),
+        elements=elements,
+        charges=charges,
+        hydrophobic=hydrophobic,
+    )
+
+
+def parse_pdb(text: str) -> Receptor:
+    """Reads heavy atoms from the first model of a PDB file."""
+    return receptor_from_atoms(parse_pdb_atoms(text))
+
+
+def parse_sdf(text: str) -> Ligand:
+    """Reads the first record of a V2000 SDF file, including hydrogens."""
+    lines = text.splitlines()
+    counts = lines[3]
+    n_atoms, n_bonds = int(counts[0:3]), int(counts[3:6])
+    atom_lines = lines[4:4 + n_atoms]
+    bond_lines = lines[4 + n_atoms:4 + n_atoms + n_bonds]
+
+    coords = np.array(
+        [(float(l[0:10]), float(l[10:20]), float(l[20:30])) for l in atom_lines],
+        dtype=np.float32,
+    ).reshape(-1, 3)
+    elements = np.array([l[31:34].strip().capitalize() for l in atom_lines], dtype="U2")
+    charges = np.array(
+        [SDF_CHARGE_CODES.get(int(l[36:39].strip() or 0), 0.0) for l in atom_lines],
+        dtype=np.float32,
+    )
+    bonds = np.array(
+        [(int(l[0:3]) - 1, int(l[3:6]) - 1, int(l[6:9])) for l in bond_lines],
+        dtype=np.int32,
+    ).reshape(-1, 3)
+
+    # "M  CHG" property lines supersede the atom-block charge codes
+    seen_chg = False
+    for line in lines[4 + n_atoms + n_bonds:]:
+        if line.startswith("M  END"):
+            break
+        if line.startswith("M  CHG"):
+            if not seen_chg:
+                charges[:] = 0.0
+                seen_chg = True
+            fields = line[9:].split()
+            for atom, charge in zip(fields[0::2], fields[1::2]):
+                charges[int(atom) - 1] = float(charge)
+    return Ligand(coords=coords, elements=elements, charges=charges, bonds=bonds)
+
+
+def heavy_atoms(ligand: Ligand) -> Ligand:
+    """Drops hydrogens, renumbering bonds onto the remaining atoms."""
+    keep = ligand.elements != "H"
+    index = np.full(len(keep), -1, dtype=np.int32)
+    index[keep] = np.arange(keep.sum(), dtype=np.int32)
+    bonds = ligand.bonds
+    bonds = bonds[keep[bonds[:, 0]] & keep[bonds[:, 1]]] if len(bonds) else bonds
+    if len(bonds):
+        bonds = np.column_stack([index[bonds[:, 0]], index[bonds[:, 1]], bonds[:, 2]]).astype(np.int32)
+    return Ligand(
+        coords=ligand.coords[keep],
+        elements=ligand.elements[keep],
+        charges=ligand.charges[keep],
+        bonds=bonds,
+    )
+
+
+# Reduced levels of detail served to the viewers
+BACKBONE_ATOMS = (b"N", b"CA", b"C", b"O")
+
+
+def select_detail(atoms: np.ndarray, detail: str, residues=None) -> np.ndarray:
+    """
+    Subset of an ATOM_DTYPE array: "ca" keeps the Cα trace, "backbone" the
+    N/CA/C/O atoms, "pocket" every atom of the (chain, res_seq) residues given.
+    """
+    if detail == "full":
+        return atoms
+    if detail == "ca":
+        return atoms[atoms["name"] == b"CA"]
+    if detail == "backbone":
+        return atoms[np.isin(atoms["name"], BACKBONE_ATOMS)]
+    if detail == "pocket":
+        keys = np.char.add(np.char.add(atoms["chain"], b":"), atoms["res_seq"].astype("S11"))
+        wanted = [f"{chain}:{res_seq}".encode() for chain, res_seq in residues or ()]
+        return atoms[np.isin(keys, wanted)]
+    raise ValueError(f"Unknown level of detail {detail!r}")
+
+
+def format_pdb_atoms(atoms: np.ndarray) -> bytes:
+    """Writes ATOM_DTYPE records as PDB ATOM lines, keeping pLDDT in the B-factor column."""
+    lines = []
+    for serial, atom in enumerate(atoms, start=1):
+        name = atom["name"].decode()
+        x, y, z = atom["xyz"]
+        lines.append(
+            f"ATOM  {serial:5d} {name if len(name) == 4 else ' ' + name:<4} {atom['resname'].decode():>3} "
+            f"{atom['chain'].decode() or 'A'}{atom['res_seq']:4d}    {x:8.3f}{y:8.3f}{z:8.3f}"
+            f"  1.00{atom['plddt']:6.2f}          {atom['element'].decode().upper():>2}"
+        )
+    lines.append("END")
+    return ("\n".join(lines) + "\n").encode()
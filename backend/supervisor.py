@@ -0,0 +1,461 @@
+# Multi-process launcher: N uvicorn workers sharing one listening socket
+import json
+import logging
+import os
+import select
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from typing import Any, Dict, List, Optional, Tuple
+
+from backend.catalog import DATA_DIR, TABLES
+from backend.metrics import METRICS_DIR_ENV
+from backend.startup import SPAWNED_AT_ENV, startup
+from backend.structure_cache import CACHE_DIR
+
+# Backend worker processes; each runs its own event loop and threadpool
+WORKERS = int(os.environ.get("BIOCANVAS_WORKERS", os.cpu_count() or 1))
+HOST = os.environ.get("BIOCANVAS_HOST", "127.0.0.1")
+PORT = int(os.environ.get("BIOCANVAS_PORT", 8000))
+
+# Seconds a worker may spend warming its caches before it counts as failed
+READY_TIMEOUT = float(os.environ.get("BIOCANVAS_READY_TIMEOUT", 120))
+
+# Seconds between checks for crashed workers and changed data files
+WATCH_INTERVAL = float(os.environ.get("BIOCANVAS_WATCH_INTERVAL", 2.0))
+
+STOP_TIMEOUT = 10.0      # grace period before a stopping worker is killed
+MAX_BACKOFF = 30.0       # longest delay between restarts of a crash-looping worker
+STABLE_AFTER = 60.0      # a worker that ran this long resets its slot's backoff
+READY_POLL = 0.25        # seconds between /health checks where there is no ready pipe
+
+# Inherited sockets and pipes (pass_fds, uvicorn --fd, select on pipes) are POSIX-only;
+# elsewhere launch() runs a single uvicorn process on the port instead of the supervisor
+SUPERVISED = os.name == "posix"
+
+# Inherited pipe on which workers (and the supervisor itself) write one line once they are warm
+READY_FD_ENV = "BIOCANVAS_READY_FD"
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+LOG_FILE = os.path.join(CACHE_DIR, "backend.log")
+
+logger = logging.getLogger("biocanvas.supervisor")
+
+
+def signal_ready(report: Optional[Dict[str, Any]] = None) -> None:
+    """
+    Tells whoever started this process that it is warm and serving, by
+    writing a JSON line (pid and startup report) to the inherited ready pipe.
+    """
+    fd = os.environ.pop(READY_FD_ENV, None)
+    if fd is None:
+        return
+    try:
+        os.write(int(fd), (json.dumps({"pid": os.getpid(), **(report or {})}) + "\n").encode())
+    except OSError:
+        pass   # the parent gave up waiting
+    finally:
+        os.close(int(fd))
+
+
+def ready_pipe() -> Tuple[int, int, Dict[str, str]]:
+    """(read end, write end, environment) for a child that will call signal_ready()."""
+    read_fd, write_fd = os.pipe()
+    return read_fd, write_fd, {READY_FD_ENV: str(write_fd), SPAWNED_AT_ENV: repr(time.time())}
+
+
+def read_ready(fd: int, timeout: float) -> Optional[Dict[str, Any]]:
+    """
+    Blocks until the child's ready line arrives on a pipe, then closes it.
+    Returns the child's report, or None if it exited first (end of file).
+    Raises TimeoutError after `timeout` seconds.
+    """
+    deadline = time.monotonic() + timeout
+    data = b""
+    try:
+        while not data.endswith(b"\n"):
+            if not select.select([fd], [], [], max(0.0, deadline - time.monotonic()))[0]:
+                raise TimeoutError(f"not ready after {timeout:.0f}s")
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                return None
+            data += chunk
+    finally:
+        os.close(fd)
+    return json.loads(data)
+
+
+class Worker:
+    """One uvicorn process accepting on the supervisor's inherited socket."""
+
+    def __init__(self, slot: int, sock: socket.socket, dock_workers: int, metrics_dir: str):
+        self.slot = slot
+        self.ready_fd, write_fd, ready_env = ready_pipe()
+        env = dict(os.environ, **ready_env)
+        # Split the cores between workers instead of giving each a full pose-search pool
+        env.setdefault("BIOCANVAS_DOCK_WORKERS", str(dock_workers))
+        env[METRICS_DIR_ENV] = metrics_dir
+        try:
+            self.process = subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "backend.main:app",
+                 "--fd", str(sock.fileno()), "--log-level", "warning"],
+                pass_fds=(sock.fileno(), write_fd),
+                cwd=ROOT_DIR,
+                env=env,
+            )
+        except BaseException:
+            os.close(self.ready_fd)
+            raise
+        finally:
+            os.close(write_fd)
+        self.started = time.monotonic()
+        # The worker's startup report, once it has signalled readiness
+        self.startup: Optional[Dict[str, Any]] = None
+        # When a retired worker gets killed if it has not exited
+        self.retire_by = 0.0
+
+    @property
+    def ready(self) -> bool:
+        return self.startup is not None
+
+    def read_ready(self, timeout: float) -> bool:
+        """Reads the worker's ready line; False if it exited before sending one."""
+        try:
+            self.startup = read_ready(self.ready_fd, timeout)
+        except TimeoutError:
+            return False
+        finally:
+            self.ready_fd = -1
+        if self.startup is None:
+            return False
+        logger.info("Worker %d ready in %.2fs (%s)", self.slot, self.startup.get("ready_s") or 0.0,
+                    ", ".join(f"{name} {seconds:.2f}s" for name, seconds in self.startup.get("stages", {}).items()))
+        return True
+
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+    def retire(self) -> None:
+        """Asks the worker to finish its requests and exit; stop() reaps it later."""
+        if self.alive():
+            self.process.terminate()
+        self.retire_by = time.monotonic() + STOP_TIMEOUT
+
+    def stop(self) -> None:
+        if self.alive():
+            self.process.terminate()
+            try:
+                self.process.wait(STOP_TIMEOUT)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        if self.ready_fd >= 0:
+            os.close(self.ready_fd)
+            self.ready_fd = -1
+
+
+class Supervisor:
+    """
+    Binds the listening socket once and runs `workers` uvicorn processes on it,
+    so the kernel spreads connections across them. Crashed workers are
+    restarted with exponential backoff; when a catalog file changes the
+    workers are replaced one at a time, each only after its successor is warm.
+    Neither waits inside check(), so crashes are handled during a restart.
+    """
+
+    def __init__(self, workers: int = WORKERS, host: str = HOST, port: int = PORT,
+                 data_dir: str = DATA_DIR):
+        self.n_workers = max(1, workers)
+        self.host = host
+        self.port = port
+        self.data_dir = data_dir
+        self.dock_workers = max(1, (os.cpu_count() or 1) // self.n_workers)
+        self.workers: Dict[int, Worker] = {}
+        self._backoff: Dict[int, float] = {}
+        self._restart_at: Dict[int, float] = {}
+        self._sock: Optional[socket.socket] = None
+        self._signature: Tuple = ()
+        # Rolling restart: slots still to replace, the replacement warming now and its deadline
+        self._roll: List[int] = []
+        self._successor: Optional[Worker] = None
+        self._successor_by = 0.0
+        # Replaced workers finishing their requests
+        self._retiring: List[Worker] = []
+        # Workers' metric snapshots; a fresh directory per supervisor unless one is configured
+        self._own_metrics_dir = not os.environ.get(METRICS_DIR_ENV)
+        self.metrics_dir = os.environ.get(METRICS_DIR_ENV) or ""
+
+    def _data_signature(self) -> Tuple:
+        signature = []
+        for filename, *_ in TABLES.values():
+            try:
+                st = os.stat(os.path.join(self.data_dir, filename))
+                signature.append((filename, st.st_mtime_ns, st.st_size))
+            except FileNotFoundError:
+                signature.append((filename, None, None))
+        return tuple(signature)
+
+    def _spawn(self, slot: int) -> Worker:
+        return Worker(slot, self._sock, self.dock_workers, self.metrics_dir)
+
+    def _wait_ready(self, workers: List[Worker], timeout: float = READY_TIMEOUT) -> bool:
+        """Blocks on the workers' ready pipes; False as soon as one exits or the timeout passes."""
+        deadline = time.monotonic() + timeout
+        pending = {w.ready_fd: w for w in workers if not w.ready}
+        if -1 in pending:
+            return False
+        while pending:
+            remaining = deadline - time.monotonic()
+            readable = select.select(list(pending), [], [], max(0.0, remaining))[0]
+            if not readable:
+                return False
+            for fd in readable:
+                if not pending.pop(fd).read_ready(max(0.0, deadline - time.monotonic())):
+                    return False
+        return True
+
+    def start(self) -> None:
+        """Binds the port and returns once every worker is warm."""
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind((self.host, self.port))
+        self._sock.listen(2048)
+        self._sock.set_inheritable(True)
+        self._signature = self._data_signature()
+        if self._own_metrics_dir:
+            self.metrics_dir = tempfile.mkdtemp(prefix="biocanvas-metrics-")
+        else:
+            os.makedirs(self.metrics_dir, exist_ok=True)
+
+        self.workers = {slot: self._spawn(slot) for slot in range(self.n_workers)}
+        if not self._wait_ready(list(self.workers.values())):
+            self.stop()
+            raise RuntimeError("Backend workers failed to start")
+        logger.info("%d workers ready on %s:%d", self.n_workers, self.host, self.port)
+
+    def check(self) -> None:
+        """Restarts crashed workers and rolls the pool when the data changed."""
+        now = time.monotonic()
+        # Restarted workers are not waited for; pick up their ready lines as they arrive
+        restarted = [w for w in self.workers.values() if w.ready_fd >= 0]
+        if restarted:
+            for fd in select.select([w.ready_fd for w in restarted], [], [], 0)[0]:
+                next(w for w in restarted if w.ready_fd == fd).read_ready(0)
+        for slot, worker in list(self.workers.items()):
+            if worker.alive():
+                continue
+            if slot not in self._restart_at:
+                if now - worker.started >= STABLE_AFTER:
+                    self._backoff[slot] = 0.0
+                delay = self._backoff.get(slot, 0.0)
+                self._backoff[slot] = min(MAX_BACKOFF, max(1.0, delay * 2))
+                self._restart_at[slot] = now + delay
+                logger.warning("Worker %d exited with code %s; restarting in %.0fs",
+                               slot, worker.process.returncode, delay)
+            if now >= self._restart_at[slot]:
+                del self._restart_at[slot]
+                worker.stop()
+                self.workers[slot] = self._spawn(slot)
+
+        signature = self._data_signature()
+        if signature != self._signature:
+            self._signature = signature
+            self.rolling_restart()
+        self._advance_roll(now)
+        self._reap(now)
+
+    def rolling_restart(self) -> None:
+        """
+        Starts replacing the workers one by one; check() swaps each in once it
+        is warm, and the old one serves until then. A restart already under
+        way starts over, since its replacement may have loaded the old data.
+        """
+        logger.info("Data changed; rolling restart of %d workers", len(self.workers))
+        if self._successor is not None:
+            self._successor.stop()
+            self._successor = None
+        self._roll = sorted(self.workers)
+
+    def _advance_roll(self, now: float) -> None:
+        successor = self._successor
+        if successor is not None:
+            if successor.ready_fd >= 0 and select.select([successor.ready_fd], [], [], 0)[0]:
+                if successor.read_ready(0):
+                    old = self.workers[successor.slot]
+                    self.workers[successor.slot] = successor
+                    # A crash of the old worker no longer needs its pending restart
+                    self._restart_at.pop(successor.slot, None)
+                    old.retire()
+                    self._retiring.append(old)
+                else:
+                    logger.error("Replacement for worker %d exited before it was ready; keeping the old one",
+                                 successor.slot)
+                    successor.stop()
+                self._successor = None
+            elif now >= self._successor_by:
+                logger.error("Replacement for worker %d not ready after %.0fs; keeping the old one",
+                             successor.slot, READY_TIMEOUT)
+                successor.stop()
+                self._successor = None
+            else:
+                return
+        if self._roll:
+            slot = self._roll.pop(0)
+            self._successor = self._spawn(slot)
+            self._successor_by = now + READY_TIMEOUT
+
+    def _reap(self, now: float) -> None:
+        """Stops retired workers that have exited, killing any past their grace period."""
+        for worker in list(self._retiring):
+            if worker.alive() and now < worker.retire_by:
+                continue
+            worker.stop()
+            self._retiring.remove(worker)
+
+    def run_forever(self) -> None:
+        while True:
+            time.sleep(WATCH_INTERVAL)
+            self.check()
+
+    def stop(self) -> None:
+        others = self._retiring + ([self._successor] if self._successor is not None else [])
+        everyone = list(self.workers.values()) + others
+        for worker in everyone:
+            if worker.alive():
+                worker.process.terminate()
+        for worker in everyone:
+            worker.stop()
+        self.workers = {}
+        self._retiring, self._successor, self._roll = [], None, []
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+        if self._own_metrics_dir and self.metrics_dir:
+            shutil.rmtree(self.metrics_dir, ignore_errors=True)
+            self.metrics_dir = ""
+
+
+def _wait_or_kill(process: subprocess.Popen) -> None:
+    """Waits for a terminated child, killing it after the grace period."""
+    try:
+        process.wait(STOP_TIMEOUT)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def _poll_ready(process: subprocess.Popen, timeout: float) -> Optional[Dict[str, Any]]:
+    """
+    Polls /health of a single unsupervised backend until its startup report
+    says it is ready. Returns None if it exited first; raises TimeoutError.
+    """
+    deadline = time.monotonic() + timeout
+    url = f"http://{'127.0.0.1' if HOST in ('', '0.0.0.0') else HOST}:{PORT}/health"
+    while process.poll() is None:
+        try:
+            with urllib.request.urlopen(url, timeout=READY_POLL * 4) as response:
+                report = json.loads(response.read())["startup"]
+            if report.get("ready_s") is not None:
+                return report
+        except (OSError, ValueError, KeyError):
+            pass   # not listening yet
+        if time.monotonic() >= deadline:
+            raise TimeoutError(f"not ready after {timeout:.0f}s")
+        time.sleep(READY_POLL)
+    return None
+
+
+def launch(timeout: float = READY_TIMEOUT, log_path: str = LOG_FILE) -> subprocess.Popen:
+    """
+    Starts the supervisor in a child process and waits until all of its
+    workers are warm (a single uvicorn process where SUPERVISED is off).
+    Output goes to log_path. Raises RuntimeError on failure.
+    """
+    if not SUPERVISED:
+        return _launch_single(timeout, log_path)
+    read_fd, write_fd, ready_env = ready_pipe()
+    os.makedirs(os.path.dirname(log_path), exist_ok=True)
+    try:
+        with open(log_path, "ab") as log:
+            process = subprocess.Popen(
+                [sys.executable, "-m", "backend.supervisor"],
+                cwd=ROOT_DIR,
+                env=dict(os.environ, **ready_env),
+                pass_fds=(write_fd,),
+                stdout=log,
+                stderr=subprocess.STDOUT,
+            )
+    except BaseException:
+        os.close(read_fd)
+        raise
+    finally:
+        os.close(write_fd)
+
+    try:
+        report = read_ready(read_fd, timeout)
+    except TimeoutError:
+        process.terminate()
+        _wait_or_kill(process)
+        raise RuntimeError(f"Backend not ready after {timeout:.0f}s; see {log_path}") from None
+    if report is None:
+        _wait_or_kill(process)
+        raise RuntimeError(f"Backend exited with code {process.returncode}; see {log_path}")
+    logger.info("Backend ready in %.2fs (slowest worker %.2fs)", report.get("ready_s") or 0.0,
+                max((w.get("ready_s") or 0.0 for w in report.get("workers", [])), default=0.0))
+    return process
+
+
+def _launch_single(timeout: float, log_path: str) -> subprocess.Popen:
+    os.makedirs(os.path.dirname(log_path), exist_ok=True)
+    with open(log_path, "ab") as log:
+        process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "backend.main:app",
+             "--host", HOST, "--port", str(PORT), "--log-level", "warning"],
+            cwd=ROOT_DIR,
+            env=dict(os.environ, **{SPAWNED_AT_ENV: repr(time.time())}),
+            stdout=log,
+            stderr=subprocess.STDOUT,
+        )
+    try:
+        report = _poll_ready(process, timeout)
+    except TimeoutError:
+        process.terminate()
+        _wait_or_kill(process)
+        raise RuntimeError(f"Backend not ready after {timeout:.0f}s; see {log_path}") from None
+    if report is None:
+        raise RuntimeError(f"Backend exited with code {process.returncode}; see {log_path}")
+    logger.info("Backend ready in %.2fs (single process)", report["ready_s"])
+    return process
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    if not SUPERVISED:
+        import uvicorn  # type: ignore
+        uvicorn.run("backend.main:app", host=HOST, port=PORT)
+        return
+    supervisor = Supervisor()
+
+    def terminate(signum, frame):
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, terminate)
+    try:
+        with startup.stage("workers"):
+            supervisor.start()
+        report = startup.ready()
+        signal_ready(dict(report, workers=[w.startup for w in supervisor.workers.values()]))
+        supervisor.run_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        supervisor.stop()
+
+
+if __name__ == "__main__":
+    main()
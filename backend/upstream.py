@@ -0,0 +1,138 @@
+# Shared async HTTP client for AlphaFold and PubChem
+import asyncio
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+from urllib.parse import urlsplit
+
+from backend.metrics import UPSTREAM_LATENCY, UPSTREAM_REQUESTS, stage
+from backend.startup import lazy_module
+
+# Imported on the first upstream request, off the cold-start path
+httpx = lazy_module("httpx")
+
+# Upstream base URLs (overridable for local stand-ins)
+ALPHAFOLD_URL = os.environ.get("BIOCANVAS_ALPHAFOLD_URL", "https://alphafold.ebi.ac.uk").rstrip("/")
+PUBCHEM_URL = os.environ.get("BIOCANVAS_PUBCHEM_URL", "https://pubchem.ncbi.nlm.nih.gov").rstrip("/")
+
+# Connection pool and protection limits
+MAX_CONNECTIONS = int(os.environ.get("BIOCANVAS_UPSTREAM_MAX_CONNECTIONS", 50))
+PER_HOST_LIMIT = int(os.environ.get("BIOCANVAS_UPSTREAM_PER_HOST", 8))
+BREAKER_THRESHOLD = int(os.environ.get("BIOCANVAS_BREAKER_THRESHOLD", 5))
+BREAKER_RESET = float(os.environ.get("BIOCANVAS_BREAKER_RESET", 30))
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of contacting an upstream that is known to be down."""
+
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive failures and fails fast until
+    `reset_timeout` has passed; then lets a single trial request through.
+    """
+
+    def __init__(self, threshold: int = BREAKER_THRESHOLD, reset_timeout: float = BREAKER_RESET):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def before_call(self, host: str) -> None:
+        state = self.state
+        if state == "open" or (state == "half-open" and self._trial_in_flight):
+            raise CircuitOpenError(f"{host} is unavailable (circuit open)")
+        if state == "half-open":
+            self._trial_in_flight = True
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    def release_trial(self) -> None:
+        self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._trial_in_flight = False
+        if self.opened_at is not None or self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+
+
+class SingleFlight:
+    """Collapses concurrent calls for the same key into one in-flight coroutine."""
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, "asyncio.Future[Any]"] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(fn())
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # Shield so one cancelled waiter does not cancel the shared fetch
+        return await asyncio.shield(future)
+
+
+class UpstreamClient:
+    """Keep-alive connection pool with per-host concurrency limits and circuit breakers."""
+
+    def __init__(self, max_connections: int = MAX_CONNECTIONS, per_host_limit: int = PER_HOST_LIMIT):
+        self.per_host_limit = per_host_limit
+        self.max_connections = max_connections
+        self._client: Optional["httpx.AsyncClient"] = None
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self.breakers: Dict[str, CircuitBreaker] = {}
+
+    @property
+    def client(self) -> "httpx.AsyncClient":
+        if self._client is None:
+            limits = httpx.Limits(max_connections=self.max_connections,
+                                  max_keepalive_connections=self.max_connections)
+            self._client = httpx.AsyncClient(limits=limits, follow_redirects=True)
+        return self._client
+
+    async def get(self, url: str, timeout: float = 10) -> "httpx.Response":
+        host = urlsplit(url).netloc
+        breaker = self.breakers.setdefault(host, CircuitBreaker())
+        semaphore = self._semaphores.setdefault(host, asyncio.Semaphore(self.per_host_limit))
+        try:
+            breaker.before_call(host)
+        except CircuitOpenError:
+            UPSTREAM_REQUESTS.labels(host, "circuit_open").inc()
+            raise
+        start = time.perf_counter()
+        try:
+            async with semaphore:
+                with stage("upstream"):
+                    response = await self.client.get(url, timeout=timeout)
+        except httpx.HTTPError as e:
+            breaker.record_failure()
+            UPSTREAM_REQUESTS.labels(host, type(e).__name__).inc()
+            raise
+        except BaseException:
+            breaker.release_trial()
+            raise
+        UPSTREAM_LATENCY.labels(host).observe(time.perf_counter() - start)
+        UPSTREAM_REQUESTS.labels(host, f"{response.status_code // 100}xx").inc()
+        if response.status_code >= 500:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        return response
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
@@ -0,0 +1,102 @@
+# Startup prefetch of every catalog structure and the per-protein data scoring needs
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from backend.structure_cache import CACHE_DIR
+
+# Prefetch the whole catalog after startup
+WARMUP = os.environ.get("BIOCANVAS_WARMUP", "").lower() in ("1", "true", "yes", "on")
+
+# Catalog entries warmed at once; bounds the upstream connections used
+WARMUP_CONCURRENCY = int(os.environ.get("BIOCANVAS_WARMUP_CONCURRENCY", 4))
+
+# Held by the worker process currently warming, so the others find the disk caches filled
+LOCK_FILE = os.path.join(CACHE_DIR, "warmup.lock")
+
+PENDING, WAITING, RUNNING, DONE, DISABLED = "pending", "waiting", "running", "done", "disabled"
+
+# (kind, identifier, coroutine factory) of one catalog entry to warm
+Task = Tuple[str, str, Callable[[], Awaitable[Any]]]
+
+logger = logging.getLogger("biocanvas.warmup")
+
+
+class Warmup:
+    """
+    Warms catalog entries with at most `concurrency` in flight and tracks
+    progress for /health. Failures are counted and logged, never raised:
+    an entry that could not be warmed is simply fetched on first use.
+    """
+
+    def __init__(self, enabled: bool = WARMUP, concurrency: int = WARMUP_CONCURRENCY,
+                 lock_path: str = LOCK_FILE):
+        self.concurrency = max(1, concurrency)
+        self.lock_path = lock_path
+        self.state = PENDING if enabled else DISABLED
+        self.total = 0
+        self.completed = 0
+        self.failed: Dict[str, str] = {}
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+
+    @property
+    def warm(self) -> bool:
+        return self.state in (DONE, DISABLED)
+
+    def status(self) -> Dict[str, Any]:
+        status: Dict[str, Any] = {"state": self.state}
+        if self.state == DISABLED:
+            return status
+        status.update(total=self.total, completed=self.completed, failed=len(self.failed))
+        if self.total:
+            status["progress"] = round(self.completed / self.total, 3)
+        if self.started is not None:
+            status["elapsed"] = round((self.finished or time.time()) - self.started, 1)
+        return status
+
+    def _lock(self) -> Optional[int]:
+        """
+        Waits for the other worker processes' warm-ups. Without flock (Windows)
+        each process warms on its own.
+        """
+        try:
+            import fcntl
+        except ImportError:
+            return None
+        os.makedirs(os.path.dirname(self.lock_path), exist_ok=True)
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        return fd
+
+    async def run(self, tasks: List[Task]) -> None:
+        """Runs every task; worker processes take turns so only the first one downloads."""
+        if self.state == DISABLED:
+            return
+        self.total = len(tasks)
+        self.state = WAITING
+        fd = await asyncio.to_thread(self._lock)
+        try:
+            self.state = RUNNING
+            self.started = time.time()
+            semaphore = asyncio.Semaphore(self.concurrency)
+
+            async def warm(kind: str, ident: str, make: Callable[[], Awaitable[Any]]) -> None:
+                async with semaphore:
+                    try:
+                        await make()
+                    except Exception as e:
+                        self.failed[f"{kind}:{ident}"] = getattr(e, "detail", None) or repr(e)
+                        logger.warning("Warm-up skipped %s %s: %s", kind, ident, self.failed[f"{kind}:{ident}"])
+                    self.completed += 1
+
+            await asyncio.gather(*(warm(*task) for task in tasks))
+            self.finished = time.time()
+            self.state = DONE
+            logger.info("Warmed %d catalog entries in %.1fs (%d failed)",
+                        self.total, self.finished - self.started, len(self.failed))
+        finally:
+            if fd is not None:
+                os.close(fd)
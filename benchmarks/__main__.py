@@ -0,0 +1,102 @@
+# Runs the microbenchmarks and the load test against local upstream stubs; writes JSON results
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def git_revision() -> Dict[str, Any]:
+    def git(*args: str) -> str:
+        return subprocess.run(["git", *args], cwd=ROOT_DIR, capture_output=True, text=True).stdout.strip()
+    return {"commit": git("rev-parse", "HEAD") or "unknown", "dirty": bool(git("status", "--porcelain"))}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks",
+                                     description="Reproducible BIOCANVAS benchmarks.")
+    parser.add_argument("--skip-micro", action="store_true", help="skip the microbenchmarks")
+    parser.add_argument("--skip-load", action="store_true", help="skip the HTTP load test")
+    parser.add_argument("--heavy", action="store_true", help="also time grid building and pocket detection")
+    parser.add_argument("--repeat", type=int, default=5, help="timed batches per microbenchmark")
+    parser.add_argument("--url", help="load-test this running backend instead of starting one")
+    parser.add_argument("--workers", type=int, default=1, help="backend worker processes to start")
+    parser.add_argument("--concurrency", type=int, default=16, help="requests kept in flight")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per endpoint")
+    parser.add_argument("--endpoints", nargs="*", help="only these endpoints, e.g. /dock /proteins")
+    parser.add_argument("--upstream-latency", type=float, default=0.05, help="stub latency in seconds")
+    parser.add_argument("--upstream-jitter", type=float, default=0.0, help="extra random stub latency")
+    parser.add_argument("--upstream-failure-rate", type=float, default=0.0, help="fraction of stub 503s")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="result file (default benchmarks/results/<commit>.json)")
+    args = parser.parse_args()
+
+    # Everything the backend writes goes to a scratch directory, never the real cache
+    scratch = tempfile.mkdtemp(prefix="biocanvas-bench-")
+    os.environ["BIOCANVAS_CACHE_DIR"] = scratch
+    sys.path.insert(0, ROOT_DIR)
+    from benchmarks import load, micro
+    from benchmarks.stubs import StubUpstream
+
+    report: Dict[str, Any] = {
+        **git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": {k: v for k, v in vars(args).items() if k != "output"},
+    }
+
+    if not args.skip_micro:
+        print("Microbenchmarks")
+        report["micro"] = micro.run(heavy=args.heavy, repeat=args.repeat)
+
+    if not args.skip_load:
+        print("Load test")
+        if args.url:
+            report["load"] = asyncio.run(load.run_all(args.url, args.concurrency, args.duration,
+                                                      args.endpoints, args.seed))
+        else:
+            with StubUpstream(latency=args.upstream_latency, jitter=args.upstream_jitter,
+                              failure_rate=args.upstream_failure_rate, seed=args.seed) as stub:
+                port = free_port()
+                os.environ.update({
+                    "BIOCANVAS_ALPHAFOLD_URL": stub.url,
+                    "BIOCANVAS_PUBCHEM_URL": stub.url,
+                    "BIOCANVAS_PORT": str(port),
+                    "BIOCANVAS_WORKERS": str(args.workers),
+                })
+                from backend.supervisor import launch
+                backend = launch(log_path=os.path.join(scratch, "backend.log"))
+                try:
+                    report["load"] = asyncio.run(load.run_all(f"http://127.0.0.1:{port}", args.concurrency,
+                                                              args.duration, args.endpoints, args.seed))
+                finally:
+                    backend.terminate()
+                    backend.wait()
+                report["upstream_requests"] = dict(stub.requests)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{report['commit'][:12]}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
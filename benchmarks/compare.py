@@ -0,0 +1,51 @@
+# Compares two benchmark result files and flags regressions
+import argparse
+import json
+import sys
+from typing import Any, Dict, Iterator, Tuple
+
+# (section, metric, True if higher is better)
+METRICS = (
+    ("micro", "median_us", False),
+    ("load", "p50_ms", False),
+    ("load", "p95_ms", False),
+    ("load", "p99_ms", False),
+    ("load", "throughput_rps", True),
+)
+
+
+def changes(base: Dict[str, Any], head: Dict[str, Any]) -> Iterator[Tuple[str, str, float, float, float, bool]]:
+    """Yields (case, metric, base, head, relative change, higher is better) for shared cases."""
+    for section, metric, higher_is_better in METRICS:
+        for case, before in base.get(section, {}).items():
+            after = head.get(section, {}).get(case)
+            if after is None or not before.get(metric) or after.get(metric) is None:
+                continue
+            old, new = before[metric], after[metric]
+            yield f"{section}:{case}", metric, old, new, (new - old) / old, higher_is_better
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare two `python -m benchmarks` result files.")
+    parser.add_argument("base")
+    parser.add_argument("head")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="relative slowdown reported as a regression (default 10%%)")
+    args = parser.parse_args()
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.head) as f:
+        head = json.load(f)
+
+    print(f"base {base.get('commit', '?')[:12]}  head {head.get('commit', '?')[:12]}")
+    regressions = 0
+    for case, metric, old, new, change, higher_is_better in changes(base, head):
+        worse = -change if higher_is_better else change
+        flag = "REGRESSION" if worse > args.threshold else ("improved" if worse < -args.threshold else "")
+        regressions += flag == "REGRESSION"
+        print(f"  {case:<44} {metric:<15} {old:>12.3f} -> {new:>12.3f}  {change:+7.1%}  {flag}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
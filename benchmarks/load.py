@@ -0,0 +1,97 @@
+# Closed-loop HTTP load generator reporting latency percentiles and throughput per endpoint
+import asyncio
+import random
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx  # type: ignore
+
+# (method, path, JSON body) for the i-th request of a scenario
+RequestFactory = Callable[[random.Random], Tuple[str, str, Optional[Dict[str, Any]]]]
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return float("nan")
+    rank = max(1, -(-len(sorted_values) * p // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> Dict[str, Any]:
+    latencies = sorted(latencies)
+    ms = lambda seconds: round(seconds * 1000, 3)  # noqa: E731
+    return {
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": ms(percentile(latencies, 50)),
+        "p95_ms": ms(percentile(latencies, 95)),
+        "p99_ms": ms(percentile(latencies, 99)),
+        "max_ms": ms(latencies[-1]) if latencies else float("nan"),
+    }
+
+
+async def run_scenario(client: httpx.AsyncClient, make_request: RequestFactory,
+                       concurrency: int, duration: float, seed: int = 0) -> Dict[str, Any]:
+    """
+    Keeps `concurrency` requests outstanding for `duration` seconds. Latency
+    is measured per successful (status < 400) request; the rest count as errors.
+    """
+    latencies: List[float] = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def user(index: int) -> None:
+        nonlocal errors
+        rng = random.Random(seed * 1000 + index)
+        while time.perf_counter() < deadline:
+            method, path, body = make_request(rng)
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, path, json=body)
+                await response.aread()
+                ok = response.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(user(i) for i in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - start)
+
+
+def scenarios(proteins: List[Dict[str, Any]], ligands: List[Dict[str, Any]]) -> Dict[str, RequestFactory]:
+    """The endpoints under test, each drawing entries at random from the catalog."""
+    return {
+        "/proteins": lambda rng: ("GET", "/proteins?limit=50", None),
+        "/ligands": lambda rng: ("GET", "/ligands?limit=50", None),
+        "/dock": lambda rng: ("POST", "/dock", {
+            "protein_id": rng.choice(proteins)["id"], "ligand_id": rng.choice(ligands)["id"],
+        }),
+        "/structure": lambda rng: ("GET", f"/structure/{rng.choice(proteins)['uniprot_id']}", None),
+        "/structure/pdb": lambda rng: ("GET", f"/structure/{rng.choice(proteins)['uniprot_id']}/pdb", None),
+        "/structure/pdb?detail=ca": lambda rng: (
+            "GET", f"/structure/{rng.choice(proteins)['uniprot_id']}/pdb?detail=ca", None),
+        "/ligand-structure": lambda rng: ("GET", f"/ligand-structure/{rng.choice(ligands)['pubchem_cid']}", None),
+    }
+
+
+async def run_all(base_url: str, concurrency: int, duration: float,
+                  only: Optional[List[str]] = None, seed: int = 0) -> Dict[str, Dict[str, Any]]:
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        proteins = (await client.get("/proteins")).json()
+        ligands = (await client.get("/ligands")).json()
+        results = {}
+        for name, make_request in scenarios(proteins, ligands).items():
+            if only and name not in only:
+                continue
+            results[name] = await run_scenario(client, make_request, concurrency, duration, seed)
+            r = results[name]
+            print(f"  {name:<26} {r['throughput_rps']:>8.1f} req/s  p50 {r['p50_ms']:>8.2f} ms  "
+                  f"p95 {r['p95_ms']:>8.2f} ms  p99 {r['p99_ms']:>8.2f} ms  errors {r['errors']}")
+        return results
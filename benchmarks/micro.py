@@ -0,0 +1,86 @@
+# Microbenchmarks of the backend's hot functions
+import statistics
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+from benchmarks.stubs import ASPIRIN_SDF, synthetic_pdb
+
+
+def measure(fn: Callable[[], Any], repeat: int = 5, min_batch_time: float = 0.05) -> Dict[str, Any]:
+    """
+    Times fn like timeit: the call count per batch doubles until a batch takes
+    min_batch_time, then `repeat` batches are timed. Reports per-call times.
+    """
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        if time.perf_counter() - start >= min_batch_time:
+            break
+        number *= 2
+
+    per_call: List[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        per_call.append((time.perf_counter() - start) / number)
+    return {
+        "number": number,
+        "repeat": repeat,
+        "min_us": round(min(per_call) * 1e6, 3),
+        "median_us": round(statistics.median(per_call) * 1e6, 3),
+        "mean_us": round(statistics.fmean(per_call) * 1e6, 3),
+    }
+
+
+def cases(heavy: bool = False) -> List[Tuple[str, Callable[[], Any]]]:
+    """
+    The benchmarked calls. Imports happen here so the caller can point
+    BIOCANVAS_CACHE_DIR at a scratch directory first.
+    """
+    import os
+    from backend.docking_engine import calculate_docking
+    from backend.encoded import encode_json
+    from backend.main import catalog, load_data
+    from backend.structure_format import load_structure, write_structure
+    from backend.structures import parse_pdb, parse_pdb_atoms, parse_sdf
+    from backend.structure_cache import CACHE_DIR
+
+    pdb = synthetic_pdb("P00000", 300)
+    atoms = parse_pdb_atoms(pdb)
+    structure_path = os.path.join(CACHE_DIR, "bench", "P00000.bcs")
+    write_structure(structure_path, atoms)
+    page, _ = catalog.list("proteins", limit=50)
+
+    selected = [
+        ("load_data[proteins]", lambda: load_data("proteins.json")),
+        ("load_data[ligands]", lambda: load_data("ligands.json")),
+        ("catalog.get[protein]", lambda: catalog.get("proteins", "id", 3)),
+        ("encode_json[protein page]", lambda: encode_json(page)),
+        ("calculate_docking[table pair]", lambda: calculate_docking(1, 1)),
+        ("calculate_docking[default pair]", lambda: calculate_docking(3, 5)),
+        ("parse_pdb_atoms[300 residues]", lambda: parse_pdb_atoms(pdb)),
+        ("parse_pdb[300 residues]", lambda: parse_pdb(pdb)),
+        ("load_structure[300 residues]", lambda: load_structure(structure_path)),
+        ("parse_sdf[aspirin]", lambda: parse_sdf(ASPIRIN_SDF)),
+    ]
+    if heavy:
+        from backend.pockets import find_pockets
+        from backend.scoring import build_grids
+        from backend.structures import receptor_from_atoms
+        receptor = receptor_from_atoms(atoms)
+        selected += [
+            ("build_grids[300 residues]", lambda: build_grids(receptor)),
+            ("find_pockets[300 residues]", lambda: find_pockets(atoms)),
+        ]
+    return selected
+
+
+def run(heavy: bool = False, repeat: int = 5) -> Dict[str, Dict[str, Any]]:
+    results = {}
+    for name, fn in cases(heavy):
+        results[name] = measure(fn, repeat=repeat)
+        print(f"  {name:<34} median {results[name]['median_us']:>12.3f} us")
+    return results
@@ -0,0 +1,218 @@
+# Local stand-ins for the AlphaFold and PubChem services with configurable latency and failures
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Set
+
+# Residue templates: side-chain atoms (name, element) after N, CA, C, O
+SIDE_CHAINS = {
+    "ALA": [("CB", "C")],
+    "GLY": [],
+    "SER": [("CB", "C"), ("OG", "O")],
+    "VAL": [("CB", "C"), ("CG1", "C"), ("CG2", "C")],
+    "LEU": [("CB", "C"), ("CG", "C"), ("CD1", "C"), ("CD2", "C")],
+    "PHE": [("CB", "C"), ("CG", "C"), ("CD1", "C"), ("CD2", "C"), ("CE1", "C"), ("CE2", "C"), ("CZ", "C")],
+    "LYS": [("CB", "C"), ("CG", "C"), ("CD", "C"), ("CE", "C"), ("NZ", "N")],
+    "ASP": [("CB", "C"), ("CG", "C"), ("OD1", "O"), ("OD2", "O")],
+    "GLU": [("CB", "C"), ("CG", "C"), ("CD", "C"), ("OE1", "O"), ("OE2", "O")],
+    "THR": [("CB", "C"), ("OG1", "O"), ("CG2", "C")],
+    "ASN": [("CB", "C"), ("CG", "C"), ("OD1", "O"), ("ND2", "N")],
+    "ARG": [("CB", "C"), ("CG", "C"), ("CD", "C"), ("NE", "N"), ("CZ", "C"), ("NH1", "N"), ("NH2", "N")],
+}
+
+# Aspirin (PubChem CID 2244) heavy atoms; served for every CID
+ASPIRIN_SDF = """{cid}
+  -OEChem-
+
+ 13 13  0     0  0  0  0  0  0999 V2000
+    1.2333    0.5540    0.7792 O   0  0  0  0  0  0  0  0  0  0  0  0
+   -0.6952   -2.7148   -0.7502 O   0  0  0  0  0  0  0  0  0  0  0  0
+    0.7958   -2.1843    0.8685 O   0  0  0  0  0  0  0  0  0  0  0  0
+    1.7813    0.8105   -1.4821 O   0  0  0  0  0  0  0  0  0  0  0  0
+   -0.0857    0.6088    0.4403 C   0  0  0  0  0  0  0  0  0  0  0  0
+   -0.7927   -0.5515    0.1244 C   0  0  0  0  0  0  0  0  0  0  0  0
+   -0.7288    1.8464    0.4133 C   0  0  0  0  0  0  0  0  0  0  0  0
+   -2.1426   -0.4741   -0.2184 C   0  0  0  0  0  0  0  0  0  0  0  0
+   -2.0787    1.9238    0.0706 C   0  0  0  0  0  0  0  0  0  0  0  0
+   -2.7855    0.7636   -0.2453 C   0  0  0  0  0  0  0  0  0  0  0  0
+   -0.1409   -1.8536    0.1477 C   0  0  0  0  0  0  0  0  0  0  0  0
+    2.1094    0.6715   -0.3113 C   0  0  0  0  0  0  0  0  0  0  0  0
+    3.5305    0.5996    0.1635 C   0  0  0  0  0  0  0  0  0  0  0  0
+  1  5  1  0  0  0  0
+  1 12  1  0  0  0  0
+  2 11  1  0  0  0  0
+  3 11  2  0  0  0  0
+  4 12  2  0  0  0  0
+  5  6  1  0  0  0  0
+  5  7  2  0  0  0  0
+  6  8  2  0  0  0  0
+  6 11  1  0  0  0  0
+  7  9  1  0  0  0  0
+  8 10  1  0  0  0  0
+  9 10  2  0  0  0  0
+ 12 13  1  0  0  0  0
+M  END
+$$$$
+"""
+
+
+def synthetic_pdb(seed: str, n_residues: int = 300) -> str:
+    """
+    A deterministic compact random-walk protein in AlphaFold PDB layout, with
+    per-residue pLDDT in the B-factor column. Same seed, same structure.
+    """
+    rng = random.Random(seed)
+    names = sorted(SIDE_CHAINS)
+    radius = 3.2 * n_residues ** (1 / 3)
+    trace = [(0.0, 0.0, 0.0)]
+    while len(trace) < n_residues:
+        theta, phi = rng.uniform(0, math.pi), rng.uniform(0, 2 * math.pi)
+        x, y, z = trace[-1]
+        p = (x + 3.8 * math.sin(theta) * math.cos(phi),
+             y + 3.8 * math.sin(theta) * math.sin(phi),
+             z + 3.8 * math.cos(theta))
+        if math.dist(p, (0, 0, 0)) < radius and all(math.dist(p, q) > 4.2 for q in trace[-30:-1]):
+            trace.append(p)
+
+    lines, serial = [], 1
+    for i, ca in enumerate(trace):
+        resname = names[rng.randrange(len(names))]
+        plddt = rng.uniform(40, 98)
+        for name, element in [("N", "N"), ("CA", "C"), ("C", "C"), ("O", "O")] + SIDE_CHAINS[resname]:
+            xyz = ca if name == "CA" else tuple(c + rng.gauss(0, 1.2) for c in ca)
+            atom_name = name if len(name) == 4 else f" {name:<3}"
+            lines.append(
+                f"ATOM  {serial:5d} {atom_name:<4} {resname:3} A{i + 1:4d}    "
+                f"{xyz[0]:8.3f}{xyz[1]:8.3f}{xyz[2]:8.3f}  1.00{plddt:6.2f}           {element}"
+            )
+            serial += 1
+    lines.append("END")
+    return "\n".join(lines) + "\n"
+
+
+class StubUpstream:
+    """
+    Threaded HTTP server answering the AlphaFold prediction API and model
+    files, and PubChem 3D SDF downloads. Every request sleeps `latency`
+    seconds (plus up to `jitter`); a `failure_rate` fraction get a 503; ids in
+    `missing` get a 404.
+    """
+
+    def __init__(self, port: int = 0, latency: float = 0.05, jitter: float = 0.0,
+                 failure_rate: float = 0.0, missing: Optional[Set[str]] = None,
+                 n_residues: int = 300, seed: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.missing = missing or set()
+        self.n_residues = n_residues
+        self.requests: Dict[str, int] = {}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._pdb_cache: Dict[str, bytes] = {}
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self.server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def start(self) -> "StubUpstream":
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self) -> "StubUpstream":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _pdb(self, uniprot_id: str) -> bytes:
+        with self._lock:
+            if uniprot_id not in self._pdb_cache:
+                self._pdb_cache[uniprot_id] = synthetic_pdb(uniprot_id, self.n_residues).encode()
+            return self._pdb_cache[uniprot_id]
+
+    def respond(self, path: str):
+        """Returns (status, content type, body) for a request path."""
+        with self._lock:
+            kind = path.split("?")[0].strip("/").split("/")[0] or "root"
+            self.requests[kind] = self.requests.get(kind, 0) + 1
+            delay = self.latency + self._rng.uniform(0, self.jitter)
+            failed = self._rng.random() < self.failure_rate
+        time.sleep(delay)
+        if failed:
+            return 503, "text/plain", b"stub failure"
+
+        match = re.match(r"^/api/prediction/([^/?]+)", path)
+        if match:
+            uniprot_id = match.group(1)
+            if uniprot_id in self.missing:
+                return 404, "application/json", b"[]"
+            body = [{"uniprotAccession": uniprot_id, "latestVersion": 4,
+                     "pdbUrl": f"{self.url}/files/AF-{uniprot_id}-F1-model_v4.pdb"}]
+            return 200, "application/json", json.dumps(body).encode()
+        match = re.match(r"^/files/AF-([^-]+)-F1-model_v\d+\.pdb$", path)
+        if match:
+            if match.group(1) in self.missing:
+                return 404, "text/plain", b"not found"
+            return 200, "chemical/x-pdb", self._pdb(match.group(1))
+        match = re.match(r"^/rest/pug/compound/cid/(\d+)/SDF", path)
+        if match:
+            if match.group(1) in self.missing:
+                return 404, "text/plain", b"not found"
+            return 200, "chemical/x-mdl-sdfile", ASPIRIN_SDF.format(cid=match.group(1)).encode()
+        return 404, "text/plain", b"unknown path"
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                status, content_type, body = stub.respond(self.path)
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve stand-ins for AlphaFold and PubChem.")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random latency, up to this many seconds")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument("--missing", nargs="*", default=[], help="UniProt ids / CIDs answered with 404")
+    parser.add_argument("--residues", type=int, default=300, help="residues per synthetic protein")
+    args = parser.parse_args()
+    stub = StubUpstream(args.port, args.latency, args.jitter, args.failure_rate,
+                        set(args.missing), args.residues)
+    print(f"Stub AlphaFold/PubChem on {stub.url}; point BIOCANVAS_ALPHAFOLD_URL and "
+          f"BIOCANVAS_PUBCHEM_URL at it")
+    try:
+        stub.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,5 @@
 import streamlit as st  # type: ignore
 import requests  # type: ignore
-import py3Dmol  # type: ignore
-from stmol import showmol  # type: ignore
 
 # Page Configuration
 st.set_page_config(page_title="BIOCANVAS", layout="wide")
@@ -25,23 +23,58 @@ API_URL = "http://127.0.0.1:8000"
 # Sidebar: Control Panel
 st.sidebar.header("🎛️ Control Panel")
 
+# Catalog entries per selectbox page
+PAGE_SIZE = 50
+
+# Fetched structures kept in memory, shared by all sessions
+STRUCTURE_CACHE_ENTRIES = 32
+
+@st.cache_resource
+def http_session():
+    """One pooled, keep-alive HTTP session shared by every rerun and session."""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=16)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+@st.cache_data(max_entries=STRUCTURE_CACHE_ENTRIES, ttl=3600, show_spinner=False)
+def fetch_protein_pdb(uniprot_id, detail="full"):
+    """Downloads a protein's AlphaFold PDB text (compressed) through the backend."""
+    response = http_session().get(f"{API_URL}/structure/{uniprot_id}/pdb",
+                                  params={"detail": detail}, timeout=30)
+    response.raise_for_status()
+    return response.text
+
+@st.cache_data(ttl=300)
+def fetch_page(kind, query, page):
+    """Fetches one page of /proteins or /ligands; returns (entries, total matches)."""
+    params = {"limit": PAGE_SIZE, "offset": page * PAGE_SIZE}
+    if query:
+        params["q"] = query
+    response = http_session().get(f"{API_URL}/{kind}", params=params, timeout=5)
+    response.raise_for_status()
+    return response.json(), int(response.headers.get("X-Total-Count", len(response.json())))
+
+def paged_select(kind, label, describe):
+    """Search box, page picker and selectbox over one page of /proteins or /ligands."""
+    query = st.sidebar.text_input(f"Search {kind}", key=f"{kind}_query")
+    entries, total = fetch_page(kind, query, 0)
+    pages = max(1, -(-total // PAGE_SIZE))
+    if pages > 1:
+        page = st.sidebar.number_input(f"{label} page (of {pages})", 1, pages, 1, key=f"{kind}_page") - 1
+        if page:
+            entries, total = fetch_page(kind, query, page)
+    if not entries:
+        st.sidebar.warning(f"No {kind} match '{query}'.")
+        st.stop()
+    options = {describe(entry): entry for entry in entries}
+    return options[st.sidebar.selectbox(label, list(options.keys()))]
+
 try:
-    # Fetch proteins and ligands from backend
-    proteins_response = requests.get(f"{API_URL}/proteins", timeout=5)
-    ligands_response = requests.get(f"{API_URL}/ligands", timeout=5)
-    
-    proteins = proteins_response.json()
-    ligands = ligands_response.json()
-    
-    # Protein selection
-    protein_options = {f"{p['name']} ({p['uniprot_id']})": p for p in proteins}
-    selected_protein_key = st.sidebar.selectbox("Select Protein", list(protein_options.keys()))
-    selected_protein = protein_options[selected_protein_key]
-    
-    # Ligand selection
-    ligand_options = {f"{l['name']} ({l['type']})": l for l in ligands}
-    selected_ligand_key = st.sidebar.selectbox("Select Ligand", list(ligand_options.keys()))
-    selected_ligand = ligand_options[selected_ligand_key]
+    # Fetch one page of proteins and ligands from backend
+    selected_protein = paged_select("proteins", "Select Protein", lambda p: f"{p['name']} ({p['uniprot_id']})")
+    selected_ligand = paged_select("ligands", "Select Ligand", lambda l: f"{l['name']} ({l['type']})")
     
     backend_online = True
     
@@ -57,22 +90,32 @@ if backend_online:
         st.subheader("🔬 3D Protein Structure")
         
         try:
-            # Get AlphaFold PDB URL
-            structure_response = requests.get(f"{API_URL}/structure/{selected_protein['uniprot_id']}")
-            pdb_url = structure_response.json()["pdb_url"]
-            
-            # Fetch PDB content
-            pdb_response = requests.get(pdb_url)
-            pdb_content = pdb_response.text
-            
-            # Create 3D viewer
-            view = py3Dmol.view(width=800, height=500)
-            view.addModel(pdb_content, "pdb")
-            view.setStyle({'cartoon': {'color': 'spectrum'}})
-            view.zoomTo()
-            
-            # Render
-            showmol(view, height=500, width=800)
+            # The viewer libraries load only once there is a structure to show
+            import py3Dmol  # type: ignore
+            from stmol import showmol  # type: ignore
+
+            uniprot_id = selected_protein['uniprot_id']
+            viewer_slot = st.empty()
+
+            # Cα trace first (a few KB), then the full-atom model in its place;
+            # proteins already shown in full skip the trace on later reruns
+            if 'full_structures' not in st.session_state:
+                st.session_state.full_structures = set()
+            details = ("full",) if uniprot_id in st.session_state.full_structures else ("ca", "full")
+            for detail in details:
+                pdb_text = fetch_protein_pdb(uniprot_id, detail)
+
+                # Create 3D viewer
+                view = py3Dmol.view(width=800, height=500)
+                view.addModel(pdb_text, "pdb")
+                view.setStyle({'cartoon': {'color': 'spectrum', 'style': 'trace'} if detail == "ca"
+                               else {'color': 'spectrum'}})
+                view.zoomTo()
+
+                # Render
+                with viewer_slot.container():
+                    showmol(view, height=500, width=800)
+            st.session_state.full_structures.add(uniprot_id)
             
         except Exception as e:
             st.error(f"Could not load 3D structure: {str(e)}")
@@ -98,7 +141,7 @@ if backend_online:
         with st.spinner("⚗️ Simulating interaction parameters..."):
             try:
                 # Send POST request to docking endpoint
-                docking_response = requests.post(
+                docking_response = http_session().post(
                     f"{API_URL}/dock",
                     json={"protein_id": selected_protein["id"], "ligand_id": selected_ligand["id"]}
                 )
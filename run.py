@@ -1,8 +1,10 @@
 #!/usr/bin/env python3
 """BIOCANVAS - One-Click Launcher"""
+import os
 import subprocess
 import sys
 import socket
+from backend.supervisor import PORT, WORKERS, launch
 
 def check_port(port):
     """Check if port is available."""
@@ -11,18 +13,27 @@ def check_port(port):
     sock.close()
     return result != 0
 
+backend = None
 try:
-    if not check_port(8501):
-        print("❌ Port 8501 is already in use. Please close the other application.")
-        sys.exit(1)
+    for port in (8501, PORT):
+        if not check_port(port):
+            print(f"❌ Port {port} is already in use. Please close the other application.")
+            sys.exit(1)
     
     print("🧬 Starting BIOCANVAS...")
+    print(f"⚙️  Warming up {WORKERS} backend workers...")
+    backend = launch()
     print("📍 Opening at: http://localhost:8501")
     print("🛑 Press Ctrl+C to stop\n")
     
-    subprocess.run([sys.executable, "-m", "streamlit", "run", "app.py"])
+    subprocess.run([sys.executable, "-m", "streamlit", "run", "app.py"],
+                   env=dict(os.environ, BIOCANVAS_BACKEND_RUNNING="1"))
 except KeyboardInterrupt:
     print("\n🛑 BIOCANVAS stopped.")
 except Exception as e:
     print(f"❌ Error starting BIOCANVAS: {e}")
     sys.exit(1)
+finally:
+    if backend is not None:
+        backend.terminate()
+        backend.wait()
@@ -0,0 +1,42 @@
+# Fingerprint index: incremental growth, saving and reloading across processes
+import numpy as np  # type: ignore
+
+from backend import fingerprints
+from backend.fingerprints import FingerprintIndex, common_bits, popcount
+
+
+def chain_sdf(n: int) -> bytes:
+    """V2000 record of an n-carbon chain with an oxygen at the end."""
+    atoms = [f"{i * 1.5:10.4f}    0.0000    0.0000 {'C' if i < n else 'O':<3} 0  0" for i in range(n + 1)]
+    bonds = [f"{i + 1:3d}{i + 2:3d}  1" for i in range(n)]
+    return "\n".join(["", "", "", f"{len(atoms):3d}{len(bonds):3d}  0  0  0  0  0  0  0  0999 V2000",
+                      *atoms, *bonds, "M  END", "$$$$"]).encode()
+
+
+def test_index_grows_in_chunks_and_reloads_in_another_process(tmp_path, monkeypatch):
+    monkeypatch.setattr(fingerprints, "INITIAL_CAPACITY", 4)
+    path = str(tmp_path / "fingerprints.npz")
+    builder = FingerprintIndex(path)
+    records = [(cid, chain_sdf(1 + cid % 9)) for cid in range(1, 40)]
+    for start in range(0, len(records), 7):
+        builder.add_sdfs(records[start:start + 7])
+    builder.add_sdfs(records[:3])   # already indexed
+
+    assert len(builder) == len(records) and not builder.missing(range(1, 40))
+    assert (builder.cids == np.arange(1, 40)).all()
+    query = builder.get(5)
+    expected_common = common_bits(builder.fps, query)
+    expected = expected_common / (popcount(builder.fps) + popcount(query[None, :])[0] - expected_common)
+    best = builder.search(query, 5, exclude=5)
+    assert [similarity for _, similarity in best] == sorted(np.delete(expected, 4), reverse=True)[:5]
+
+    reader = FingerprintIndex(path)
+    assert len(reader) == 0
+    assert builder.acquire_builder() and not reader.acquire_builder()
+    builder.save()
+    reader.add_sdfs([(100, chain_sdf(3))])   # fetched on demand, kept across reloads
+    reader.reload()
+    assert len(reader) == len(records) + 1 and (reader.get(7) == builder.get(7)).all()
+    builder.release_builder()
+    assert reader.acquire_builder()
+    reader.release_builder()
@@ -0,0 +1,59 @@
+# Job queue: leases, priority limits, cancellation and retention of finished jobs
+import time
+
+from backend.jobs import (CANCELLED, DONE, JOB_MAX_PRIORITY, JOB_MIN_PRIORITY, JOB_RETENTION, QUEUED,
+                          RUNNING, JobQueue)
+
+
+def test_expired_lease_is_requeued_and_the_old_owner_cannot_finish_it(tmp_path):
+    db = str(tmp_path / "jobs.sqlite")
+    crashed = JobQueue(lambda request, progress: {"score": 1}, db_path=db, workers=0)
+    survivor = JobQueue(lambda request, progress: {"score": 2}, db_path=db, workers=0)
+    job = crashed.submit({"protein_id": "P1"}, "alice")
+
+    assert crashed._claim()[0] == job["id"]
+    survivor._requeue_expired()
+    assert survivor.get(job["id"])["status"] == RUNNING  # lease still valid
+
+    crashed._db.execute("UPDATE jobs SET lease_until=? WHERE id=?", (time.time() - 1, job["id"]))
+    survivor._requeue_expired()
+    assert survivor.get(job["id"])["status"] == QUEUED
+
+    job_id, request = survivor._claim()
+    crashed._finish(job_id, DONE, {"score": 1})  # a late write from the old owner is ignored
+    assert survivor.get(job_id)["status"] == RUNNING
+    survivor._run(job_id, request)
+    assert survivor.get(job_id)["status"] == DONE
+
+
+def test_priority_is_clamped_to_the_server_range(tmp_path):
+    queue = JobQueue(lambda request, progress: {}, db_path=str(tmp_path / "jobs.sqlite"), workers=0)
+
+    assert queue.submit({}, "alice", priority=10**6)["priority"] == JOB_MAX_PRIORITY
+    assert queue.submit({}, "alice", priority=-10**6)["priority"] == JOB_MIN_PRIORITY
+
+
+def test_cancel_requested_during_a_run_stops_at_its_last_progress_report(tmp_path):
+    def runner(request, progress):
+        progress(0, 1)
+        queue.cancel(job_id)   # arrives while the job is scoring
+        progress(1, 1, -7.0)
+        return {"score": -7.0}
+
+    queue = JobQueue(runner, db_path=str(tmp_path / "jobs.sqlite"), workers=0)
+    job_id = queue.submit({}, "alice")["id"]
+    queue._run(*queue._claim())
+    assert queue.get(job_id)["status"] == CANCELLED
+
+
+def test_finished_jobs_are_deleted_after_the_retention_period(tmp_path):
+    queue = JobQueue(lambda request, progress: {}, db_path=str(tmp_path / "jobs.sqlite"), workers=0)
+    old, recent, waiting = (queue.submit({}, "alice")["id"] for _ in range(3))
+    for _ in (old, recent):
+        queue._run(*queue._claim())
+    queue._db.execute("UPDATE jobs SET finished=? WHERE id=?", (time.time() - JOB_RETENTION - 1, old))
+
+    queue._purge_finished()
+
+    assert queue.get(old) is None
+    assert queue.get(recent)["status"] == DONE and queue.get(waiting)["status"] == QUEUED
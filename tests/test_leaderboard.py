@@ -0,0 +1,14 @@
+# Stored leaderboard: scores of different scoring versions are never ranked together
+from backend.result_store import ResultStore
+from backend.screening import StoredLeaderboard
+
+
+def test_new_scoring_version_replaces_better_scores_of_the_old_one(tmp_path):
+    board = StoredLeaderboard(ResultStore(str(tmp_path / "results.sqlite")), capacity=2)
+    board.offer_many([(1, 10, -9.0), (1, 11, -5.0), (1, 12, -7.0)], "v1")
+    assert board.top(1, version="v1") == [{"ligand_id": 10, "score": -9.0}, {"ligand_id": 12, "score": -7.0}]
+
+    board.offer_many([(1, 10, -4.0)], "v2")
+
+    assert board.top(1, version="v2") == [{"ligand_id": 10, "score": -4.0}]
+    assert board.top(1, version="v1") == []
@@ -0,0 +1,42 @@
+# Cell-list queries against brute-force distances
+import numpy as np  # type: ignore
+import pytest
+
+from backend.spatial_index import CellList
+
+
+def brute_force_knn(coords: np.ndarray, points: np.ndarray, k: int) -> np.ndarray:
+    dist = np.sqrt(((points[:, None, :] - coords[None, :, :]) ** 2).sum(axis=-1))
+    return np.sort(dist, axis=1)[:, :k]
+
+
+@pytest.mark.parametrize("n_atoms, k", [(1, 4), (7, 7), (300, 1), (300, 8)])
+def test_query_knn_matches_brute_force_inside_and_outside_the_box(n_atoms, k):
+    rng = np.random.default_rng(n_atoms * 31 + k)
+    coords = rng.normal(0.0, 8.0, (n_atoms, 3)).astype(np.float32)
+    index = CellList(coords)
+    inside = rng.normal(0.0, 8.0, (40, 3))
+    # Far outside the box: well beyond its diagonal in every direction
+    outside = rng.normal(0.0, 1.0, (40, 3)) * rng.uniform(60.0, 2000.0, (40, 1))
+    points = np.concatenate([inside, outside]).astype(np.float32)
+
+    indices, distances = index.query_knn(points, k)
+
+    found = min(k, n_atoms)
+    expected = brute_force_knn(coords, points, found)
+    np.testing.assert_allclose(distances[:, :found], expected, rtol=1e-5)
+    assert (indices[:, :found] >= 0).all()
+    actual = np.linalg.norm(points[:, None, :] - coords[indices[:, :found]], axis=-1)
+    np.testing.assert_allclose(actual, distances[:, :found], rtol=1e-5)
+    assert (indices[:, found:] == -1).all() and np.isinf(distances[:, found:]).all()
+
+
+def test_pairs_within_matches_brute_force():
+    rng = np.random.default_rng(0)
+    coords = rng.normal(0.0, 10.0, (500, 3)).astype(np.float32)
+    points = rng.normal(0.0, 12.0, (60, 3)).astype(np.float32)
+
+    p, a, _ = CellList(coords).pairs_within(points, 5.0)
+
+    dist = np.sqrt(((points[:, None, :] - coords[None, :, :]) ** 2).sum(axis=-1))
+    assert set(zip(p.tolist(), a.tolist())) == set(zip(*map(np.ndarray.tolist, np.nonzero(dist < 5.0))))